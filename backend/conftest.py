@@ -0,0 +1,21 @@
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark', 'API benchmarks (pytest -m benchmark)')
+    group.addoption(
+        '--benchmark-scales',
+        default='10000',
+        help='Comma separated catalog sizes, e.g. 10000,100000,1000000 (default: 10000)',
+    )
+    group.addoption('--benchmark-iterations', type=int, default=20, help='Timed requests per endpoint (default: 20)')
+    group.addoption('--benchmark-warmup', type=int, default=2, help='Untimed requests per endpoint first (default: 2)')
+    group.addoption('--benchmark-seed', type=int, default=0, help='Seed for the generated catalogs (default: 0)')
+    group.addoption(
+        '--benchmark-output',
+        default='benchmark-results.json',
+        help='Where to write the results as JSON (default: benchmark-results.json)',
+    )
+    group.addoption('--benchmark-baseline', help='Results file to compare against; regressions fail the benchmark')
+    group.addoption(
+        '--benchmark-tolerance',
+        type=float,
+        help='Allowed p95 latency and size growth over the baseline as a ratio (default: 0.25)',
+    )
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """Outside DEBUG the default cache must be shared, or workers do not see each other's locks and revocations."""
+    if settings.DEBUG or settings.CACHES['default']['BACKEND'] not in PER_PROCESS_BACKENDS:
+        return []
+    return [
+        Warning(
+            'The default cache is local to each process.',
+            hint='Set CACHE_URL to a Redis or Memcached server shared by all workers, e.g. redis://redis:6379/1.',
+            id='core.W001',
+        )
+    ]
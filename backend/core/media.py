@@ -0,0 +1,168 @@
+"""
+Serving uploaded media (card images and their derivatives) from MEDIA_ROOT.
+
+The view answers conditional requests (If-None-Match, If-Modified-Since) and
+single byte ranges itself, then hands the bytes off according to MEDIA_SENDFILE:
+
+- 'nginx': an X-Accel-Redirect to MEDIA_ACCEL_REDIRECT_PREFIX, which nginx maps
+  to MEDIA_ROOT in an internal location and sends (including ranges) itself.
+- 'xsendfile': an X-Sendfile header with the file's path, for Apache or lighttpd.
+- 'python': the worker streams the file. Under gunicorn the file is sent with the
+  sendfile() system call through wsgi.file_wrapper, so no bytes pass through
+  Python; other servers fall back to reading it in blocks.
+
+Content-addressed files (see flashcards.storage) never change, so they get a
+strong ETag from their digest and a year-long immutable Cache-Control. So do
+their derivatives, whose names add the width and a digest of the rendering
+parameters (see flashcards.images.derivative_name).
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# A SHA-256 file name, optionally with a derivative's width and rendering parameters suffix (-320w-1f0c9a2e).
+# Derivatives without the parameters suffix are overwritten when re-rendered, so they are not immutable.
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{64}(-\d+w-[0-9a-f]{8})?\.\w+$')
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """`length` bytes of an open file from `start`, read like a file.
+
+    fileno() lets gunicorn's wsgi.file_wrapper sendfile() the range: it sends
+    Content-Length bytes from the file's current position.
+    """
+
+    mode = 'rb'
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def etag_for(name, stats):
+    """Strong ETag: the digest in a content-addressed name, else the size and modification time."""
+    if CONTENT_ADDRESSED_NAME.match(name):
+        return f'"{name}"'
+    return f'"{stats.st_size:x}-{stats.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """(start, end) of a single byte range, 'unsatisfiable', or None to send the whole file.
+
+    Multiple ranges are answered with the whole file, which RFC 9110 allows.
+    """
+    match = RANGE_PATTERN.match(header.replace(' ', ''))
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return 'unsatisfiable'
+    return start, end
+
+
+def range_applies(request, etag, last_modified):
+    """If-Range: honour the Range header only if the client's copy is still current."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+@require_safe
+def serve_media(request, path):
+    """GET and HEAD of one file under MEDIA_ROOT."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stats = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('Media file not found')
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404('Media file not found')
+
+    name = os.path.basename(full_path)
+    etag = etag_for(name, stats)
+    last_modified = int(stats.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if CONTENT_ADDRESSED_NAME.match(name)
+            else f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+        ),
+    }
+    content_type, encoding = mimetypes.guess_type(name)
+    content_type = content_type or 'application/octet-stream'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+            not_modified.headers[header] = headers[header]
+        return not_modified
+
+    backend = settings.MEDIA_SENDFILE
+    if backend in ('nginx', 'xsendfile'):
+        # The front proxy handles Range and sends the body
+        response = HttpResponse(content_type=content_type, headers=headers)
+        if backend == 'nginx':
+            response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_REDIRECT_PREFIX + path.lstrip('/'))
+        else:
+            response['X-Sendfile'] = full_path
+        return response
+
+    size = stats.st_size
+    requested = request.META.get('HTTP_RANGE')
+    byte_range = parse_range(requested, size) if requested and range_applies(request, etag, last_modified) else None
+    if byte_range == 'unsatisfiable':
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    start, end = byte_range or (0, size - 1)
+    length = max(0, end - start + 1)
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, headers=headers)
+    else:
+        response = FileResponse(FileRange(open(full_path, 'rb'), start, length), content_type=content_type, headers=headers)
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
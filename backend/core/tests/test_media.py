@@ -0,0 +1,29 @@
+import os
+import shutil
+import tempfile
+from django.test import TestCase, override_settings
+
+DIGEST = '3f' * 32
+
+
+class MediaCacheControlTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_CACHE_MAX_AGE=3600)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def cache_control(self, name):
+        with open(os.path.join(self.media_root, name), 'wb') as file:
+            file.write(b'image')
+        return self.client.get(f'/media/{name}')['Cache-Control']
+
+    def test_originals_and_versioned_derivatives_are_immutable(self):
+        self.assertIn('immutable', self.cache_control(f'{DIGEST}.png'))
+        self.assertIn('immutable', self.cache_control(f'{DIGEST}-320w-1f0c9a2e.webp'))
+
+    def test_derivatives_named_without_rendering_parameters_can_change(self):
+        self.assertEqual(self.cache_control(f'{DIGEST}-320w.webp'), 'public, max-age=3600')
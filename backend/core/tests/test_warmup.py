@@ -0,0 +1,33 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from core import warmup
+from flashcards.models import Flashcard
+from flashcards.payload_cache import get_payload_cache
+from users.models import User
+
+
+@override_settings(WARMUP_BASE_URL='https://cards.example.com/', ALLOWED_HOSTS=['cards.example.com'])
+class WarmupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_payload_cache().clear()
+        self.user = User.objects.create_user('user1', 'user1@example.com', 'pw12345!')
+        for number in range(3):
+            Flashcard.objects.create(
+                title=f'Asana {number}', definition='A pose', created_by=self.user,
+                front_image=f'flashcard_images/front-{number}.png',
+            )
+
+    def test_warmed_cards_are_served_from_the_payload_cache(self):
+        warmup._warm_cards(20)
+        payload_cache = get_payload_cache()
+        misses = payload_cache.misses
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/cards/', HTTP_HOST='cards.example.com', secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(payload_cache.misses, misses)
+        self.assertIn('https://cards.example.com/media/flashcard_images/front-0.png', response.content.decode())
@@ -3,5 +3,6 @@ from . import views
 
 urlpatterns = [
     path('health/', views.health_check, name='health_check'),
+    path('ready/', views.readiness, name='readiness'),
     path('dailycard/', views.daily_card, name='daily_card'),
 ]
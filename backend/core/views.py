@@ -1,25 +1,51 @@
-from django.http import JsonResponse
-from rest_framework.decorators import api_view, permission_classes
+from django.http import HttpResponse, JsonResponse
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import AllowAny
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from flashcards.payload_cache import FragmentJSONRenderer
 from flashcards.services import DailyCardService
+from yoga_flashcards.metrics import render_metrics
+from .warmup import READY, check_database, warmup_status
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
-    """Health check endpoint for Kubernetes readiness probes."""
+    """Liveness probe: the process is up and serving requests. Touches nothing else."""
     return JsonResponse({'status': 'healthy'})
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+def readiness(request):
+    """Readiness probe: 200 once the database answers and this worker has warmed its caches, 503 before."""
+    database_error = check_database()
+    warmup = warmup_status(start=database_error is None)
+    ready = database_error is None and warmup['status'] == READY
+    return JsonResponse(
+        {
+            'status': 'ready' if ready else 'not_ready',
+            'database': 'ok' if database_error is None else database_error,
+            'warmup': warmup,
+        },
+        status=200 if ready else 503,
+    )
+
+
+def metrics(request):
+    """Prometheus metrics of all worker processes, in text exposition format."""
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@renderer_classes([FragmentJSONRenderer, BrowsableAPIRenderer])
 def daily_card(request):
     """Get the card of the day - available to all users."""
-    card = DailyCardService.get_daily_card()
-    if card:
-        from flashcards.serializers import FlashcardSerializer
-        serializer = FlashcardSerializer(card)
-        return Response(serializer.data)
+    payload = DailyCardService.get_daily_payload()
+    if payload is not None:
+        return Response(payload)
     else:
         return Response({'message': 'No cards available'}, status=404)
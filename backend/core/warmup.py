@@ -0,0 +1,126 @@
+"""
+Per-process warm-up that runs before a worker reports ready.
+
+A fresh worker has empty per-process caches: the rendered card JSON, the daily
+card payload and the typeahead index. The readiness endpoint only reports ready
+once this worker has loaded them, so a newly scaled pod does not take traffic cold.
+Warm-up runs in a background thread, started by gunicorn's post_worker_init hook
+or by the first readiness probe, and is retried by the next probe if it failed.
+"""
+import threading
+import time
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.db import connection, connections
+from django.http import HttpRequest
+from flashcards.models import Flashcard
+from flashcards.pagination import CardPagination
+from flashcards.payload_cache import get_payload_cache
+from flashcards.search import get_search_backend
+from flashcards.serializers import FlashcardListSerializer
+from flashcards.services import DailyCardService
+from flashcards.suggest import get_suggest_index
+from flashcards.views import FlashcardViewSet
+
+NOT_STARTED = 'not_started'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+_state = {'status': NOT_STARTED, 'timings_ms': {}, 'error': None}
+_lock = threading.Lock()
+
+
+def check_database():
+    """Run a trivial query. Returns None if the database answered, else the error message."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return None
+    except Exception as error:
+        return str(error)
+
+
+def warmup_status(start=True):
+    """A copy of this worker's warm-up state, starting warm-up first if it has not run or failed."""
+    if start:
+        start_warmup()
+    with _lock:
+        return {**_state, 'timings_ms': dict(_state['timings_ms'])}
+
+
+def start_warmup():
+    """Start warm-up in a background thread unless it is running or done."""
+    with _lock:
+        if _state['status'] in (WARMING, READY):
+            return
+        _state.update(status=WARMING, timings_ms={}, error=None)
+    threading.Thread(target=run_warmup, name='warmup', daemon=True).start()
+
+
+def run_warmup():
+    """Load everything a worker serves from memory, recording how long each step took."""
+    started = time.perf_counter()
+    try:
+        for name, step in _steps():
+            step_started = time.perf_counter()
+            step()
+            _record(name, step_started)
+        _record('total', started)
+        with _lock:
+            _state['status'] = READY
+    except Exception as error:
+        with _lock:
+            _state.update(status=FAILED, error=str(error))
+    finally:
+        # This thread's connection would otherwise stay open until the worker exits
+        connections.close_all()
+
+
+def _record(name, started):
+    with _lock:
+        _state['timings_ms'][name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _steps():
+    return [
+        ('database', lambda: connection.ensure_connection()),
+        ('daily_card', DailyCardService.get_daily_payload),
+        ('cards', lambda: _warm_cards(CardPagination.page_size)),
+        ('suggest_index', get_suggest_index),
+        ('search', lambda: get_search_backend().search('yoga')),
+    ]
+
+
+class WarmupRequest(HttpRequest):
+    """Just enough of a GET request for serializers to build absolute URLs on `base_url`."""
+
+    def __init__(self, path, base_url):
+        super().__init__()
+        base_url = urlsplit(base_url)
+        self.method = 'GET'
+        self.path = self.path_info = path
+        self.META['HTTP_HOST'] = base_url.netloc or 'localhost'
+        self._scheme = base_url.scheme or 'http'
+
+    def _get_scheme(self):
+        return self._scheme
+
+
+def _warm_cards(page_size):
+    """Render the default first page of live cards into the payload cache.
+
+    Card JSON contains absolute image URLs, so it is rendered for WARMUP_BASE_URL,
+    which should be the host clients use.
+    """
+    request = WarmupRequest('/api/cards/', settings.WARMUP_BASE_URL)
+    fields = FlashcardListSerializer.DEFAULT_FIELDS
+    cards = FlashcardListSerializer.optimize_queryset(
+        Flashcard.objects.filter(is_active=True, is_live=True), fields, []
+    )[:page_size]
+    get_payload_cache().render(
+        list(cards),
+        FlashcardListSerializer,
+        {'request': request, 'fields': fields, 'expand': []},
+        variant=FlashcardViewSet.list_variant(fields, []),
+    )
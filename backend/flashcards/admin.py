@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Flashcard, Tag, DailyCard, CardUsageLog
+from .models import Flashcard, Tag, DailyCard, CardUsageLog, DailyCardSchedule, FlashcardRevision, ImageDerivativeSet, StoredImage
 
 
 @admin.register(Tag)
@@ -17,8 +17,8 @@ class FlashcardAdmin(admin.ModelAdmin):
     
     list_display = ['title', 'phrase', 'version_number', 'is_live', 'is_active', 'created_by', 'created_at']
     list_filter = ['is_live', 'is_active', 'created_at', 'tags']
-    search_fields = ['title', 'phrase', 'definition', 'version_group']
-    readonly_fields = ['created_at', 'updated_at', 'version_number', 'version_group', 'is_live']
+    search_fields = ['title', 'phrase', 'definition', 'version_group', 'title_key', 'phrase_key', 'phrase_ascii']
+    readonly_fields = ['created_at', 'updated_at', 'version_number', 'version_group', 'is_live', 'title_key', 'phrase_iast', 'phrase_key', 'phrase_ascii']
     filter_horizontal = ['tags']
     
     def get_queryset(self, request):
@@ -41,3 +41,41 @@ class CardUsageLogAdmin(admin.ModelAdmin):
     list_display = ['card', 'used_date', 'cycle_number', 'created_at']
     list_filter = ['used_date', 'cycle_number', 'created_at']
     readonly_fields = ['created_at']
+
+
+@admin.register(DailyCardSchedule)
+class DailyCardScheduleAdmin(admin.ModelAdmin):
+    """Admin interface for DailyCardSchedule model."""
+    
+    list_display = ['position', 'cycle_number', 'version_group', 'used_date', 'created_at']
+    list_filter = ['cycle_number', 'used_date']
+    readonly_fields = ['created_at']
+
+
+@admin.register(FlashcardRevision)
+class FlashcardRevisionAdmin(admin.ModelAdmin):
+    """Admin interface for FlashcardRevision model."""
+    
+    list_display = ['version_group', 'version_number', 'is_snapshot', 'created_by', 'created_at']
+    list_filter = ['is_snapshot', 'created_at']
+    search_fields = ['version_group']
+    readonly_fields = ['version_group', 'version_number', 'is_snapshot', 'content', 'created_by', 'created_at', 'updated_at', 'is_active']
+
+
+@admin.register(ImageDerivativeSet)
+class ImageDerivativeSetAdmin(admin.ModelAdmin):
+    """Admin interface for ImageDerivativeSet model."""
+    
+    list_display = ['source', 'status', 'width', 'height', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['source']
+    readonly_fields = ['source', 'width', 'height', 'variants', 'status', 'error', 'created_at', 'updated_at']
+
+
+@admin.register(StoredImage)
+class StoredImageAdmin(admin.ModelAdmin):
+    """Admin interface for StoredImage model."""
+    
+    list_display = ['name', 'ref_count', 'updated_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'ref_count', 'created_at', 'updated_at']
@@ -0,0 +1,148 @@
+"""
+API benchmark at several catalog sizes (see flashcards/tests/test_benchmarks.py).
+
+For each scale the test database on the configured engine is seeded with
+LoadDataGenerator; every endpoint is then requested through the Django test
+client, recording latency percentiles, query counts, repeated (N+1) query
+shapes and response bytes. Results are plain JSON so runs can be compared with
+a stored baseline.
+"""
+import math
+import time
+from contextlib import nullcontext
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+from yoga_flashcards.querycount import QueryRecorder
+from .loadgen import LOAD_PREFIX, LoadDataGenerator
+from .models import Flashcard, Tag
+
+PERCENTILES = [50, 95, 99]
+
+# Slower-than-baseline ratio tolerated before a latency or size change counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Latency differences below this are noise at any ratio
+MIN_LATENCY_DELTA_MS = 2.0
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def seed_volumes(scale):
+    """LoadDataGenerator arguments for a catalog of `scale` cards."""
+    return {
+        'cards': scale,
+        'tags': max(50, int(3 * math.sqrt(scale))),
+        'users': min(max(scale // 10, 10), 10000),
+        'cycles': 1,
+    }
+
+
+class ApiBenchmark:
+    """Runs the endpoint set against the current database and collects metrics."""
+
+    def __init__(self, iterations=20, warmup=2):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.client = Client()
+
+    def endpoints(self):
+        """(name, method, path, data) for each measured request, built from the seeded data."""
+        live = Flashcard.objects.filter(is_live=True, is_active=True)
+        deepest = live.order_by('-version_number', 'id').first()
+        popular_tag = Tag.objects.filter(name__startswith=LOAD_PREFIX).order_by('id').first()
+        word = (deepest.title.split()[0] if deepest else 'breath').lower()
+        middle_page = max(1, live.count() // 2 // 20)
+        endpoints = [
+            ('cards_list', 'get', '/api/cards/', None),
+            ('cards_list_deep_page', 'get', f'/api/cards/?page={middle_page}', None),
+            ('cards_list_keyset', 'get', '/api/cards/?cursor=', None),
+            ('cards_search', 'get', f'/api/cards/?search={word}', None),
+            ('cards_suggest', 'get', f'/api/cards/suggest/?q={word[:3]}', None),
+            ('tags_list', 'get', '/api/tags/', None),
+            ('daily_card', 'get', '/api/dailycard/', None),
+        ]
+        if popular_tag:
+            endpoints.append(('cards_tag_filter', 'get', f'/api/cards/?tags={popular_tag.pk}', None))
+        if deepest:
+            endpoints += [
+                ('card_detail', 'get', f'/api/cards/{deepest.pk}/', None),
+                ('card_versions', 'get', f'/api/cards/{deepest.pk}/versions/', None),
+                ('revert_version', 'post', f'/api/cards/{deepest.pk}/revert_version/', {'version_number': 1}),
+            ]
+        return endpoints
+
+    def run(self, user=None):
+        """Measure every endpoint, logged in as `user` if given. Returns {name: metrics}."""
+        if user is not None:
+            self.client.force_login(user)
+        return {name: self.measure(method, path, data) for name, method, path, data in self.endpoints()}
+
+    def measure(self, method, path, data=None):
+        request = getattr(self.client, method)
+        timings = []
+        queries = []
+        repeated = []
+        response = None
+        for iteration in range(self.warmup + self.iterations):
+            # Writes are rolled back, so every iteration of e.g. revert_version sees the same data
+            with transaction.atomic() if method != 'get' else nullcontext():
+                with QueryRecorder() as recorder:
+                    started = time.perf_counter()
+                    response = request(path, data) if data is not None else request(path)
+                    elapsed = (time.perf_counter() - started) * 1000
+                if method != 'get':
+                    transaction.set_rollback(True)
+            if iteration >= self.warmup:
+                timings.append(elapsed)
+                queries.append(recorder.count)
+                repeated.append(len(recorder.repeated()))
+        metrics = {f'p{pct}_ms': round(percentile(timings, pct), 2) for pct in PERCENTILES}
+        metrics.update({
+            'queries': max(queries),
+            'repeated_queries': max(repeated),
+            'bytes': len(response.content),
+            'status': response.status_code,
+        })
+        return metrics
+
+
+def results_document(results):
+    """Wrap per-scale results with what is needed to judge whether two runs are comparable."""
+    return {
+        'database': connection.vendor,
+        'created_at': timezone.now().isoformat(),
+        'scales': {str(scale): endpoints for scale, endpoints in results.items()},
+    }
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compare two results documents. Returns human readable descriptions of regressions.
+
+    More queries or repeated query shapes than the baseline always count; latency (p95) and response size count
+    when they grew by more than `tolerance`.
+    """
+    regressions = []
+    for scale, endpoints in results['scales'].items():
+        for name, metrics in endpoints.items():
+            base = baseline.get('scales', {}).get(scale, {}).get(name)
+            if not base:
+                continue
+            label = f'{name} @ {scale}'
+            if metrics['queries'] > base['queries']:
+                regressions.append(f'{label}: {metrics["queries"]} queries (baseline {base["queries"]})')
+            if metrics['repeated_queries'] > base.get('repeated_queries', 0):
+                regressions.append(
+                    f'{label}: {metrics["repeated_queries"]} repeated query shapes (baseline {base.get("repeated_queries", 0)})'
+                )
+            if (metrics['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+                    and metrics['p95_ms'] - base['p95_ms'] >= MIN_LATENCY_DELTA_MS):
+                regressions.append(f'{label}: p95 {metrics["p95_ms"]}ms (baseline {base["p95_ms"]}ms)')
+            if metrics['bytes'] > base['bytes'] * (1 + tolerance):
+                regressions.append(f'{label}: {metrics["bytes"]} bytes (baseline {base["bytes"]})')
+            if metrics['status'] != base['status']:
+                regressions.append(f'{label}: status {metrics["status"]} (baseline {base["status"]})')
+    return regressions
@@ -0,0 +1,70 @@
+"""
+Streaming export of the card catalog as CSV or JSON Lines.
+
+Cards are read with QuerySet.iterator() and rendered one line at a time, so memory
+use does not grow with the catalog. The output uses the same columns import_cards
+reads, so an export can be imported again unchanged.
+"""
+import csv
+import json
+from .history import VersionHistory
+from .models import Flashcard
+
+# Export format -> content type; NDJSON is JSON Lines under its other common name
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/jsonl; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+CARD_COLUMNS = ['title', 'phrase', 'definition', 'tags']
+HISTORY_COLUMNS = ['version_group', 'version_number', 'is_live', 'created_at']
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class _LineBuffer:
+    """File-like object whose write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def export_records(include_history=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield a dict per live card, or per version oldest first with `include_history`."""
+    cards = (
+        Flashcard.objects.filter(is_live=True, is_active=True)
+        .order_by('title', 'id')
+        .prefetch_related('tags')
+    )
+    for card in cards.iterator(chunk_size=chunk_size):
+        versions = reversed(VersionHistory.versions(card.version_group)) if include_history else [card]
+        for version in versions:
+            record = {
+                'title': version.title,
+                'phrase': version.phrase or '',
+                'definition': version.definition,
+                'tags': [tag.name for tag in (version.tags.all() if version.pk else version.tags)],
+            }
+            if include_history:
+                record.update({
+                    'version_group': str(version.version_group),
+                    'version_number': version.version_number,
+                    'is_live': version.is_live,
+                    'created_at': version.created_at.isoformat(),
+                })
+            yield record
+
+
+def render_export(records, export_format, include_history=False):
+    """Yield the export file line by line."""
+    if export_format == 'csv':
+        columns = CARD_COLUMNS + (HISTORY_COLUMNS if include_history else [])
+        writer = csv.writer(_LineBuffer())
+        yield writer.writerow(columns)
+        for record in records:
+            record['tags'] = ','.join(record['tags'])
+            yield writer.writerow([record[column] for column in columns])
+    else:
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
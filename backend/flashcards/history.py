@@ -0,0 +1,318 @@
+"""
+Delta-compressed storage of superseded card versions.
+
+Only live versions and the most recent history stay in flashcards_flashcard.
+Older versions are moved to FlashcardRevision: every SNAPSHOT_INTERVAL-th revision
+of a card holds its full content, the ones in between only the fields that changed
+since the previous revision, with the definition stored as a word level delta.
+Revisions are rebuilt into read-only ArchivedVersion objects on demand.
+"""
+import difflib
+import json
+import re
+from django.conf import settings
+from django.db import transaction
+from .models import CardUsageLog, DailyCard, Flashcard, FlashcardRevision, Tag
+
+# A full snapshot is stored at least every SNAPSHOT_INTERVAL revisions to bound rebuild cost
+SNAPSHOT_INTERVAL = 10
+
+CONTENT_FIELDS = ['title', 'phrase', 'definition', 'front_image', 'back_image', 'tags']
+
+# Words and the whitespace between them; joining the tokens gives back the exact text
+TEXT_TOKEN_PATTERN = re.compile(r'\s+|\S+')
+
+
+def text_delta(old, new):
+    """Encode `new` as [start, end] ranges of `old` tokens to copy and strings to insert."""
+    old_tokens = TEXT_TOKEN_PATTERN.findall(old)
+    new_tokens = TEXT_TOKEN_PATTERN.findall(new)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(new_tokens[j1:j2]))
+    return ops
+
+
+def apply_text_delta(old, ops):
+    tokens = TEXT_TOKEN_PATTERN.findall(old)
+    return ''.join(''.join(tokens[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+def content_delta(old, new):
+    """Fields of `new` that differ from `old`; a definition is stored as a text delta when smaller."""
+    delta = {}
+    for field in CONTENT_FIELDS:
+        if old.get(field) == new.get(field):
+            continue
+        if field == 'definition' and old.get(field) and new.get(field):
+            ops = text_delta(old[field], new[field])
+            if len(json.dumps(ops)) < len(json.dumps(new[field])):
+                delta[field] = ops
+                continue
+        delta[field] = new.get(field)
+    return delta
+
+
+def apply_content_delta(old, delta):
+    content = dict(old)
+    for field, value in delta.items():
+        if field == 'definition' and isinstance(value, list):
+            value = apply_text_delta(old['definition'], value)
+        content[field] = value
+    return content
+
+
+def card_content(card):
+    """Versioned content of a hot Flashcard row; prefetch `tags` when doing this for many cards."""
+    return {
+        'title': card.title,
+        'phrase': card.phrase,
+        'definition': card.definition,
+        'front_image': card.front_image.name or '',
+        'back_image': card.back_image.name or '',
+        'tags': sorted(tag.pk for tag in card.tags.all()),
+    }
+
+
+class ArchivedVersion:
+    """Read-only card version rebuilt from the revision table.
+
+    Has the attributes the version history serializer and revert need, but no id:
+    archived versions are addressed by version number.
+    """
+
+    id = pk = None
+    is_live = False
+
+    def __init__(self, revision, content, tags_by_id):
+        self.version_group = revision.version_group
+        self.version_number = revision.version_number
+        self.created_by = revision.created_by
+        self.created_by_id = revision.created_by_id
+        self.created_at = revision.created_at
+        self.updated_at = revision.updated_at
+        self.is_active = revision.is_active
+        self.content = content
+        self.title = content['title']
+        self.phrase = content['phrase']
+        self.definition = content['definition']
+        self.front_image = content['front_image'] or None
+        self.back_image = content['back_image'] or None
+        # Tags deleted since this version was archived are left out
+        self.tags = [tags_by_id[tag_id] for tag_id in content['tags'] if tag_id in tags_by_id]
+
+    def revert_to_this_version(self, reverted_by, live_version=None, expected_version=None):
+        """Create a new live version by copying this version's data."""
+        if live_version is None:
+            live_version = Flashcard.objects.get(version_group=self.version_group, is_live=True)
+        return live_version.create_new_version(
+            updated_by=reverted_by,
+            expected_version=expected_version,
+            title=self.title,
+            phrase=self.phrase,
+            definition=self.definition,
+            front_image=self.front_image,
+            back_image=self.back_image,
+            tags=self.tags,
+        )
+
+
+class VersionHistory:
+    """Moves superseded versions between the hot table and delta storage and reads them back."""
+
+    @staticmethod
+    def hot_history_limit():
+        return getattr(settings, 'CARD_HOT_HISTORY_VERSIONS', 5)
+
+    @staticmethod
+    def versions(version_group):
+        """Every version of a card, newest first: Flashcard rows and ArchivedVersions."""
+        hot = Flashcard.objects.filter(version_group=version_group).select_related('created_by').prefetch_related('tags')
+        archived = VersionHistory._rebuild(
+            FlashcardRevision.objects.filter(version_group=version_group).select_related('created_by')
+            .order_by('version_number')
+        )
+        return sorted([*hot, *archived], key=lambda version: version.version_number, reverse=True)
+
+    @staticmethod
+    def get_version(version_group, version_number):
+        """One version of a card from either tier, or None."""
+        card = Flashcard.objects.filter(version_group=version_group, version_number=version_number).first()
+        if card:
+            return card
+        revisions = FlashcardRevision.objects.filter(version_group=version_group, version_number__lte=version_number)
+        snapshot = revisions.filter(is_snapshot=True).order_by('-version_number').values_list('version_number', flat=True).first()
+        if snapshot is None:
+            return None
+        chain = VersionHistory._rebuild(
+            revisions.filter(version_number__gte=snapshot).select_related('created_by').order_by('version_number')
+        )
+        if chain and chain[-1].version_number == version_number:
+            return chain[-1]
+        return None
+
+    @staticmethod
+    def content(version):
+        return version.content if isinstance(version, ArchivedVersion) else card_content(version)
+
+    @staticmethod
+    def diff(old_version, new_version):
+        """Field by field changes between two versions of a card."""
+        old = VersionHistory.content(old_version)
+        new = VersionHistory.content(new_version)
+        changes = {}
+        for field in ['title', 'phrase', 'front_image', 'back_image']:
+            if old[field] != new[field]:
+                changes[field] = {'from': old[field], 'to': new[field]}
+        if old['definition'] != new['definition']:
+            changes['definition'] = VersionHistory._text_changes(old['definition'] or '', new['definition'] or '')
+        if old['tags'] != new['tags']:
+            names = dict(Tag.objects.filter(pk__in=set(old['tags']) | set(new['tags'])).values_list('id', 'name'))
+            changes['tags'] = {
+                'added': sorted(names[tag_id] for tag_id in set(new['tags']) - set(old['tags']) if tag_id in names),
+                'removed': sorted(names[tag_id] for tag_id in set(old['tags']) - set(new['tags']) if tag_id in names),
+            }
+        return {
+            'from_version': old_version.version_number,
+            'to_version': new_version.version_number,
+            'changes': changes,
+        }
+
+    @staticmethod
+    def compact(version_group, keep=None, older_than=None, limit=None):
+        """Archive superseded versions of a card beyond its `keep` most recent ones. Returns the number archived.
+
+        `limit` caps how many (oldest first) are moved in this call.
+        """
+        card_ids = VersionHistory.archive_candidates(version_group, keep, older_than)
+        if limit is not None:
+            card_ids = card_ids[:limit]
+        if not card_ids:
+            return 0
+        return VersionHistory.archive(list(Flashcard.objects.filter(pk__in=card_ids).prefetch_related('tags')))
+
+    @staticmethod
+    def archive_candidates(version_group, keep=None, older_than=None):
+        """Ids of a card's hot versions that the retention policy lets go, oldest first.
+
+        All but the `keep` most recent superseded versions, and with `older_than` only
+        those last updated before that datetime. Versions a daily card, usage log or
+        user's favorites points to stay in the hot table.
+        """
+        if keep is None:
+            keep = VersionHistory.hot_history_limit()
+        candidates = (
+            VersionHistory._unreferenced(Flashcard.objects.filter(version_group=version_group, is_live=False))
+            .order_by('-version_number')
+            .values_list('pk', 'updated_at')[keep:]
+        )
+        return [pk for pk, updated_at in reversed(candidates) if older_than is None or updated_at < older_than]
+
+    @staticmethod
+    def _unreferenced(cards):
+        """Versions no daily card, usage log or favorite points to; deleting those would cascade."""
+        return (
+            cards.exclude(pk__in=DailyCard.objects.values('card_id'))
+            .exclude(pk__in=CardUsageLog.objects.values('card_id'))
+            .exclude(favorited_by__isnull=False)
+        )
+
+    @staticmethod
+    def archive(cards):
+        """Move superseded versions of one card from the hot table into delta storage."""
+        from .image_references import ImageReferenceService, image_names
+
+        if not cards:
+            return 0
+        cards = sorted(cards, key=lambda card: card.version_number)
+        version_group = cards[0].version_group
+        if any(card.is_live or card.version_group != version_group for card in cards):
+            raise ValueError("Only superseded versions of a single card can be archived")
+
+        with transaction.atomic():
+            # Locking the rows blocks new favorites of them; versions referenced since the candidates were chosen stay
+            unreferenced = set(VersionHistory._unreferenced(
+                Flashcard.objects.select_for_update().filter(pk__in=[card.pk for card in cards])
+            ).values_list('pk', flat=True))
+            cards = [card for card in cards if card.pk in unreferenced]
+            if not cards:
+                return 0
+            existing = list(
+                FlashcardRevision.objects.select_for_update().filter(version_group=version_group).order_by('version_number')
+            )
+            rebuilt = list(zip(existing, VersionHistory._contents(existing)))
+            entries = [(card, card_content(card)) for card in cards]
+
+            if existing and existing[-1].version_number > cards[0].version_number:
+                # Versions older than archived ones change the delta chain, so re-encode all of it
+                FlashcardRevision.objects.filter(pk__in=[revision.pk for revision in existing]).delete()
+                entries = sorted(rebuilt + entries, key=lambda entry: entry[0].version_number)
+                previous, since_snapshot = None, 0
+            elif existing:
+                previous = rebuilt[-1][1]
+                since_snapshot = len(existing) - 1 - max(
+                    index for index, revision in enumerate(existing) if revision.is_snapshot
+                )
+            else:
+                previous, since_snapshot = None, 0
+
+            revisions = []
+            for source, content in entries:
+                is_snapshot = previous is None or since_snapshot >= SNAPSHOT_INTERVAL - 1
+                since_snapshot = 0 if is_snapshot else since_snapshot + 1
+                revisions.append(FlashcardRevision(
+                    version_group=version_group,
+                    version_number=source.version_number,
+                    is_snapshot=is_snapshot,
+                    content=content if is_snapshot else content_delta(previous, content),
+                    created_by_id=source.created_by_id,
+                    created_at=source.created_at,
+                    updated_at=source.updated_at,
+                    is_active=source.is_active,
+                ))
+                previous = content
+            FlashcardRevision.objects.bulk_create(revisions)
+            # The revisions now reference the images; deleting the rows drops their references
+            ImageReferenceService.add(image_names(cards))
+            Flashcard.objects.filter(pk__in=[card.pk for card in cards], is_live=False).delete()
+        return len(cards)
+
+    @staticmethod
+    def _contents(revisions):
+        """Full content of each revision of one card, ordered by version number and starting at a snapshot."""
+        contents = []
+        content = None
+        for revision in revisions:
+            content = revision.content if revision.is_snapshot else apply_content_delta(content, revision.content)
+            contents.append(content)
+        return contents
+
+    @staticmethod
+    def _rebuild(revisions):
+        """ArchivedVersions for revisions of one card ordered by version number, starting at a snapshot."""
+        revisions = list(revisions)
+        contents = VersionHistory._contents(revisions)
+        tag_ids = {tag_id for content in contents for tag_id in content['tags']}
+        tags_by_id = Tag.objects.in_bulk(tag_ids) if tag_ids else {}
+        return [ArchivedVersion(revision, content, tags_by_id) for revision, content in zip(revisions, contents)]
+
+    @staticmethod
+    def _text_changes(old, new):
+        """Word level edit script turning `old` into `new`."""
+        old_tokens = TEXT_TOKEN_PATTERN.findall(old)
+        new_tokens = TEXT_TOKEN_PATTERN.findall(new)
+        changes = []
+        matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                changes.append({'op': 'equal', 'text': ''.join(old_tokens[i1:i2])})
+                continue
+            if i2 > i1:
+                changes.append({'op': 'delete', 'text': ''.join(old_tokens[i1:i2])})
+            if j2 > j1:
+                changes.append({'op': 'insert', 'text': ''.join(new_tokens[j1:j2])})
+        return changes
@@ -0,0 +1,156 @@
+"""
+Reference counts of card image files and removal of unreferenced ones.
+
+Card versions share image files (see flashcards.storage), so a file can only be
+deleted once no hot or archived version uses it. StoredImage.ref_count is
+adjusted in bulk as versions are created, archived and deleted. Paths that
+bypass those hooks (editing a version's image in place, deleting revisions) can
+leave counts off, so collect() recounts every reference before it deletes
+anything, and files are only deleted after going unreferenced for a grace period
+that covers uploads whose card has not been saved yet.
+"""
+import posixpath
+from collections import Counter
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .history import apply_content_delta
+from .models import Flashcard, FlashcardRevision, ImageDerivativeSet, StoredImage, image_storage
+
+IMAGE_FIELDS = ('front_image', 'back_image')
+IMAGE_DIRECTORY = 'flashcard_images'
+DEFAULT_GRACE = timedelta(hours=1)
+DEFAULT_BATCH_SIZE = 500
+
+
+def image_names(cards):
+    """Storage names of the front and back images of card versions, once per use."""
+    return [image.name for card in cards for image in (getattr(card, field) for field in IMAGE_FIELDS) if image]
+
+
+class ImageReferenceService:
+    """Counting references to card image files and deleting unreferenced files."""
+
+    @staticmethod
+    def add(names):
+        ImageReferenceService._adjust(Counter(names), 1)
+
+    @staticmethod
+    def remove(names):
+        ImageReferenceService._adjust(Counter(names), -1)
+
+    @staticmethod
+    def _adjust(counts, sign):
+        if not counts:
+            return
+        StoredImage.objects.bulk_create([StoredImage(name=name) for name in counts], ignore_conflicts=True)
+        by_count = {}
+        for name, count in counts.items():
+            by_count.setdefault(count, []).append(name)
+        now = timezone.now()
+        for count, names in by_count.items():
+            StoredImage.objects.filter(name__in=names).update(ref_count=F('ref_count') + sign * count, updated_at=now)
+
+    @staticmethod
+    def count_references():
+        """Counter of image name -> hot and archived versions using it, read from the card tables."""
+        counts = Counter()
+        for names in Flashcard.objects.values_list(*IMAGE_FIELDS).iterator(chunk_size=DEFAULT_BATCH_SIZE):
+            counts.update(name for name in names if name)
+
+        # Archived versions store images in a snapshot or, when changed, in a delta
+        group, content = None, None
+        revisions = FlashcardRevision.objects.order_by('version_group', 'version_number').values_list(
+            'version_group', 'is_snapshot', 'content'
+        )
+        for version_group, is_snapshot, revision_content in revisions.iterator(chunk_size=DEFAULT_BATCH_SIZE):
+            if is_snapshot or version_group != group:
+                content = revision_content
+            else:
+                content = apply_content_delta(content, revision_content)
+            group = version_group
+            counts.update(content.get(field) for field in IMAGE_FIELDS if content.get(field))
+        return counts
+
+    @staticmethod
+    def recount(batch_size=DEFAULT_BATCH_SIZE):
+        """Correct every stored reference count, registering referenced files missing from StoredImage.
+
+        Returns the number of counts changed.
+        """
+        counts = ImageReferenceService.count_references()
+        StoredImage.objects.bulk_create(
+            [StoredImage(name=name) for name in counts], ignore_conflicts=True, batch_size=batch_size
+        )
+        wrong = {}
+        for name, ref_count in StoredImage.objects.values_list('name', 'ref_count').iterator(chunk_size=batch_size):
+            if ref_count != counts.get(name, 0):
+                wrong.setdefault(counts.get(name, 0), []).append(name)
+        now = timezone.now()
+        for ref_count, names in wrong.items():
+            for start in range(0, len(names), batch_size):
+                StoredImage.objects.filter(name__in=names[start:start + batch_size]).update(
+                    ref_count=ref_count, updated_at=now
+                )
+        return sum(len(names) for names in wrong.values())
+
+    @staticmethod
+    def garbage(grace=DEFAULT_GRACE, untracked=False):
+        """Names of image files that can be deleted, after a recount.
+
+        With `untracked`, files in the image directory that StoredImage does not know
+        (uploaded before reference counting, or left over by an interrupted write)
+        are included too.
+        """
+        cutoff = timezone.now() - grace
+        names = list(
+            StoredImage.objects.filter(ref_count__lte=0, updated_at__lt=cutoff)
+            .order_by('name').values_list('name', flat=True)
+        )
+        if untracked:
+            known = set(StoredImage.objects.values_list('name', flat=True))
+            names += sorted(
+                name for name in ImageReferenceService._stored_files(IMAGE_DIRECTORY)
+                if name not in known and image_storage.get_modified_time(name) < cutoff
+            )
+        return names
+
+    @staticmethod
+    def collect(names, batch_size=DEFAULT_BATCH_SIZE):
+        """Delete image files (and their derivatives) that are still unreferenced. Returns (files, bytes) deleted."""
+        files = freed = 0
+        for start in range(0, len(names), batch_size):
+            batch = names[start:start + batch_size]
+            with transaction.atomic():
+                # A version created since the recount makes its image referenced again
+                referenced = set(
+                    StoredImage.objects.select_for_update().filter(name__in=batch, ref_count__gt=0)
+                    .values_list('name', flat=True)
+                )
+                batch = [name for name in batch if name not in referenced]
+                StoredImage.objects.filter(name__in=batch).delete()
+                derivative_sets = list(ImageDerivativeSet.objects.filter(source__in=batch))
+                ImageDerivativeSet.objects.filter(pk__in=[derivative_set.pk for derivative_set in derivative_sets]).delete()
+            for name in batch:
+                if image_storage.exists(name):
+                    freed += image_storage.size(name)
+                    image_storage.delete(name)
+                    files += 1
+            for derivative_set in derivative_sets:
+                for variant in derivative_set.variants:
+                    if default_storage.exists(variant['name']):
+                        freed += default_storage.size(variant['name'])
+                        default_storage.delete(variant['name'])
+        return files, freed
+
+    @staticmethod
+    def _stored_files(directory):
+        if not image_storage.exists(directory):
+            return
+        subdirectories, files = image_storage.listdir(directory)
+        for name in files:
+            yield posixpath.join(directory, name)
+        for subdirectory in subdirectories:
+            yield from ImageReferenceService._stored_files(posixpath.join(directory, subdirectory))
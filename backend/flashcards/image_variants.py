@@ -0,0 +1,62 @@
+"""
+Resizing card images into derivatives with Pillow.
+
+Nothing here touches Django, so the same function runs in the upload thread pool
+and in the process pool of the backfill command; callers pass in the original's
+bytes and store the results.
+"""
+import hashlib
+import io
+import PIL
+from PIL import Image, ImageOps
+
+# Derivative format -> (Pillow format, file extension, content type)
+FORMATS = {
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+    'png': ('PNG', 'png', 'image/png'),
+}
+
+QUALITY = 82
+
+# Bump when render_variants produces different bytes for the same input and width
+RENDER_VERSION = 1
+# Digest of everything besides the width that decides a derivative's bytes, used in its
+# file name so changed output gets a new URL instead of replacing a browser-cached file
+VARIANT_TAG = hashlib.sha256(repr((RENDER_VERSION, QUALITY, sorted(FORMATS.items()), PIL.__version__)).encode()).hexdigest()[:8]
+
+
+def fallback_format(image):
+    """Widely supported format for browsers without WebP: PNG if the image has transparency."""
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        return 'png'
+    return 'jpeg'
+
+
+def render_variants(data, widths):
+    """Resize image bytes to each width narrower than the original, as WebP and a fallback format.
+
+    A full-size WebP is added as well; the original itself is the full-size fallback.
+    Returns ((width, height) of the original, [(width, height, format, bytes), ...]).
+    Raises PIL.UnidentifiedImageError (an OSError) for data that is not an image, OSError
+    for truncated files and Image.DecompressionBombError for oversized ones.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        # Apply the camera's EXIF rotation before sizing, since derivatives drop the EXIF data
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    formats = ['webp', fallback_format(image)]
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if formats[1] == 'png' else 'RGB')
+
+    variants = []
+    for width in sorted({width for width in widths if width < image.width} | {image.width}):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for name in formats if width < image.width else ['webp']:
+            pillow_format = FORMATS[name][0]
+            output = io.BytesIO()
+            frame = resized.convert('RGB') if name == 'jpeg' else resized
+            frame.save(output, pillow_format, quality=QUALITY, optimize=True)
+            variants.append((width, height, name, output.getvalue()))
+    return (image.width, image.height), variants
@@ -0,0 +1,159 @@
+"""
+Derivative images (smaller sizes and WebP) for card front and back images.
+
+When a saved card version references an image file that has no derivatives yet,
+resizing is queued on a per-process thread pool once the transaction commits, so
+the upload request returns without waiting for Pillow. Derivatives are stored
+under DERIVATIVES_DIR, recorded in ImageDerivativeSet and exposed by the card
+serializers as srcset strings per content type. Cards whose JSON was cached
+before their derivatives existed are evicted from the payload caches.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Q
+from .image_variants import FORMATS, VARIANT_TAG, render_variants
+from .models import Flashcard, ImageDerivativeSet, image_storage
+from .payload_cache import get_payload_cache
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'derived'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def derivative_name(source, width, image_format):
+    """Storage name of one derivative, e.g. derived/flashcard_images/pose-320w-1f0c9a2e.webp."""
+    stem = os.path.splitext(source)[0]
+    return f'{DERIVATIVES_DIR}/{stem}-{width}w-{VARIANT_TAG}.{FORMATS[image_format][1]}'
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.CARD_IMAGE_WORKERS, thread_name_prefix='image-derivatives')
+        return _pool
+
+
+class ImageDerivativeService:
+    """Creating and looking up derivatives of card images."""
+
+    @staticmethod
+    def image_names(cards, fields=('front_image', 'back_image')):
+        """Storage names of the images in `fields` of some cards."""
+        return {image.name for card in cards for image in (getattr(card, field) for field in fields) if image}
+
+    @staticmethod
+    def schedule(names):
+        """Queue derivative generation for images that have none yet, after the current transaction commits."""
+        names = set(names)
+        if not names:
+            return
+        existing = set(ImageDerivativeSet.objects.filter(source__in=names).values_list('source', flat=True))
+        missing = sorted(names - existing)
+        if not missing:
+            return
+        ImageDerivativeSet.objects.bulk_create([ImageDerivativeSet(source=name) for name in missing], ignore_conflicts=True)
+        transaction.on_commit(
+            lambda: [_get_pool().submit(ImageDerivativeService._generate_in_background, name) for name in missing]
+        )
+
+    @staticmethod
+    def _generate_in_background(source):
+        try:
+            ImageDerivativeService.generate(source)
+        finally:
+            # Pool threads are reused; do not keep their connections open between jobs
+            connections.close_all()
+
+    @staticmethod
+    def generate(source):
+        """Render and store the derivatives of one image. Returns its ImageDerivativeSet.
+
+        Any error (unreadable or truncated files, decompression bombs, storage
+        failures) marks the set FAILED instead of leaving it pending.
+        """
+        try:
+            with image_storage.open(source, 'rb') as file:
+                data = file.read()
+            size, variants = render_variants(data, settings.CARD_IMAGE_WIDTHS)
+            return ImageDerivativeService.store(source, size, variants)
+        except Exception as error:
+            logger.warning('Could not create derivatives of %s', source, exc_info=True)
+            return ImageDerivativeService.record_failure(source, error)
+
+    @staticmethod
+    def store(source, size, variants):
+        """Save rendered variants of `source` and mark its derivative set ready, deleting replaced ones."""
+        previous = ImageDerivativeSet.objects.filter(source=source).values_list('variants', flat=True).first() or []
+        stored = []
+        for width, height, image_format, content in variants:
+            name = derivative_name(source, width, image_format)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(content))
+            stored.append({'width': width, 'height': height, 'format': image_format, 'name': name})
+        ImageDerivativeSet.objects.update_or_create(
+            source=source,
+            defaults={'width': size[0], 'height': size[1], 'variants': stored, 'status': ImageDerivativeSet.READY, 'error': ''},
+        )
+        ImageDerivativeService.evict_cards(source)
+        # Other widths or rendering parameters leave files under names no longer in use
+        current = {variant['name'] for variant in stored}
+        for variant in previous:
+            if variant['name'] not in current:
+                default_storage.delete(variant['name'])
+        return ImageDerivativeSet.objects.get(source=source)
+
+    @staticmethod
+    def record_failure(source, error):
+        derivative_set, _ = ImageDerivativeSet.objects.update_or_create(
+            source=source, defaults={'status': ImageDerivativeSet.FAILED, 'error': str(error)[:1000]}
+        )
+        return derivative_set
+
+    @staticmethod
+    def evict_cards(source):
+        """Drop cached JSON of card versions using `source`, rendered before its derivatives existed."""
+        from .services import DailyCardService
+
+        card_ids = Flashcard.objects.filter(Q(front_image=source) | Q(back_image=source)).values_list('id', flat=True)
+        payload_cache = get_payload_cache()
+        for card_id in card_ids:
+            payload_cache.evict(card_id)
+        DailyCardService.invalidate_payload()
+
+    @staticmethod
+    def srcsets(names, request=None):
+        """Map image names with ready derivatives to {content type: srcset string}.
+
+        The full-size fallback in each srcset is the original file. URLs are absolute
+        when a request is given, like those of the image fields themselves.
+        """
+        def url(name, storage=default_storage):
+            location = storage.url(name)
+            return request.build_absolute_uri(location) if request else location
+
+        result = {}
+        for derivative_set in ImageDerivativeSet.objects.filter(source__in=set(names), status=ImageDerivativeSet.READY):
+            candidates = {}
+            for variant in derivative_set.variants:
+                candidates.setdefault(variant['format'], []).append((variant['width'], url(variant['name'])))
+            fallback = [image_format for image_format in candidates if image_format != 'webp']
+            if derivative_set.width:
+                candidates.setdefault(fallback[0] if fallback else 'jpeg', []).append(
+                    (derivative_set.width, url(derivative_set.source, image_storage))
+                )
+            result[derivative_set.source] = {
+                FORMATS[image_format][2]: ', '.join(f'{location} {width}w' for width, location in sorted(entries))
+                for image_format, entries in candidates.items()
+            }
+        return result
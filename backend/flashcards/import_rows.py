@@ -0,0 +1,129 @@
+"""
+Reading and validating card rows for import_cards.
+
+Nothing here touches Django, so process pool workers can parse shards of the input
+without setting it up; field length limits are passed in by the caller.
+"""
+import csv
+import gzip
+import json
+import os
+
+REQUIRED_COLUMNS = ['title', 'definition']
+
+FORMATS = ['csv', 'jsonl']
+
+# File extensions (after stripping .gz) mapped to input formats
+FORMAT_EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl'}
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class ImportRowError(Exception):
+    """A row that cannot be imported, with the line number it came from."""
+
+    def __init__(self, row_number, message):
+        self.row_number = row_number
+        super().__init__(message)
+
+
+def detect_format(path):
+    """Input format from the file name, e.g. "cards.jsonl.gz" -> "jsonl"; CSV by default."""
+    name = path[:-3] if path.endswith('.gz') else path
+    return FORMAT_EXTENSIONS.get(os.path.splitext(name)[1].lower(), 'csv')
+
+
+def open_input(path):
+    """Open a text input file, transparently decompressing gzip files."""
+    with open(path, 'rb') as file:
+        compressed = file.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_rows(file, input_format):
+    """Yield (row number, raw row) pairs as numbered in the file."""
+    if input_format == 'jsonl':
+        return read_jsonl_rows(file)
+    return read_csv_rows(file)
+
+
+def read_csv_rows(file):
+    """Yield (row number, row dict) from an open CSV file, numbered as in the file (header is row 1)."""
+    reader = csv.DictReader(file)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f'CSV must contain columns: {", ".join(REQUIRED_COLUMNS)}')
+    for row_number, row in enumerate(reader, start=2):
+        yield row_number, row
+
+
+def read_jsonl_rows(file):
+    """Yield (line number, undecoded line) for each non-blank line; decoding happens in parse_row."""
+    for row_number, line in enumerate(file, start=1):
+        if line.strip():
+            yield row_number, line
+
+
+def parse_row(row_number, row, limits):
+    """Strip and validate one input row into card fields, or raise ImportRowError.
+
+    `row` is a CSV row dict or a JSON object line; `limits` maps 'title', 'phrase'
+    and 'tag' to their maximum lengths. Returns None for superseded versions in a
+    history export (`is_live` false), so such an export imports as its live cards.
+    """
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except ValueError as error:
+            raise ImportRowError(row_number, f'invalid JSON ({error})')
+        if not isinstance(row, dict):
+            raise ImportRowError(row_number, 'expected a JSON object')
+
+    if str(row.get('is_live', True)).lower() in ('false', '0'):
+        return None
+
+    title = str(row.get('title') or '').strip()
+    phrase = str(row.get('phrase') or '').strip()
+    definition = str(row.get('definition') or '').strip()
+    tags = row.get('tags') or ''
+    if isinstance(tags, str):
+        tags = tags.split(',')
+
+    if not title or not definition:
+        raise ImportRowError(row_number, 'missing title or definition')
+    for field, value in (('title', title), ('phrase', phrase)):
+        if len(value) > limits[field]:
+            raise ImportRowError(row_number, f'{field} is longer than {limits[field]} characters')
+
+    tag_names = list(dict.fromkeys(str(name).strip() for name in tags if name and str(name).strip()))
+    for name in tag_names:
+        if len(name) > limits['tag']:
+            raise ImportRowError(row_number, f'tag "{name[:20]}..." is longer than {limits["tag"]} characters')
+
+    return {
+        'row_number': row_number,
+        'title': title,
+        'phrase': phrase,
+        'definition': definition,
+        'tag_names': tag_names,
+    }
+
+
+def parse_shard(shard, limits):
+    """Parse a list of (row number, raw row) pairs in a worker process.
+
+    Returns (cards, errors) with errors as (row number, message) pairs, which
+    unlike ImportRowError survive pickling back to the parent process.
+    """
+    cards = []
+    errors = []
+    for row_number, row in shard:
+        try:
+            card = parse_row(row_number, row, limits)
+        except ImportRowError as error:
+            errors.append((row_number, str(error)))
+            continue
+        cards.append(card if card is not None else {'row_number': row_number, 'historical': True})
+    return cards, errors
@@ -0,0 +1,341 @@
+"""
+Streaming bulk import of cards.
+
+Rows are read lazily and written in batches: each batch resolves its titles and
+tags with a few bulk queries and is committed in one transaction with bulk inserts.
+Bulk writes skip model signals, so the daily schedule and search index are
+refreshed explicitly after each batch, and the caches of every worker are
+invalidated once the import stops, whether it finished or failed. A checkpoint file records the last committed
+row so a crashed import can resume where it stopped.
+
+With workers, parsing and validation run in a process pool on shards of the input
+while the main process writes the previous batches, consuming results in input
+order so row numbers, "last row wins" and checkpoints behave exactly as in serial mode.
+"""
+import json
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.db import transaction
+from .image_references import ImageReferenceService, image_names
+from .import_rows import ImportRowError, parse_row, parse_shard
+from .models import Flashcard, Tag, VersionConflict
+from .payload_cache import get_payload_cache
+from .search import get_search_backend
+from .services import DailyCardService
+from .suggest import invalidate_suggest_index
+from yoga_flashcards.metrics import IMPORT_BATCH_TIME, IMPORT_ROWS
+
+DEFAULT_BATCH_SIZE = 500
+
+# Rows per shard handed to a parser process, and shards in flight per worker before reading pauses
+DEFAULT_SHARD_SIZE = 2000
+SHARDS_PER_WORKER = 2
+
+# Attempts per batch when a card is edited concurrently while it is being imported
+BATCH_ATTEMPTS = 3
+
+
+def field_limits():
+    """Maximum lengths parse_row validates against, read from the models."""
+    return {
+        'title': Flashcard._meta.get_field('title').max_length,
+        'phrase': Flashcard._meta.get_field('phrase').max_length,
+        'tag': Tag._meta.get_field('name').max_length,
+    }
+
+
+class ImportCheckpoint:
+    """Last committed row of an import, stored next to the input so a rerun can skip ahead."""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+
+    def load(self):
+        """Return the saved checkpoint for this input, or None. Raises ValueError if the input changed."""
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return None
+        if state.get('source') != self.source or state.get('fingerprint') != self._fingerprint():
+            raise ValueError(f'Checkpoint {self.path} was written for a different or modified input file')
+        return state
+
+    def save(self, row_number, stats):
+        state = {
+            'source': self.source,
+            'fingerprint': self._fingerprint(),
+            'row_number': row_number,
+            'stats': stats,
+        }
+        # Write then rename so a crash never leaves a half-written checkpoint
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _fingerprint(self):
+        stat = os.stat(self.source)
+        return [stat.st_size, int(stat.st_mtime)]
+
+
+class CardImporter:
+    """Writes parsed card rows to the database in batches, one transaction per batch.
+
+    Rows whose title matches a live card get a new version of that card (keeping its
+    existing tags and images and adding the row's tags), unless the resulting content
+    hash equals the live version's, in which case nothing is written. Other rows become
+    new cards. Within a batch, the last row for a title wins.
+    """
+
+    def __init__(self, user, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, checkpoint=None, on_batch=None, on_row_error=None,
+                 shard_size=DEFAULT_SHARD_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.shard_size = shard_size
+        self.dry_run = dry_run
+        self.checkpoint = checkpoint
+        self.on_batch = on_batch
+        self.on_row_error = on_row_error
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        self.started = None
+        # Rows read by this run, excluding those counted before a resume
+        self.rows_read = 0
+
+    def run(self, rows, start_after=0, workers=0):
+        """Import (row number, row) pairs, skipping rows up to `start_after`. Returns the stats.
+
+        With more than one worker, rows are parsed in a process pool.
+        """
+        self.started = time.perf_counter()
+        rows = ((row_number, row) for row_number, row in rows if row_number > start_after)
+        parsed = self._parse_in_pool(rows, workers) if workers > 1 else self._parse(rows)
+
+        batch = []
+        try:
+            for card in parsed:
+                self.stats['rows'] += 1
+                self.rows_read += 1
+                if isinstance(card, ImportRowError):
+                    self.skip(card)
+                    continue
+                if card is None:
+                    # Superseded version from a history export
+                    self.stats['skipped'] += 1
+                    continue
+                batch.append(card)
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+        finally:
+            if not self.dry_run:
+                # Also when the import fails partway, so the batches it committed are not hidden by stale caches
+                self.invalidate_caches()
+
+        if not self.dry_run:
+            self.finish()
+        return self.stats
+
+    def _parse(self, rows):
+        """Parsed cards, or ImportRowErrors for invalid rows, in input order."""
+        limits = field_limits()
+        for row_number, row in rows:
+            try:
+                yield parse_row(row_number, row, limits)
+            except ImportRowError as error:
+                yield error
+
+    def _parse_in_pool(self, rows, workers):
+        """Same as _parse, with shards parsed in worker processes.
+
+        At most SHARDS_PER_WORKER shards per worker are in flight; reading the input
+        waits for the oldest shard once the writer falls behind.
+        """
+        limits = field_limits()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque()
+            shard = []
+            for row in rows:
+                shard.append(row)
+                if len(shard) >= self.shard_size:
+                    in_flight.append(pool.submit(parse_shard, shard, limits))
+                    shard = []
+                    if len(in_flight) >= workers * SHARDS_PER_WORKER:
+                        yield from self._shard_results(in_flight.popleft())
+            if shard:
+                in_flight.append(pool.submit(parse_shard, shard, limits))
+            while in_flight:
+                yield from self._shard_results(in_flight.popleft())
+
+    @staticmethod
+    def _shard_results(future):
+        cards, errors = future.result()
+        results = [(card['row_number'], None if card.get('historical') else card) for card in cards]
+        results += [(row_number, ImportRowError(row_number, message)) for row_number, message in errors]
+        for _, result in sorted(results, key=lambda result: result[0]):
+            yield result
+
+    def rows_per_second(self):
+        elapsed = time.perf_counter() - self.started
+        return self.rows_read / elapsed if elapsed > 0 else 0.0
+
+    def skip(self, error):
+        self.stats['skipped'] += 1
+        if not self.dry_run:
+            IMPORT_ROWS.labels('skipped').inc()
+        if self.on_row_error:
+            self.on_row_error(error)
+
+    def import_batch(self, batch):
+        """Write one batch in its own transaction and refresh what the bulk writes bypass."""
+        started = time.perf_counter()
+        by_title = {}
+        for card in batch:
+            if card['title'] in by_title:
+                self.skip(ImportRowError(by_title[card['title']]['row_number'], f'superseded by row {card["row_number"]} with the same title'))
+            by_title[card['title']] = card
+        cards = list(by_title.values())
+
+        for attempt in range(1, BATCH_ATTEMPTS + 1):
+            try:
+                created, updated, unchanged = self._write_batch(cards)
+                break
+            except VersionConflict:
+                # A curator published one of these cards meanwhile; resolve the batch again
+                if attempt == BATCH_ATTEMPTS:
+                    raise
+
+        self.stats['created'] += len(created)
+        self.stats['updated'] += len(updated)
+        self.stats['unchanged'] += len(unchanged)
+        if not self.dry_run:
+            if created or updated:
+                self._refresh(created, updated)
+            if self.checkpoint:
+                self.checkpoint.save(batch[-1]['row_number'], self.stats)
+            IMPORT_ROWS.labels('created').inc(len(created))
+            IMPORT_ROWS.labels('updated').inc(len(updated))
+            IMPORT_ROWS.labels('unchanged').inc(len(unchanged))
+            IMPORT_BATCH_TIME.observe(time.perf_counter() - started)
+        if self.on_batch:
+            self.on_batch(batch[-1]['row_number'], self.stats, self.rows_per_second())
+
+    def invalidate_caches(self):
+        """Tell every worker its cached cards, payloads and typeahead index are stale."""
+        if self.stats['created'] or self.stats['updated']:
+            get_payload_cache().clear()
+            DailyCardService.invalidate_payload()
+            invalidate_suggest_index()
+
+    def finish(self):
+        """Drop the checkpoint once every row has been imported."""
+        if self.checkpoint:
+            self.checkpoint.clear()
+
+    def _write_batch(self, cards):
+        """Insert new cards and versions for a batch. Returns the version groups created, updated and left unchanged."""
+        with transaction.atomic():
+            live = {
+                card.title: card
+                for card in Flashcard.objects.filter(
+                    title__in=[card['title'] for card in cards], is_live=True, is_active=True
+                ).order_by('updated_at').only(
+                    'id', 'title', 'version_group', 'version_number', 'front_image', 'back_image', 'content_hash'
+                )
+            }
+            current_tags = {}
+            for flashcard_id, tag_name in Flashcard.tags.through.objects.filter(
+                flashcard_id__in=[card.pk for card in live.values()]
+            ).values_list('flashcard_id', 'tag__name'):
+                current_tags.setdefault(flashcard_id, set()).add(tag_name)
+            tag_names = self._existing_tag_names({name for card in cards for name in card['tag_names']})
+
+            versions = []
+            version_tags = {}
+            demote = []
+            unchanged = []
+            for card in cards:
+                current = live.get(card['title'])
+                names = (current_tags.get(current.pk, set()) if current else set()) | {
+                    tag_names.get(name.lower(), name) for name in card['tag_names']
+                }
+                content_hash = Flashcard.fingerprint(card['title'], card['phrase'], card['definition'], names)
+                if current and current.content_hash == content_hash:
+                    unchanged.append(current.version_group)
+                    continue
+                version = Flashcard(
+                    title=card['title'],
+                    phrase=card['phrase'],
+                    definition=card['definition'],
+                    content_hash=content_hash,
+                    created_by=self.user,
+                    version_group=current.version_group if current else uuid.uuid4(),
+                    version_number=current.version_number + 1 if current else 1,
+                    front_image=current.front_image if current else None,
+                    back_image=current.back_image if current else None,
+                    is_live=True,
+                    is_active=True,
+                )
+                version.update_search_keys()
+                versions.append(version)
+                version_tags[version.version_group] = names
+                if current:
+                    demote.append(current)
+
+            created = [version.version_group for version in versions if version.version_number == 1]
+            updated = [card.version_group for card in demote]
+            if self.dry_run or not versions:
+                return created, updated, unchanged
+
+            if demote:
+                # Same conditional demotion create_new_version uses
+                demoted = Flashcard.objects.filter(pk__in=[card.pk for card in demote], is_live=True).update(is_live=False)
+                if demoted != len(demote):
+                    raise VersionConflict(demote[0].version_group, demote[0].version_number)
+
+            tag_ids = self._resolve_tags({name for names in version_tags.values() for name in names})
+            Flashcard.objects.bulk_create(versions, batch_size=self.batch_size)
+            ImageReferenceService.add(image_names(versions))
+            # bulk_create does not return ids on every database, so look the new rows up
+            new_ids = dict(
+                Flashcard.objects.filter(version_group__in=list(version_tags), is_live=True).values_list('version_group', 'id')
+            )
+            Flashcard.tags.through.objects.bulk_create([
+                Flashcard.tags.through(flashcard_id=new_ids[version_group], tag_id=tag_ids[name])
+                for version_group, names in version_tags.items()
+                for name in names
+            ], batch_size=self.batch_size)
+        return created, updated, unchanged
+
+    @staticmethod
+    def _existing_tag_names(names):
+        """Map lowercased names to the spelling of existing tags, so hashes match what gets stored."""
+        return {name.lower(): name for name in Tag.objects.filter(name__in=names).values_list('name', flat=True)}
+
+    def _resolve_tags(self, names):
+        """Map tag names to ids, creating the missing tags in bulk."""
+        existing = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+        missing = names - set(existing)
+        if missing:
+            Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+            existing.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+        # Case-insensitive collations (MySQL) match "asana" to an existing "Asana"
+        folded = {name.lower(): tag_id for name, tag_id in existing.items()}
+        return {name: existing.get(name, folded.get(name.lower())) for name in names}
+
+    def _refresh(self, created, updated):
+        if created:
+            DailyCardService.schedule_cards(created)
+        get_search_backend().index_cards(
+            Flashcard.objects.filter(version_group__in=created + updated, is_live=True).prefetch_related('tags')
+        )
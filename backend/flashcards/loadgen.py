@@ -0,0 +1,306 @@
+"""
+Synthetic catalog for load testing (see the generate_load_data command).
+
+Every value is drawn from one random.Random(seed), so the same seed and volumes
+produce the same cards, tags, version histories, users, favorites and usage log.
+Tag popularity follows a Zipf-like curve and history depth a long-tailed one, so
+a few tags cover thousands of cards and a few cards have very deep histories, as
+in production. Rows are written with bulk_create; like the importer, the daily
+schedule, search index and caches are refreshed explicitly afterwards.
+
+Generated users, tags and cards are recognizable by LOAD_PREFIX and can be
+removed again with LoadDataGenerator.clear().
+"""
+import math
+import random
+import uuid
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from users.models import UserProfile
+from .models import CardUsageLog, DailyCardSchedule, Flashcard, FlashcardRevision, Tag
+from .payload_cache import get_payload_cache
+from .search import get_search_backend
+from .services import DailyCardService
+from .suggest import invalidate_suggest_index
+
+User = get_user_model()
+
+LOAD_PREFIX = 'load-'
+LOAD_PASSWORD = 'load-password'
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Share of cards given a history between half and all of max_versions
+DEEP_HISTORY_SHARE = 0.02
+# Share of generated users who are curators and create cards
+CURATOR_SHARE = 0.05
+
+WORDS = [
+    'breath', 'balance', 'spine', 'hip', 'shoulder', 'ground', 'lengthen', 'twist', 'fold', 'open',
+    'steady', 'ease', 'awareness', 'root', 'crown', 'heart', 'centre', 'flow', 'hold', 'release',
+    'inhale', 'exhale', 'gaze', 'stillness', 'strength', 'softness', 'practice', 'focus', 'energy', 'posture',
+    'extend', 'rotate', 'lift', 'press', 'settle', 'align', 'stretch', 'rest', 'sequence', 'intention',
+]
+SANSKRIT = [
+    'adho', 'mukha', 'śvāna', 'āsana', 'vṛkṣa', 'tāḍa', 'prāṇa', 'yāma', 'bhujaṅga', 'trikoṇa',
+    'vīra', 'bhadra', 'śava', 'bāla', 'utthita', 'pārśva', 'ardha', 'candra', 'nāḍī', 'śodhana',
+    'dhyāna', 'dhāraṇā', 'samādhi', 'niyama', 'ahiṃsā', 'satya', 'santoṣa', 'tapas', 'svādhyāya', 'kapha',
+]
+TAG_WORDS = [
+    'asana', 'pranayama', 'meditation', 'philosophy', 'anatomy', 'sanskrit', 'standing', 'seated', 'inversion',
+    'backbend', 'twist', 'balance', 'restorative', 'beginner', 'advanced', 'ayurveda', 'chakra', 'mantra',
+]
+
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative weights where the item at rank r is drawn about 1/r^exponent as often."""
+    total = 0.0
+    weights = []
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        weights.append(total)
+    return weights
+
+
+class LoadDataGenerator:
+    """Bulk-creates a large, deterministic synthetic catalog."""
+
+    def __init__(self, seed=0, batch_size=DEFAULT_BATCH_SIZE, on_progress=None):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.now = timezone.now().replace(microsecond=0)
+        self.stats = {'users': 0, 'tags': 0, 'cards': 0, 'versions': 0, 'favorites': 0, 'usage_logs': 0}
+
+    @staticmethod
+    def exists():
+        return User.objects.filter(username__startswith=LOAD_PREFIX).exists()
+
+    @staticmethod
+    def clear():
+        """Delete all generated data. Returns the number of users, tags and card groups removed."""
+        with transaction.atomic():
+            version_groups = list(
+                Flashcard.objects.filter(created_by__username__startswith=LOAD_PREFIX).order_by()
+                .values_list('version_group', flat=True).distinct()
+            )
+            for start in range(0, len(version_groups), DEFAULT_BATCH_SIZE):
+                chunk = version_groups[start:start + DEFAULT_BATCH_SIZE]
+                DailyCardSchedule.objects.filter(version_group__in=chunk).delete()
+                FlashcardRevision.objects.filter(version_group__in=chunk).delete()
+            # Cards, usage logs, favorites and search documents cascade from their users
+            users = User.objects.filter(username__startswith=LOAD_PREFIX)
+            tags = Tag.objects.filter(name__startswith=LOAD_PREFIX)
+            user_count, tag_count = users.count(), tags.count()
+            users.delete()
+            tags.delete()
+        LoadDataGenerator._invalidate()
+        return user_count, tag_count, len(version_groups)
+
+    def generate(self, cards, tags, users, tags_per_card=3, avg_versions=3, max_versions=50,
+                 favorites_per_user=10, cycles=3):
+        """Create everything and return the counts written."""
+        user_ids, curator_ids = self._create_users(users)
+        tag_ids = self._create_tags(tags)
+        live_ids, versions = self._create_cards(cards, curator_ids, tag_ids, tags_per_card, avg_versions, max_versions)
+        self._create_favorites(user_ids, live_ids, favorites_per_user)
+        self._create_usage_log(versions, cycles)
+        self._refresh([version_group for version_group, _ in versions])
+        return self.stats
+
+    def _progress(self, message):
+        if self.on_progress:
+            self.on_progress(message, self.stats)
+
+    def _create_users(self, count):
+        """Create `count` users (at least one curator) with profiles. Returns all user ids and curator ids."""
+        password = make_password(LOAD_PASSWORD)
+        curators = max(1, round(count * CURATOR_SHARE))
+        users = [
+            User(
+                username=f'{LOAD_PREFIX}user-{index:06d}',
+                email=f'{LOAD_PREFIX}user-{index:06d}@example.com',
+                password=password,
+                role='curator' if index < curators else 'user',
+                first_name=self.random.choice(WORDS).title(),
+                last_name=self.random.choice(SANSKRIT).title(),
+                daily_email_enabled=self.random.random() < 0.3,
+                email_verified=True,
+            )
+            for index in range(max(count, curators))
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        ids = list(User.objects.filter(username__startswith=LOAD_PREFIX).order_by('username').values_list('id', flat=True))
+        UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in ids], batch_size=self.batch_size)
+        self.stats['users'] = len(ids)
+        self._progress('users')
+        return ids, ids[:curators]
+
+    def _create_tags(self, count):
+        """Create `count` tags, returned most popular first."""
+        names = []
+        for index in range(count):
+            names.append(f'{LOAD_PREFIX}{TAG_WORDS[index % len(TAG_WORDS)]}-{index:05d}')
+        Tag.objects.bulk_create(
+            [Tag(name=name, description=self._sentence(6, 14)) for name in names],
+            batch_size=self.batch_size,
+        )
+        ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+        self.stats['tags'] = len(ids)
+        self._progress('tags')
+        return [(name, ids[name]) for name in names]
+
+    def _create_cards(self, count, curator_ids, tags, tags_per_card, avg_versions, max_versions):
+        """Create `count` card groups with their version histories, in batches.
+
+        Returns the live version ids and, per group, the ids of its versions oldest first.
+        """
+        tag_weights = zipf_weights(len(tags))
+        live_ids = []
+        versions = []
+        for start in range(0, count, self.batch_size):
+            rows = []
+            card_tags = {}
+            for index in range(start, min(start + self.batch_size, count)):
+                version_group = uuid.UUID(int=self.random.getrandbits(128), version=4)
+                depth = self._history_depth(avg_versions, max_versions)
+                names = self._pick_tags(tags, tag_weights, tags_per_card)
+                title = f'{self.random.choice(WORDS).title()} {self.random.choice(WORDS)} {index + 1:06d}'
+                phrase = ' '.join(self.random.choices(SANSKRIT, k=self.random.randint(1, 3))) if self.random.random() < 0.8 else None
+                definition = self._sentence(15, 60)
+                age = self.random.randint(depth, 3 * 365)
+                for version_number in range(1, depth + 1):
+                    if version_number > 1:
+                        definition = self._revise(definition)
+                    # Tags accumulate over the history; the live version has all of them
+                    version_tags = names[:math.ceil(len(names) * version_number / depth)]
+                    created_at = self.now - timedelta(days=age * (depth - version_number) / depth, minutes=self.random.randint(0, 1440))
+                    card = Flashcard(
+                        title=title,
+                        phrase=phrase,
+                        definition=definition,
+                        created_by_id=self.random.choice(curator_ids),
+                        version_group=version_group,
+                        version_number=version_number,
+                        is_live=version_number == depth,
+                        is_active=True,
+                    )
+                    card.update_search_keys()
+                    if card.is_live:
+                        card.content_hash = Flashcard.fingerprint(title, phrase, definition, [name for name, _ in version_tags])
+                    rows.append((card, created_at))
+                    card_tags[(version_group, version_number)] = [tag_id for _, tag_id in version_tags]
+
+            with transaction.atomic():
+                Flashcard.objects.bulk_create([card for card, _ in rows], batch_size=self.batch_size)
+                # bulk_create does not return ids on every database, so look the new rows up
+                ids = {
+                    (version_group, version_number): card_id
+                    for card_id, version_group, version_number in Flashcard.objects.filter(
+                        version_group__in={card.version_group for card, _ in rows}
+                    ).values_list('id', 'version_group', 'version_number')
+                }
+                Flashcard.tags.through.objects.bulk_create([
+                    Flashcard.tags.through(flashcard_id=ids[key], tag_id=tag_id)
+                    for key, tag_ids in card_tags.items()
+                    for tag_id in tag_ids
+                ], batch_size=self.batch_size)
+                # auto_now fields ignore values given to bulk_create; backdate the history afterwards
+                for card, created_at in rows:
+                    card.pk = ids[(card.version_group, card.version_number)]
+                    card.created_at = card.updated_at = created_at
+                Flashcard.objects.bulk_update([card for card, _ in rows], ['created_at', 'updated_at'], batch_size=self.batch_size)
+
+            group_versions = {}
+            for card, _ in rows:
+                group_versions.setdefault(card.version_group, []).append(card.pk)
+                if card.is_live:
+                    live_ids.append(card.pk)
+            versions.extend(group_versions.items())
+            self.stats['cards'] += len(group_versions)
+            self.stats['versions'] += len(rows)
+            self._progress('cards')
+        return live_ids, versions
+
+    def _create_favorites(self, user_ids, live_ids, per_user):
+        """Give each user around `per_user` favorites, skewed towards a popular subset of cards."""
+        if not live_ids or not per_user:
+            return
+        weights = zipf_weights(len(live_ids), exponent=0.8)
+        popularity = self.random.sample(live_ids, len(live_ids))
+        profiles = dict(UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+        through = UserProfile.favorite_cards.through
+        rows = []
+        for user_id in user_ids:
+            count = min(len(live_ids), int(self.random.expovariate(1 / per_user)))
+            picked = dict.fromkeys(self.random.choices(popularity, cum_weights=weights, k=count))
+            rows.extend(through(userprofile_id=profiles[user_id], flashcard_id=card_id) for card_id in picked)
+        through.objects.bulk_create(rows, batch_size=self.batch_size)
+        self.stats['favorites'] = len(rows)
+        self._progress('favorites')
+
+    def _create_usage_log(self, versions, cycles):
+        """Log each card group once per cycle, one per day, ending yesterday.
+
+        Earlier cycles point at earlier versions, as the daily card did at the time.
+        """
+        if not versions or not cycles:
+            return
+        day = self.now.date() - timedelta(days=len(versions) * cycles)
+        rows = []
+        for cycle_number in range(1, cycles + 1):
+            for _, version_ids in self.random.sample(versions, len(versions)):
+                index = max(0, math.ceil(len(version_ids) * cycle_number / cycles) - 1)
+                rows.append(CardUsageLog(card_id=version_ids[index], used_date=day, cycle_number=cycle_number))
+                day += timedelta(days=1)
+        CardUsageLog.objects.bulk_create(rows, batch_size=self.batch_size)
+        self.stats['usage_logs'] = len(rows)
+        self._progress('usage log')
+
+    def _refresh(self, version_groups):
+        """Schedule and index the new cards, which bulk_create did without signals."""
+        for start in range(0, len(version_groups), self.batch_size):
+            chunk = version_groups[start:start + self.batch_size]
+            DailyCardService.schedule_cards(chunk)
+            get_search_backend().index_cards(
+                Flashcard.objects.filter(version_group__in=chunk, is_live=True).prefetch_related('tags')
+            )
+        self._invalidate()
+        self._progress('search index')
+
+    @staticmethod
+    def _invalidate():
+        get_payload_cache().clear()
+        DailyCardService.invalidate_payload()
+        invalidate_suggest_index()
+
+    def _history_depth(self, avg_versions, max_versions):
+        if self.random.random() < DEEP_HISTORY_SHARE:
+            return self.random.randint(max(1, max_versions // 2), max_versions)
+        if avg_versions <= 1:
+            return 1
+        return min(max_versions, 1 + int(self.random.expovariate(1 / (avg_versions - 1))))
+
+    def _pick_tags(self, tags, weights, per_card):
+        """Distinct tags for one card, popular tags first in the draw."""
+        if not tags or not per_card:
+            return []
+        count = min(len(tags), 1 + int(self.random.expovariate(1 / max(per_card - 1, 0.5))))
+        picked = dict.fromkeys(self.random.choices(range(len(tags)), cum_weights=weights, k=count))
+        return [tags[index] for index in picked]
+
+    def _sentence(self, shortest, longest):
+        words = self.random.choices(WORDS, k=self.random.randint(shortest, longest))
+        return ' '.join(words).capitalize() + '.'
+
+    def _revise(self, text):
+        """A plausible curator edit: a few words replaced, sometimes a sentence added."""
+        words = text.split(' ')
+        for _ in range(self.random.randint(1, 4)):
+            words[self.random.randrange(len(words))] = self.random.choice(WORDS)
+        if self.random.random() < 0.3:
+            words.append(self._sentence(5, 15))
+        return ' '.join(words)
@@ -0,0 +1,86 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from flashcards.history import VersionHistory
+from flashcards.models import Flashcard
+
+
+class Command(BaseCommand):
+    help = 'Move superseded card versions from the flashcards table to the delta-compressed archive in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep',
+            type=int,
+            help='Superseded versions to keep in the flashcards table per card (default: CARD_HOT_HISTORY_VERSIONS)',
+        )
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            metavar='DAYS',
+            help='Only archive versions last updated more than DAYS days ago',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Maximum versions moved per transaction (default: 200)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches to leave room for other writers (default: 0)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many versions the policy would archive',
+        )
+
+    def handle(self, *args, **options):
+        keep = options['keep']
+        if keep is not None and keep < 0:
+            raise CommandError('--keep cannot be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        older_than = None
+        if options['older_than'] is not None:
+            older_than = timezone.now() - timedelta(days=options['older_than'])
+
+        superseded = Flashcard.objects.filter(is_live=False)
+        if older_than:
+            superseded = superseded.filter(updated_at__lt=older_than)
+        version_groups = list(superseded.order_by().values_list('version_group', flat=True).distinct())
+
+        if options['dry_run']:
+            candidates = [
+                len(VersionHistory.archive_candidates(version_group, keep, older_than))
+                for version_group in version_groups
+            ]
+            self.stdout.write(
+                f'Would archive {sum(candidates)} versions of {sum(1 for count in candidates if count)} cards'
+            )
+            return
+
+        archived = 0
+        batches = 0
+        started = time.perf_counter()
+        for version_group in version_groups:
+            # Each call is its own short transaction; repeat until the card is within policy
+            while True:
+                moved = VersionHistory.compact(version_group, keep=keep, older_than=older_than, limit=options['batch_size'])
+                if not moved:
+                    break
+                archived += moved
+                batches += 1
+                if options['pause']:
+                    time.sleep(options['pause'])
+                if moved < options['batch_size']:
+                    break
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} versions of {len(version_groups)} cards in {batches} batches ({elapsed:.1f}s)'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from flashcards.models import Flashcard
+
+
+class Command(BaseCommand):
+    help = 'Check that every card has one live version and unique version numbers'
+
+    def handle(self, *args, **options):
+        problems = self.find_problems()
+        for group, live, total, distinct_numbers in problems:
+            self.stdout.write(self.style.WARNING(
+                f'{group}: {live} live of {total} versions, {distinct_numbers} distinct version numbers'
+            ))
+        if problems:
+            raise CommandError(f'{len(problems)} card(s) have inconsistent versions')
+        self.stdout.write(self.style.SUCCESS('All cards have exactly one live version and unique version numbers'))
+
+    def find_problems(self):
+        groups = (
+            Flashcard.objects.values('version_group')
+            .annotate(
+                live=models.Count('id', filter=models.Q(is_live=True)),
+                total=models.Count('id'),
+                distinct_numbers=models.Count('version_number', distinct=True),
+            )
+            .filter(models.Q(live__gt=1) | models.Q(distinct_numbers__lt=models.F('total')))
+            .values_list('version_group', 'live', 'total', 'distinct_numbers')
+        )
+        return list(groups)
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from flashcards.image_references import DEFAULT_BATCH_SIZE, DEFAULT_GRACE, ImageReferenceService
+
+
+class Command(BaseCommand):
+    help = 'Recount references to card image files and delete the files no card version uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=DEFAULT_GRACE.total_seconds() / 3600,
+            help='Keep files unreferenced for less than this long, e.g. uploads still being saved (default: 1)',
+        )
+        parser.add_argument(
+            '--untracked',
+            action='store_true',
+            help='Also delete unreferenced files missing from the reference table, e.g. uploads from before deduplication',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Files deleted per transaction (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Recount and list the files that would be deleted without deleting them',
+        )
+
+    def handle(self, *args, **options):
+        if options['grace_hours'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--grace-hours cannot be negative and --batch-size must be at least 1')
+
+        corrected = ImageReferenceService.recount(options['batch_size'])
+        if corrected:
+            self.stdout.write(self.style.WARNING(f'Corrected {corrected} reference counts'))
+
+        names = ImageReferenceService.garbage(timedelta(hours=options['grace_hours']), options['untracked'])
+        if options['dry_run']:
+            for name in names:
+                self.stdout.write(name)
+            self.stdout.write(self.style.SUCCESS(f'Would delete {len(names)} unreferenced images'))
+            return
+
+        files, freed = ImageReferenceService.collect(names, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {files} unreferenced images, freeing {freed / 1024 / 1024:.1f} MB'))
@@ -0,0 +1,74 @@
+import gzip
+import os
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from flashcards.exporter import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, export_records, render_export
+
+
+class Command(BaseCommand):
+    help = 'Export live flashcards (optionally with every version) as CSV or JSON Lines that import_cards can read back'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            nargs='?',
+            default='-',
+            help='File to write, "-" for standard output (default); a .gz suffix compresses it',
+        )
+        parser.add_argument(
+            '--format',
+            choices=list(EXPORT_FORMATS),
+            help='Output format (default: jsonl for .jsonl/.ndjson files, otherwise csv)',
+        )
+        parser.add_argument(
+            '--history',
+            action='store_true',
+            help='Include every version of each card, oldest first, with version columns',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Cards fetched from the database at a time (default: {DEFAULT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        export_format = options['format'] or self.format_for(output)
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        lines = render_export(
+            export_records(options['history'], options['chunk_size']),
+            export_format,
+            options['history'],
+        )
+        if output == '-':
+            try:
+                self.write_lines(sys.stdout, lines)
+            except BrokenPipeError:
+                # The reader (e.g. head) stopped early; keep the final flush at exit quiet
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        else:
+            try:
+                opener = gzip.open if output.endswith('.gz') else open
+                with opener(output, 'wt', encoding='utf-8', newline='') as file:
+                    count = self.write_lines(file, lines)
+            except OSError as e:
+                raise CommandError(f'Cannot write "{output}": {e}')
+            rows = count - 1 if export_format == 'csv' else count
+            self.stderr.write(self.style.SUCCESS(f'Exported {rows} rows to {output}'))
+
+    @staticmethod
+    def format_for(output):
+        name = output[:-3] if output.endswith('.gz') else output
+        return 'jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+    @staticmethod
+    def write_lines(file, lines):
+        """Write the export and return the number of lines written."""
+        count = 0
+        for line in lines:
+            file.write(line)
+            count += 1
+        return count
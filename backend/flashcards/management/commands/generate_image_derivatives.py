@@ -0,0 +1,105 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from flashcards.image_variants import render_variants
+from flashcards.images import ImageDerivativeService
+from flashcards.models import Flashcard, ImageDerivativeSet, image_storage
+
+JOBS_PER_WORKER = 2
+
+
+class Command(BaseCommand):
+    help = 'Create resized and WebP copies of card images that have none yet (e.g. uploaded before derivatives existed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Processes resizing images in parallel (default: 0, resize in this process)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate images whose derivatives are already ready, e.g. after changing CARD_IMAGE_WIDTHS',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the images that would be processed without processing them',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 0:
+            raise CommandError('--workers cannot be negative')
+
+        sources = self._sources(options['force'])
+        if options['dry_run']:
+            for source in sources:
+                self.stdout.write(source)
+            self.stdout.write(self.style.SUCCESS(f'Would process {len(sources)} images'))
+            return
+
+        ready = failed = 0
+        for source, result in self._render(sources, workers):
+            if isinstance(result, Exception):
+                ImageDerivativeService.record_failure(source, result)
+                self.stdout.write(self.style.WARNING(f'{source}: {result}'))
+                failed += 1
+            else:
+                ImageDerivativeService.store(source, *result)
+                ready += 1
+        self.stdout.write(self.style.SUCCESS(f'Created derivatives of {ready} images ({failed} failed)'))
+
+    @staticmethod
+    def _sources(force):
+        """Image names referenced by any card version, minus those already done."""
+        names = set()
+        for front_image, back_image in Flashcard.objects.values_list('front_image', 'back_image').distinct():
+            names.update(name for name in (front_image, back_image) if name)
+        if not force:
+            names -= set(
+                ImageDerivativeSet.objects.filter(status=ImageDerivativeSet.READY).values_list('source', flat=True)
+            )
+        return sorted(names)
+
+    def _render(self, sources, workers):
+        """Yield (source, (size, variants)) per image, or (source, error) if it could not be resized.
+
+        Workers only run Pillow; reading originals and storing the results stays in
+        this process, so storage backends and database connections are not shared.
+        """
+        widths = settings.CARD_IMAGE_WIDTHS
+        if not workers:
+            for source in sources:
+                try:
+                    yield source, render_variants(self._read(source), widths)
+                except Exception as error:
+                    yield source, error
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque()
+            for source in sources:
+                try:
+                    in_flight.append((source, pool.submit(render_variants, self._read(source), widths)))
+                except Exception as error:
+                    yield source, error
+                if len(in_flight) >= workers * JOBS_PER_WORKER:
+                    yield self._result(*in_flight.popleft())
+            while in_flight:
+                yield self._result(*in_flight.popleft())
+
+    @staticmethod
+    def _read(source):
+        with image_storage.open(source, 'rb') as file:
+            return file.read()
+
+    @staticmethod
+    def _result(source, future):
+        try:
+            return source, future.result()
+        except Exception as error:
+            return source, error
@@ -0,0 +1,88 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from flashcards.loadgen import DEFAULT_BATCH_SIZE, LOAD_PASSWORD, LOAD_PREFIX, LoadDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create a large synthetic catalog (cards, tags, histories, users, favorites, usage log) for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=10000, help='Card groups to create (default: 10000)')
+        parser.add_argument('--tags', type=int, default=300, help='Tags to create (default: 300)')
+        parser.add_argument('--users', type=int, default=1000, help='Users to create, 5%% of them curators (default: 1000)')
+        parser.add_argument(
+            '--tags-per-card',
+            type=int,
+            default=3,
+            help='Average tags per card; popular tags are drawn far more often (default: 3)',
+        )
+        parser.add_argument(
+            '--avg-versions',
+            type=float,
+            default=3,
+            help='Average versions per card; a few cards get much deeper histories (default: 3)',
+        )
+        parser.add_argument(
+            '--max-versions',
+            type=int,
+            default=50,
+            help='Deepest version history of any card (default: 50)',
+        )
+        parser.add_argument('--favorites', type=int, default=10, help='Average favorites per user (default: 10)')
+        parser.add_argument(
+            '--cycles',
+            type=int,
+            default=3,
+            help='Complete daily card cycles recorded in the usage log (default: 3)',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data (default: 0)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows per bulk insert (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help=f'Delete previously generated data (names starting with "{LOAD_PREFIX}") first',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        counts = ['cards', 'tags', 'users', 'tags_per_card', 'favorites', 'cycles']
+        if any(options[name] < 0 for name in counts):
+            raise CommandError(f'{", ".join("--" + name.replace("_", "-") for name in counts)} cannot be negative')
+        if options['batch_size'] < 1 or options['max_versions'] < 1 or options['avg_versions'] < 1:
+            raise CommandError('--batch-size, --max-versions and --avg-versions must be at least 1')
+        if options['cards'] and not options['tags'] and options['tags_per_card']:
+            raise CommandError('--tags must be positive when cards get tags')
+
+        if options['clear']:
+            users, tags, cards = LoadDataGenerator.clear()
+            self.stdout.write(f'Removed {cards} generated cards, {tags} tags and {users} users and related rows')
+        elif LoadDataGenerator.exists():
+            raise CommandError('Generated data already exists; rerun with --clear to replace it')
+
+        started = time.perf_counter()
+        generator = LoadDataGenerator(seed=options['seed'], batch_size=options['batch_size'], on_progress=self.report)
+        stats = generator.generate(
+            cards=options['cards'],
+            tags=options['tags'],
+            users=options['users'],
+            tags_per_card=options['tags_per_card'],
+            avg_versions=options['avg_versions'],
+            max_versions=options['max_versions'],
+            favorites_per_user=options['favorites'],
+            cycles=options['cycles'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {stats["cards"]} cards ({stats["versions"]} versions), {stats["tags"]} tags, '
+            f'{stats["users"]} users, {stats["favorites"]} favorites and {stats["usage_logs"]} usage log entries '
+            f'in {elapsed:.1f}s. Generated users log in with password "{LOAD_PASSWORD}".'
+        ))
+
+    def report(self, step, stats):
+        if self.verbosity >= 2:
+            self.stdout.write(f'{step}: {stats}')
@@ -1,16 +1,35 @@
-import csv
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
-from flashcards.models import Flashcard, Tag
+from django.db import DatabaseError
+from flashcards.import_rows import FORMATS, detect_format, open_input, read_rows
+from flashcards.importer import DEFAULT_BATCH_SIZE, DEFAULT_SHARD_SIZE, CardImporter, ImportCheckpoint
+from flashcards.models import VersionConflict
 
 User = get_user_model()
 
 
 class Command(BaseCommand):
-    help = 'Import flashcards from CSV file'
+    help = 'Import flashcards from a CSV or JSON Lines file, optionally gzip-compressed'
 
     def add_arguments(self, parser):
-        parser.add_argument('csv_file', type=str, help='Path to CSV file')
+        parser.add_argument('csv_file', type=str, help='Path to CSV or JSONL file (.gz files are decompressed)')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Input format (default: from the file extension, CSV if unknown)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Processes parsing and validating rows in parallel with the writer (default: 0, parse in this process)',
+        )
+        parser.add_argument(
+            '--shard-size',
+            type=int,
+            default=DEFAULT_SHARD_SIZE,
+            help=f'Rows per shard handed to a worker (default: {DEFAULT_SHARD_SIZE})',
+        )
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -22,11 +41,33 @@ class Command(BaseCommand):
             default='admin',
             help='Username of the creating user (default: admin)',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows written per transaction (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            help='Checkpoint file recording the last committed row (default: <csv_file>.checkpoint)',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue after the last row committed by an earlier, interrupted run',
+        )
 
     def handle(self, *args, **options):
         csv_file = options['csv_file']
         dry_run = options['dry_run']
         username = options['user']
+        self.verbosity = options['verbosity']
+
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['workers'] < 0 or options['shard_size'] < 1:
+            raise CommandError('--workers cannot be negative and --shard-size must be at least 1')
 
         try:
             user = User.objects.get(username=username)
@@ -34,94 +75,56 @@ class Command(BaseCommand):
             raise CommandError(f'User "{username}" does not exist')
 
         try:
-            with open(csv_file, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                
-                # Validate required columns
-                required_columns = ['title', 'definition']
-                if not all(col in reader.fieldnames for col in required_columns):
-                    raise CommandError(f'CSV must contain columns: {", ".join(required_columns)}')
-
-                imported_count = 0
-                updated_count = 0
-
-                for row_num, row in enumerate(reader, start=2):
-                    try:
-                        title = row['title'].strip()
-                        phrase = row.get('phrase', '').strip()
-                        definition = row['definition'].strip()
-                        tag_names = row.get('tags', '').strip()
-
-                        if not title or not definition:
-                            self.stdout.write(
-                                self.style.WARNING(f'Row {row_num}: Skipping - missing title or definition')
-                            )
-                            continue
-
-                        if dry_run:
-                            self.stdout.write(f'Would import: {title}')
-                            if tag_names:
-                                self.stdout.write(f'  Tags: {tag_names}')
-                            continue
-
-                        # Check if card already exists
-                        existing_card = Flashcard.objects.filter(
-                            title=title, 
-                            is_active=True
-                        ).first()
-
-                        if existing_card:
-                            # Update existing card (create new version)
-                            new_version = existing_card.create_new_version(
-                                title=title,
-                                phrase=phrase,
-                                definition=definition,
-                                created_by=user
-                            )
-                            updated_count += 1
-                            self.stdout.write(f'Updated: {title} (new version {new_version.version})')
-                        else:
-                            # Create new card
-                            flashcard = Flashcard.objects.create(
-                                title=title,
-                                phrase=phrase,
-                                definition=definition,
-                                created_by=user
-                            )
-                            imported_count += 1
-                            self.stdout.write(f'Created: {title}')
-
-                        # Handle tags
-                        if tag_names:
-                            tag_list = [name.strip() for name in tag_names.split(',')]
-                            for tag_name in tag_list:
-                                if tag_name:
-                                    tag, created = Tag.objects.get_or_create(name=tag_name)
-                                    if existing_card:
-                                        new_version.tags.add(tag)
-                                    else:
-                                        flashcard.tags.add(tag)
-                                    
-                                    if created:
-                                        self.stdout.write(f'  Created tag: {tag_name}')
-
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.ERROR(f'Row {row_num}: Error processing - {str(e)}')
-                        )
-
-                if dry_run:
-                    self.stdout.write(
-                        self.style.SUCCESS(f'Dry run completed. Found {imported_count} new cards to import.')
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Import completed. Created {imported_count} new cards, updated {updated_count} existing cards.'
-                        )
-                    )
+            checkpoint = ImportCheckpoint(options['checkpoint'] or f'{csv_file}.checkpoint', csv_file)
+            state = checkpoint.load() if options['resume'] else None
+        except FileNotFoundError:
+            raise CommandError(f'File "{csv_file}" not found')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        importer = CardImporter(
+            user,
+            batch_size=options['batch_size'],
+            dry_run=dry_run,
+            checkpoint=None if dry_run else checkpoint,
+            on_batch=self.report_batch,
+            on_row_error=self.report_row_error,
+            shard_size=options['shard_size'],
+        )
+        start_after = 0
+        if state:
+            start_after = state['row_number']
+            importer.stats.update(state['stats'])
+            self.stdout.write(f'Resuming after row {start_after}')
 
+        try:
+            with open_input(csv_file) as file:
+                rows = read_rows(file, options['format'] or detect_format(csv_file))
+                stats = importer.run(rows, start_after=start_after, workers=options['workers'])
         except FileNotFoundError:
             raise CommandError(f'File "{csv_file}" not found')
-        except Exception as e:
-            raise CommandError(f'Error processing CSV: {str(e)}')
+        except ValueError as e:
+            raise CommandError(str(e))
+        except (DatabaseError, VersionConflict) as e:
+            raise CommandError(
+                f'Error writing batch: {e}. Rows committed so far are kept; rerun with --resume to continue.'
+            )
+
+        summary = (
+            f'{stats["created"]} created, {stats["updated"]} updated, {stats["unchanged"]} unchanged, '
+            f'{stats["skipped"]} skipped ({importer.rows_per_second():.0f} rows/s)'
+        )
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'Dry run completed, nothing was written. Would be: {summary}.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Import completed: {summary}.'))
+
+    def report_batch(self, row_number, stats, rows_per_second):
+        if self.verbosity >= 1:
+            self.stdout.write(
+                f'Row {row_number}: {stats["created"]} created, {stats["updated"]} updated, '
+                f'{stats["unchanged"]} unchanged, {stats["skipped"]} skipped ({rows_per_second:.0f} rows/s)'
+            )
+
+    def report_row_error(self, error):
+        self.stdout.write(self.style.WARNING(f'Row {error.row_number}: Skipping - {error}'))
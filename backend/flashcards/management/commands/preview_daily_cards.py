@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from flashcards.services import DailyCardService
+
+
+class Command(BaseCommand):
+    help = 'Preview the daily card schedule for the next N days'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Number of days to preview (default: 7)',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days < 1:
+            raise CommandError('--days must be at least 1')
+
+        for day, card in DailyCardService.preview(days):
+            if card:
+                self.stdout.write(f'{day.isoformat()}: {card.title} (v{card.version_number})')
+            else:
+                self.stdout.write(f'{day.isoformat()}: (next cycle - order not generated yet)')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from flashcards.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the live version of every card'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        indexed = backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt search index with {backend.__class__.__name__}: {indexed} cards indexed.')
+        )
@@ -0,0 +1,31 @@
+import json
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from flashcards.services import DailyCardService
+
+
+class Command(BaseCommand):
+    help = "Select and cache a day's daily card ahead of time (default: tomorrow)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Date to warm in YYYY-MM-DD format (default: tomorrow)',
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f'Invalid date "{options["date"]}", expected YYYY-MM-DD')
+        else:
+            day = date.today() + timedelta(days=1)
+
+        payload = DailyCardService.get_daily_payload(day)
+        if payload is None:
+            raise CommandError('No cards available')
+
+        title = json.loads(payload.content)['title']
+        self.stdout.write(self.style.SUCCESS(f'Daily card for {day.isoformat()}: {title}'))
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0005_fix_version_groups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCardSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version_group', models.UUIDField(db_index=True, help_text='Card group scheduled in this slot')),
+                ('cycle_number', models.PositiveIntegerField(default=1)),
+                ('position', models.PositiveIntegerField(help_text='Global order of this slot across all cycles')),
+                ('used_date', models.DateField(blank=True, help_text='Date this slot was served, empty if still pending', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['position'],
+                'indexes': [models.Index(fields=['used_date', 'position'], name='flashcards__used_da_d219ec_idx'), models.Index(fields=['cycle_number', 'position'], name='flashcards__cycle_n_8a215c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE flashcards_search_fts USING fts5(
+        title, phrase, definition, tag_names,
+        content='flashcards_flashcardsearchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER flashcards_search_fts_ai AFTER INSERT ON flashcards_flashcardsearchdocument BEGIN
+        INSERT INTO flashcards_search_fts(rowid, title, phrase, definition, tag_names)
+        VALUES (new.id, new.title, new.phrase, new.definition, new.tag_names);
+    END
+    """,
+    """
+    CREATE TRIGGER flashcards_search_fts_ad AFTER DELETE ON flashcards_flashcardsearchdocument BEGIN
+        INSERT INTO flashcards_search_fts(flashcards_search_fts, rowid, title, phrase, definition, tag_names)
+        VALUES ('delete', old.id, old.title, old.phrase, old.definition, old.tag_names);
+    END
+    """,
+    """
+    CREATE TRIGGER flashcards_search_fts_au AFTER UPDATE ON flashcards_flashcardsearchdocument BEGIN
+        INSERT INTO flashcards_search_fts(flashcards_search_fts, rowid, title, phrase, definition, tag_names)
+        VALUES ('delete', old.id, old.title, old.phrase, old.definition, old.tag_names);
+        INSERT INTO flashcards_search_fts(rowid, title, phrase, definition, tag_names)
+        VALUES (new.id, new.title, new.phrase, new.definition, new.tag_names);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS flashcards_search_fts_au",
+    "DROP TRIGGER IF EXISTS flashcards_search_fts_ad",
+    "DROP TRIGGER IF EXISTS flashcards_search_fts_ai",
+    "DROP TABLE IF EXISTS flashcards_search_fts",
+]
+
+MYSQL_FORWARD = [
+    "CREATE FULLTEXT INDEX flashcards_search_title_ft ON flashcards_flashcardsearchdocument (title)",
+    "CREATE FULLTEXT INDEX flashcards_search_all_ft ON flashcards_flashcardsearchdocument "
+    "(title, phrase, definition, tag_names)",
+]
+
+MYSQL_REVERSE = [
+    "DROP INDEX flashcards_search_all_ft ON flashcards_flashcardsearchdocument",
+    "DROP INDEX flashcards_search_title_ft ON flashcards_flashcardsearchdocument",
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    """Create the vendor specific full-text index over search documents."""
+    statements = {'sqlite': SQLITE_FORWARD, 'mysql': MYSQL_FORWARD}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_REVERSE, 'mysql': MYSQL_REVERSE}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def populate_search_documents(apps, schema_editor):
+    """Index the live version of every existing card."""
+    Flashcard = apps.get_model('flashcards', 'Flashcard')
+    FlashcardSearchDocument = apps.get_model('flashcards', 'FlashcardSearchDocument')
+
+    documents = {}
+    for card in Flashcard.objects.filter(is_live=True).order_by('version_number').prefetch_related('tags'):
+        # Keep one document per group even if older data has several live rows
+        documents[card.version_group] = FlashcardSearchDocument(
+            card=card,
+            version_group=card.version_group,
+            title=card.title,
+            phrase=card.phrase or '',
+            definition=card.definition or '',
+            tag_names=' '.join(tag.name for tag in card.tags.all()),
+        )
+    FlashcardSearchDocument.objects.bulk_create(documents.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0006_dailycardschedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlashcardSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version_group', models.UUIDField(unique=True)),
+                ('title', models.CharField(max_length=200)),
+                ('phrase', models.CharField(blank=True, default='', max_length=500)),
+                ('definition', models.TextField(blank=True, default='')),
+                ('tag_names', models.TextField(blank=True, default='', help_text="Space separated names of the card's tags")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('card', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='flashcards.flashcard')),
+            ],
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:19
+
+from django.db import migrations, models
+from flashcards.transliteration import devanagari_to_iast, fold_diacritics, to_ascii
+
+
+SEARCH_COLUMNS = ['title', 'phrase', 'definition', 'tag_names', 'search_keys']
+PREVIOUS_SEARCH_COLUMNS = ['title', 'phrase', 'definition', 'tag_names']
+
+
+def sqlite_statements(columns):
+    """Recreate the FTS5 table and its sync triggers over `columns`."""
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        "DROP TRIGGER IF EXISTS flashcards_search_fts_au",
+        "DROP TRIGGER IF EXISTS flashcards_search_fts_ad",
+        "DROP TRIGGER IF EXISTS flashcards_search_fts_ai",
+        "DROP TABLE IF EXISTS flashcards_search_fts",
+        f"""
+        CREATE VIRTUAL TABLE flashcards_search_fts USING fts5(
+            {column_list},
+            content='flashcards_flashcardsearchdocument', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        f"""
+        CREATE TRIGGER flashcards_search_fts_ai AFTER INSERT ON flashcards_flashcardsearchdocument BEGIN
+            INSERT INTO flashcards_search_fts(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER flashcards_search_fts_ad AFTER DELETE ON flashcards_flashcardsearchdocument BEGIN
+            INSERT INTO flashcards_search_fts(flashcards_search_fts, rowid, {column_list})
+            VALUES ('delete', old.id, {old_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER flashcards_search_fts_au AFTER UPDATE ON flashcards_flashcardsearchdocument BEGIN
+            INSERT INTO flashcards_search_fts(flashcards_search_fts, rowid, {column_list})
+            VALUES ('delete', old.id, {old_values});
+            INSERT INTO flashcards_search_fts(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+        """,
+        "INSERT INTO flashcards_search_fts(flashcards_search_fts) VALUES ('rebuild')",
+    ]
+
+
+def mysql_statements(columns):
+    """Recreate the combined FULLTEXT index over `columns`."""
+    return [
+        "DROP INDEX flashcards_search_all_ft ON flashcards_flashcardsearchdocument",
+        f"CREATE FULLTEXT INDEX flashcards_search_all_ft ON flashcards_flashcardsearchdocument ({', '.join(columns)})",
+    ]
+
+
+def rebuild_fulltext_index(schema_editor, columns):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = sqlite_statements(columns)
+    elif vendor == 'mysql':
+        statements = mysql_statements(columns)
+    else:
+        statements = []
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def add_search_keys_to_fulltext_index(apps, schema_editor):
+    """Recreate the full-text index so it covers the search_keys column."""
+    rebuild_fulltext_index(schema_editor, SEARCH_COLUMNS)
+
+
+def remove_search_keys_from_fulltext_index(apps, schema_editor):
+    rebuild_fulltext_index(schema_editor, PREVIOUS_SEARCH_COLUMNS)
+
+
+def populate_search_keys(apps, schema_editor):
+    """Generate normalized keys for every existing card version and its search document."""
+    Flashcard = apps.get_model('flashcards', 'Flashcard')
+    FlashcardSearchDocument = apps.get_model('flashcards', 'FlashcardSearchDocument')
+
+    cards = []
+    for card in Flashcard.objects.only('id', 'title', 'phrase').iterator():
+        card.title_key = fold_diacritics(card.title).strip()
+        card.phrase_iast = devanagari_to_iast(card.phrase).strip()
+        card.phrase_key = fold_diacritics(card.phrase_iast)
+        card.phrase_ascii = to_ascii(card.phrase_iast)
+        cards.append(card)
+    Flashcard.objects.bulk_update(cards, ['title_key', 'phrase_iast', 'phrase_key', 'phrase_ascii'], batch_size=500)
+
+    keys_by_card = {
+        card.id: ' '.join(key for key in (card.title_key, card.phrase_key, card.phrase_ascii) if key)
+        for card in cards
+    }
+    documents = list(FlashcardSearchDocument.objects.all())
+    for document in documents:
+        document.search_keys = keys_by_card.get(document.card_id, '')
+    FlashcardSearchDocument.objects.bulk_update(documents, ['search_keys'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0007_flashcardsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcard',
+            name='phrase_ascii',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Popular ASCII romanization of the phrase', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='flashcard',
+            name='phrase_iast',
+            field=models.CharField(blank=True, default='', help_text='Phrase transliterated to IAST', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='flashcard',
+            name='phrase_key',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='IAST phrase without diacritics', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='flashcard',
+            name='title_key',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Lowercase title without diacritics', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='flashcardsearchdocument',
+            name='search_keys',
+            field=models.TextField(blank=True, default='', help_text='Normalized title and phrase keys'),
+        ),
+        migrations.RunPython(add_search_keys_to_fulltext_index, remove_search_keys_from_fulltext_index),
+        migrations.RunPython(populate_search_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0008_flashcard_search_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flashcard',
+            index=models.Index(fields=['is_live', 'is_active', '-updated_at', '-id'], name='flashcards__is_live_ab0926_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-updated_at', '-id'], name='flashcards__updated_c5cb5d_idx'),
+        ),
+    ]
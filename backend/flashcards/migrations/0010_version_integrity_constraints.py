@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+def repair_version_groups(apps, schema_editor):
+    """Renumber versions sequentially with at most one live version per group.
+
+    New versions are numbered after the live one, so the live version is moved to
+    the end of its group's history if it is not already the newest.
+    """
+    Flashcard = apps.get_model('flashcards', 'Flashcard')
+
+    groups = (
+        Flashcard.objects.values('version_group')
+        .annotate(
+            total=models.Count('id'),
+            live=models.Count('id', filter=models.Q(is_live=True)),
+            distinct_numbers=models.Count('version_number', distinct=True),
+            max_number=models.Max('version_number'),
+            live_number=models.Max('version_number', filter=models.Q(is_live=True)),
+        )
+        .filter(
+            models.Q(live__gt=1) |
+            models.Q(distinct_numbers__lt=models.F('total')) |
+            models.Q(live_number__lt=models.F('max_number'))
+        )
+    )
+    for group in groups:
+        versions = list(
+            Flashcard.objects.filter(version_group=group['version_group']).order_by('version_number', 'created_at', 'id')
+        )
+        live = [card for card in versions if card.is_live]
+        if live:
+            versions.remove(live[-1])
+            versions.append(live[-1])
+        for number, card in enumerate(versions, start=1):
+            card.version_number = number
+            card.is_live = bool(live) and card is live[-1]
+        Flashcard.objects.bulk_update(versions, ['version_number', 'is_live'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0009_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(repair_version_groups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='flashcard',
+            constraint=models.UniqueConstraint(fields=('version_group', 'version_number'), name='unique_version_number_per_group'),
+        ),
+        migrations.AddConstraint(
+            model_name='flashcard',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_live', True)), fields=('version_group',), name='one_live_version_per_group'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('flashcards', '0010_version_integrity_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlashcardRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version_group', models.UUIDField(help_text='Card group this revision belongs to')),
+                ('version_number', models.PositiveIntegerField()),
+                ('is_snapshot', models.BooleanField(default=False, help_text='Content is complete rather than a delta')),
+                ('content', models.JSONField(help_text='Full card content, or changes against the previous revision')),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='card_revisions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['version_group', 'version_number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='flashcardrevision',
+            constraint=models.UniqueConstraint(fields=('version_group', 'version_number'), name='unique_revision_number_per_group'),
+        ),
+    ]
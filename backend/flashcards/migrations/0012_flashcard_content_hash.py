@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:35
+
+import hashlib
+import json
+from django.db import migrations, models
+
+
+def populate_content_hashes(apps, schema_editor):
+    """Fingerprint live cards the same way Flashcard.fingerprint does."""
+    Flashcard = apps.get_model('flashcards', 'Flashcard')
+    cards = list(Flashcard.objects.filter(is_live=True).prefetch_related('tags'))
+    for card in cards:
+        content = json.dumps(
+            [card.title, card.phrase or '', card.definition, sorted(tag.name for tag in card.tags.all())],
+            ensure_ascii=False,
+        )
+        card.content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    Flashcard.objects.bulk_update(cards, ['content_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0011_flashcardrevision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcard',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text="SHA-256 of the card's content and tag names", max_length=64),
+        ),
+        migrations.RunPython(populate_content_hashes, migrations.RunPython.noop),
+    ]
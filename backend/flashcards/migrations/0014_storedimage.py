@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:57
+
+from django.db import migrations, models
+import flashcards.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0013_imagederivativeset'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='flashcard',
+            name='back_image',
+            field=models.ImageField(blank=True, null=True, storage=flashcards.storage.ContentAddressedStorage(), upload_to='flashcard_images/'),
+        ),
+        migrations.AlterField(
+            model_name='flashcard',
+            name='front_image',
+            field=models.ImageField(blank=True, null=True, storage=flashcards.storage.ContentAddressedStorage(), upload_to='flashcard_images/'),
+        ),
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage name of the image file', max_length=255, unique=True)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='flashcards__ref_cou_250143_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+def renumber_duplicate_positions(apps, schema_editor):
+    """Number schedule slots 1..n in their current order if any two share a position."""
+    DailyCardSchedule = apps.get_model('flashcards', 'DailyCardSchedule')
+
+    duplicates = (
+        DailyCardSchedule.objects.values('position')
+        .annotate(total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    if not duplicates.exists():
+        return
+    slots = list(DailyCardSchedule.objects.order_by('position', 'id').only('id', 'position'))
+    for number, slot in enumerate(slots, start=1):
+        slot.position = number
+    DailyCardSchedule.objects.bulk_update(slots, ['position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0014_storedimage'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_duplicate_positions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailycardschedule',
+            constraint=models.UniqueConstraint(fields=('position',), name='unique_schedule_position'),
+        ),
+    ]
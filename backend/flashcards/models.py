@@ -1,9 +1,30 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Q
+from django.dispatch import Signal
 from django.contrib.auth import get_user_model
+import hashlib
+import json
 import uuid
+from .storage import ContentAddressedStorage
+from .transliteration import devanagari_to_iast, fold_diacritics, to_ascii
 
 User = get_user_model()
 
+# Identical uploads share one file (see flashcards.storage)
+image_storage = ContentAddressedStorage()
+
+# Sent after a new live version is committed, with `instance` (new live version) and `previous`
+version_published = Signal()
+
+
+class VersionConflict(Exception):
+    """Raised when a card was changed by someone else since the version being edited was read."""
+
+    def __init__(self, version_group, version_number):
+        self.version_group = version_group
+        self.version_number = version_number
+        super().__init__(f"Version {version_number} of card {version_group} is no longer the live version")
+
 
 class Tag(models.Model):
     """Tag model for organizing flashcards."""
@@ -15,6 +36,10 @@ class Tag(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Keyset pagination
+            models.Index(fields=['-updated_at', '-id']),
+        ]
 
     def __str__(self):
         return self.name
@@ -26,8 +51,8 @@ class Flashcard(models.Model):
     title = models.CharField(max_length=200)
     phrase = models.CharField(max_length=500, blank=True, null=True, help_text="Sanskrit phrase or term")
     definition = models.TextField(help_text="English definition or description")
-    front_image = models.ImageField(upload_to='flashcard_images/', blank=True, null=True)
-    back_image = models.ImageField(upload_to='flashcard_images/', blank=True, null=True)
+    front_image = models.ImageField(upload_to='flashcard_images/', storage=image_storage, blank=True, null=True)
+    back_image = models.ImageField(upload_to='flashcard_images/', storage=image_storage, blank=True, null=True)
     tags = models.ManyToManyField(Tag, blank=True, related_name='flashcards')
     
     # Metadata
@@ -40,6 +65,17 @@ class Flashcard(models.Model):
     version_group = models.UUIDField(default=uuid.uuid4, db_index=True, help_text="Groups all versions of the same card")
     version_number = models.PositiveIntegerField(default=1)
     is_live = models.BooleanField(default=True, db_index=True, help_text="Only one version per group should be live")
+    
+    # Normalized search keys - generated on save from title and phrase
+    title_key = models.CharField(max_length=200, blank=True, default='', db_index=True, help_text="Lowercase title without diacritics")
+    phrase_iast = models.CharField(max_length=500, blank=True, default='', help_text="Phrase transliterated to IAST")
+    phrase_key = models.CharField(max_length=500, blank=True, default='', db_index=True, help_text="IAST phrase without diacritics")
+    phrase_ascii = models.CharField(max_length=500, blank=True, default='', db_index=True, help_text="Popular ASCII romanization of the phrase")
+
+    SEARCH_KEY_FIELDS = ['title_key', 'phrase_iast', 'phrase_key', 'phrase_ascii']
+    
+    # Fingerprint of title, phrase, definition and tag names, used by imports to skip unchanged cards
+    content_hash = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 of the card's content and tag names")
 
     class Meta:
         ordering = ['-updated_at']
@@ -49,60 +85,130 @@ class Flashcard(models.Model):
             models.Index(fields=['created_at']),
             models.Index(fields=['version_group', 'is_live']),
             models.Index(fields=['version_group', '-version_number']),
+            # Keyset pagination over live cards
+            models.Index(fields=['is_live', 'is_active', '-updated_at', '-id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['version_group', 'version_number'], name='unique_version_number_per_group'),
+            # Not enforced on MySQL, which lacks partial indexes; the conditional update in
+            # create_new_version and the unique version number above guard it there
+            models.UniqueConstraint(fields=['version_group'], condition=Q(is_live=True), name='one_live_version_per_group'),
         ]
 
     def __str__(self):
         status = "LIVE" if self.is_live else f"v{self.version_number}"
         return f"{self.title} ({status})"
 
+    def save(self, *args, **kwargs):
+        self.update_search_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'title', 'phrase'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | set(self.SEARCH_KEY_FIELDS)
+        super().save(*args, **kwargs)
+
+    def update_search_keys(self):
+        """Derive the normalized search keys from title and phrase."""
+        self.title_key = fold_diacritics(self.title).strip()
+        self.phrase_iast = devanagari_to_iast(self.phrase).strip()
+        self.phrase_key = fold_diacritics(self.phrase_iast)
+        self.phrase_ascii = to_ascii(self.phrase_iast)
+
+    @staticmethod
+    def fingerprint(title, phrase, definition, tag_names):
+        """Content hash of a card; tag order does not matter."""
+        content = json.dumps([title, phrase or '', definition, sorted(tag_names)], ensure_ascii=False)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+    
+    def refresh_content_hash(self):
+        """Recompute and store the content hash from the current fields and tags."""
+        self.content_hash = Flashcard.fingerprint(
+            self.title, self.phrase, self.definition, self.tags.values_list('name', flat=True)
+        )
+        Flashcard.objects.filter(pk=self.pk).update(content_hash=self.content_hash)
+    
+    @staticmethod
+    def refresh_content_hashes(cards):
+        """Recompute and store content hashes for several cards; prefetch `tags` on the queryset."""
+        cards = list(cards)
+        for card in cards:
+            card.content_hash = Flashcard.fingerprint(
+                card.title, card.phrase, card.definition, [tag.name for tag in card.tags.all()]
+            )
+        Flashcard.objects.bulk_update(cards, ['content_hash'], batch_size=500)
+    
+    @property
+    def search_keys(self):
+        """Space separated normalized keys for full-text indexing."""
+        return ' '.join(key for key in (self.title_key, self.phrase_key, self.phrase_ascii) if key)
+
     def get_version_history(self):
-        """Get all versions of this card ordered by version number descending."""
-        return Flashcard.objects.filter(
-            version_group=self.version_group
-        ).order_by('-version_number')
-
-    def create_new_version(self, updated_by, **kwargs):
-        """Create a new version of this card and mark it as live."""
-        # Get current live version
-        current_live = Flashcard.objects.filter(
-            version_group=self.version_group,
-            is_live=True
-        ).first()
+        """Get all versions of this card ordered by version number descending.
         
-        # Mark current live version as not live
-        if current_live:
-            current_live.is_live = False
-            current_live.save()
-            next_version = current_live.version_number + 1
-        else:
-            next_version = 1
+        Includes versions archived to delta storage, as read-only ArchivedVersion objects.
+        """
+        from .history import VersionHistory
+        return VersionHistory.versions(self.version_group)
+
+    def create_new_version(self, updated_by, expected_version=None, **kwargs):
+        """Create a new version of this card and mark it as live.
         
-        # Create new version
-        new_version = Flashcard.objects.create(
-            title=kwargs.get('title', self.title),
-            phrase=kwargs.get('phrase', self.phrase),
-            definition=kwargs.get('definition', self.definition),
-            front_image=kwargs.get('front_image', self.front_image),
-            back_image=kwargs.get('back_image', self.back_image),
-            created_by=updated_by,
-            version_group=self.version_group,
-            version_number=next_version,
-            is_live=True,
-            is_active=True,
-        )
+        This must be the live version. It is demoted with a conditional UPDATE so
+        concurrent edits of the same version cannot both succeed; the loser gets a
+        VersionConflict, as does a caller whose `expected_version` is out of date.
+        """
+        if expected_version is not None and expected_version != self.version_number:
+            raise VersionConflict(self.version_group, expected_version)
         
         # Copy tags if not provided
         if 'tags' in kwargs and kwargs['tags'] is not None:
-            new_version.tags.set(kwargs['tags'])
+            tag_ids = {tag.pk if isinstance(tag, Tag) else int(tag) for tag in kwargs['tags']}
         else:
-            new_version.tags.set(self.tags.all())
+            tag_ids = set(self.tags.values_list('id', flat=True))
+        tag_names = Tag.objects.filter(pk__in=tag_ids).values_list('name', flat=True)
         
+        try:
+            with transaction.atomic():
+                # Mark this version as not live, unless someone else already did
+                if not Flashcard.objects.filter(pk=self.pk, is_live=True).update(is_live=False):
+                    raise VersionConflict(self.version_group, self.version_number)
+                
+                # Create new version
+                title = kwargs.get('title', self.title)
+                phrase = kwargs.get('phrase', self.phrase)
+                definition = kwargs.get('definition', self.definition)
+                new_version = Flashcard.objects.create(
+                    title=title,
+                    phrase=phrase,
+                    definition=definition,
+                    content_hash=Flashcard.fingerprint(title, phrase, definition, tag_names),
+                    front_image=kwargs.get('front_image', self.front_image),
+                    back_image=kwargs.get('back_image', self.back_image),
+                    created_by=updated_by,
+                    version_group=self.version_group,
+                    version_number=self.version_number + 1,
+                    is_live=True,
+                    is_active=True,
+                )
+                
+                Flashcard.tags.through.objects.bulk_create([
+                    Flashcard.tags.through(flashcard_id=new_version.pk, tag_id=tag_id)
+                    for tag_id in tag_ids
+                ])
+        except IntegrityError:
+            # Another version with the same number was inserted concurrently
+            raise VersionConflict(self.version_group, self.version_number)
+        
+        self.is_live = False
+        version_published.send(sender=Flashcard, instance=new_version, previous=self)
         return new_version
 
-    def revert_to_this_version(self, reverted_by):
+    def revert_to_this_version(self, reverted_by, live_version=None, expected_version=None):
         """Create a new live version by copying this version's data."""
-        return self.create_new_version(
+        if live_version is None:
+            live_version = Flashcard.objects.get(version_group=self.version_group, is_live=True)
+        return live_version.create_new_version(
             updated_by=reverted_by,
+            expected_version=expected_version,
             title=self.title,
             phrase=self.phrase,
             definition=self.definition,
@@ -140,3 +246,122 @@ class CardUsageLog(models.Model):
 
     def __str__(self):
         return f"{self.card.title} used on {self.used_date} (cycle {self.cycle_number})"
+
+
+class DailyCardSchedule(models.Model):
+    """Precomputed shuffled order in which card groups become the daily card."""
+    
+    version_group = models.UUIDField(db_index=True, help_text="Card group scheduled in this slot")
+    cycle_number = models.PositiveIntegerField(default=1)
+    position = models.PositiveIntegerField(help_text="Global order of this slot across all cycles")
+    used_date = models.DateField(blank=True, null=True, help_text="Date this slot was served, empty if still pending")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['position']
+        indexes = [
+            models.Index(fields=['used_date', 'position']),
+            models.Index(fields=['cycle_number', 'position']),
+        ]
+        constraints = [
+            # Workers generating a cycle at the same time cannot both append one
+            models.UniqueConstraint(fields=['position'], name='unique_schedule_position'),
+        ]
+
+    def __str__(self):
+        return f"Cycle {self.cycle_number} slot {self.position}: {self.version_group}"
+
+
+class FlashcardSearchDocument(models.Model):
+    """Denormalized full-text search document for the live version of a card group."""
+    
+    card = models.OneToOneField(Flashcard, on_delete=models.CASCADE, related_name='search_document')
+    version_group = models.UUIDField(unique=True)
+    title = models.CharField(max_length=200)
+    phrase = models.CharField(max_length=500, blank=True, default='')
+    definition = models.TextField(blank=True, default='')
+    tag_names = models.TextField(blank=True, default='', help_text="Space separated names of the card's tags")
+    search_keys = models.TextField(blank=True, default='', help_text="Normalized title and phrase keys")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document for {self.title}"
+
+
+class FlashcardRevision(models.Model):
+    """Superseded card version moved out of the hot table (see flashcards.history).
+    
+    Every few revisions of a group hold the full content; the ones in between hold
+    only the fields that changed since the previous revision.
+    """
+    
+    version_group = models.UUIDField(help_text="Card group this revision belongs to")
+    version_number = models.PositiveIntegerField()
+    is_snapshot = models.BooleanField(default=False, help_text="Content is complete rather than a delta")
+    content = models.JSONField(help_text="Full card content, or changes against the previous revision")
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='card_revisions')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['version_group', 'version_number']
+        constraints = [
+            models.UniqueConstraint(fields=['version_group', 'version_number'], name='unique_revision_number_per_group'),
+        ]
+
+    def __str__(self):
+        kind = "snapshot" if self.is_snapshot else "delta"
+        return f"{self.version_group} v{self.version_number} ({kind})"
+
+
+class ImageDerivativeSet(models.Model):
+    """Resized and WebP copies of one uploaded image file (see flashcards.images).
+    
+    Keyed by the original's storage name, so every card version that references the
+    file shares one set.
+    """
+    
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+    
+    source = models.CharField(max_length=255, unique=True, help_text="Storage name of the original image")
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    variants = models.JSONField(default=list, blank=True, help_text="Stored derivatives as {width, height, format, name}")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} ({self.status}, {len(self.variants)} derivatives)"
+
+
+class StoredImage(models.Model):
+    """An image file in card image storage and how many card versions use it.
+    
+    `ref_count` counts hot and archived versions whose front or back image is the
+    file. It is kept up to date as versions are created, archived and deleted, and
+    recounted from scratch by collect_images before unreferenced files are removed.
+    """
+    
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name of the image file")
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Garbage collection candidates
+            models.Index(fields=['ref_count', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
@@ -1,22 +1,76 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from yoga_flashcards.metrics import count_cache_lookups
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that reuses a recently computed total count instead of running COUNT(*) every request."""
+
+    def __init__(self, object_list, per_page, count_cache_key=None, count_cache_timeout=60, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_cache_key = count_cache_key
+        self.count_cache_timeout = count_cache_timeout
+
+    @cached_property
+    def count(self):
+        count = cache.get(self.count_cache_key)
+        if count is None:
+            count_cache_lookups('page_count', misses=1)
+            count = super().count
+            cache.set(self.count_cache_key, count, self.count_cache_timeout)
+        else:
+            count_cache_lookups('page_count', hits=1)
+        return count
 
 
 class CardPagination(PageNumberPagination):
-    """Custom pagination that returns empty results instead of 404 for invalid pages."""
-    
+    """Custom pagination that returns empty results instead of 404 for invalid pages.
+
+    Passing a `cursor` query parameter (empty for the first page) switches to keyset
+    pagination on (-updated_at, -id), which avoids COUNT(*) and OFFSET scans and keeps
+    pages stable while cards are edited. `count=cached` reuses a recently computed total
+    in either mode; keyset pages omit the count otherwise.
+
+    Searches are ordered by relevance, which the keyset cannot follow, so with any of
+    `ranked_query_params` the cursor is ignored and pages are numbered.
+    """
+
     page_size = 12
     page_size_query_param = 'page_size'
     max_page_size = 100
-    
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_cache_timeout = 60
+    keyset_ordering = ('-updated_at', '-id')
+    ranked_query_params = ('search',)
+    invalid_cursor_message = 'Invalid cursor'
+
     def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return Response({
+                'count': self.get_cached_count(self.queryset) if self.use_cached_count else None,
+                'next': self.get_next_cursor_link(),
+                'previous': self.get_previous_cursor_link(),
+                'results': data
+            })
         return Response({
             'count': self.page.paginator.count,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data
         })
-    
+
     def paginate_queryset(self, queryset, request, view=None):
         """
         Paginate a queryset if required, either returning a page object,
@@ -27,30 +81,133 @@ class CardPagination(PageNumberPagination):
         if not page_size:
             return None
 
-        paginator = self.django_paginator_class(queryset, page_size)
+        self.request = request
+        self.queryset = queryset
+        self.cursor_mode = self.cursor_query_param in request.query_params and not any(
+            request.query_params.get(name) for name in self.ranked_query_params
+        )
+        self.use_cached_count = request.query_params.get(self.count_query_param) == 'cached'
+
+        if self.cursor_mode:
+            return self.paginate_keyset(queryset, request, page_size)
+
+        if self.use_cached_count:
+            paginator = CachedCountPaginator(
+                queryset, page_size,
+                count_cache_key=self.get_count_cache_key(),
+                count_cache_timeout=self.count_cache_timeout,
+            )
+        else:
+            paginator = self.django_paginator_class(queryset, page_size)
         page_number = request.query_params.get(self.page_query_param, 1)
-        
+
         try:
             page_number = int(page_number)
         except (TypeError, ValueError):
             page_number = 1
-        
+
         # If page number is beyond available pages, return empty page
         if page_number > paginator.num_pages and paginator.num_pages > 0:
             # Create an empty page
             self.page = paginator.page(paginator.num_pages)
             self.page.object_list = []
-            self.request = request
             return []
-        
+
         try:
             self.page = paginator.page(page_number)
         except Exception:
             # Return empty page for any pagination errors
             self.page = paginator.page(1)
             self.page.object_list = []
-            self.request = request
             return []
-        
-        self.request = request
+
         return list(self.page)
+
+    def paginate_keyset(self, queryset, request, page_size):
+        """Return the page after (or before, for reverse cursors) the cursor position."""
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        reverse = bool(position and position['reverse'])
+
+        if reverse:
+            queryset = queryset.order_by('updated_at', 'id')
+        else:
+            queryset = queryset.order_by(*self.keyset_ordering)
+
+        if position:
+            updated_at, pk = position['updated_at'], position['id']
+            if reverse:
+                queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=pk))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else position is not None
+        self.first_item = results[0] if results else None
+        self.last_item = results[-1] if results else None
+        return results
+
+    def get_next_link(self):
+        # Drop a cursor that was ignored for a ranked search, so page links stay in page mode
+        link = super().get_next_link()
+        return link and remove_query_param(link, self.cursor_query_param)
+
+    def get_previous_link(self):
+        link = super().get_previous_link()
+        return link and remove_query_param(link, self.cursor_query_param)
+
+    def get_next_cursor_link(self):
+        if not self.has_next or self.last_item is None:
+            return None
+        return self.cursor_link(self.last_item, reverse=False)
+
+    def get_previous_cursor_link(self):
+        if not self.has_previous or self.first_item is None:
+            return None
+        return self.cursor_link(self.first_item, reverse=True)
+
+    def cursor_link(self, item, reverse):
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(item, reverse))
+
+    def encode_cursor(self, item, reverse):
+        payload = {'u': item.updated_at.isoformat(), 'i': item.pk, 'r': int(reverse)}
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Decode an opaque cursor, or return None for the first page."""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return {
+                'updated_at': datetime.fromisoformat(payload['u']),
+                'id': int(payload['i']),
+                'reverse': bool(payload.get('r')),
+            }
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_cached_count(self, queryset):
+        key = self.get_count_cache_key()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def get_count_cache_key(self):
+        """Cache key for the total of the current filters, ignoring position parameters."""
+        ignored = {self.page_query_param, self.page_size_query_param, self.cursor_query_param, self.count_query_param}
+        filters = sorted(
+            (key, value) for key, values in self.request.query_params.lists()
+            if key not in ignored for value in values
+        )
+        digest = hashlib.md5(json.dumps([self.request.path, filters]).encode()).hexdigest()
+        return f'pagination:count:{digest}'
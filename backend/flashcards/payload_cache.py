@@ -0,0 +1,209 @@
+"""
+Per-process LRU cache of rendered card JSON, keyed by card version id.
+
+Card versions are never edited in place - an edit inserts a new row - so the JSON
+for a version id can be reused until the row itself changes (e.g. it stops being
+live) or one of its tags is edited. Responses are assembled from the cached bytes
+by FragmentJSONRenderer without running DRF field serialization again.
+
+Each version has a stamp in the shared cache, and entries remember the stamp they
+were rendered under. Evicting a version gives it a new stamp, so every worker
+re-renders just that version; a lookup reads the stamps of all requested versions
+in one round trip, plus one to write stamps for versions that have none. Stamps
+expire after STAMP_TIMEOUT, so those of old versions do not pile up; a version
+whose stamp expired is simply rendered again. Tag changes affect every payload and bump one generation that
+clears the whole cache in every worker.
+"""
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from yoga_flashcards.metrics import count_cache_lookups
+
+# Cache key holding the generation of the most recent tag change in any worker
+GENERATION_CACHE_KEY = 'payload_cache:generation'
+# Cache key of one card version's stamp, and how long it is kept
+STAMP_CACHE_KEY = 'payload_cache:card:{}'
+STAMP_TIMEOUT = 24 * 60 * 60
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+class RawJSON:
+    """Already rendered JSON that FragmentJSONRenderer splices into a response unchanged."""
+
+    __slots__ = ('content',)
+
+    def __init__(self, content):
+        self.content = content
+
+
+class FragmentJSONEncoder(JSONEncoder):
+    """Decodes RawJSON fragments for renderers that cannot splice bytes."""
+
+    def default(self, obj):
+        if isinstance(obj, RawJSON):
+            return json.loads(obj.content)
+        return super().default(obj)
+
+
+class FragmentJSONRenderer(JSONRenderer):
+    """JSON renderer that copies RawJSON fragments straight into the output."""
+
+    encoder_class = FragmentJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # Indented output (browsable API) decodes fragments through the encoder instead
+            return super().render(data, accepted_media_type, renderer_context)
+
+        fragments = []
+        data = self._extract_fragments(data, fragments)
+        rendered = super().render(data, accepted_media_type, renderer_context)
+        for index, fragment in enumerate(fragments):
+            rendered = rendered.replace(self._placeholder(index), fragment.content, 1)
+        return rendered
+
+    @classmethod
+    def _extract_fragments(cls, data, fragments):
+        """Replace RawJSON objects with placeholder strings, collecting them in order."""
+        if isinstance(data, RawJSON):
+            fragments.append(data)
+            return f'\x00fragment{len(fragments) - 1}\x00'
+        if isinstance(data, dict):
+            return {key: cls._extract_fragments(value, fragments) for key, value in data.items()}
+        if isinstance(data, (list, tuple)):
+            return [cls._extract_fragments(value, fragments) for value in data]
+        return data
+
+    @staticmethod
+    def _placeholder(index):
+        return f'"\\u0000fragment{index}\\u0000"'.encode()
+
+
+class VersionPayloadCache:
+    """Bounded LRU of rendered card JSON keyed by (variant, card version id), with the version's stamp."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, cards, serializer_class, context, variant=''):
+        """Return a RawJSON fragment per card, rendering and caching the missing ones."""
+        variant = (serializer_class.__name__, variant, self._base_url(context))
+        cards = list(cards)
+        stamps = self._stamps([card.pk for card in cards])
+        fragments = []
+        missing = []
+        with self._lock:
+            for card in cards:
+                entry = self._entries.get((variant, card.pk))
+                if entry is None or entry[0] != stamps[card.pk]:
+                    self.misses += 1
+                    missing.append((len(fragments), card))
+                    fragments.append(None)
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end((variant, card.pk))
+                    fragments.append(RawJSON(entry[1]))
+        count_cache_lookups('card_payload', hits=len(fragments) - len(missing), misses=len(missing))
+
+        if missing:
+            serializer = serializer_class([card for _, card in missing], many=True, context=context)
+            renderer = JSONRenderer()
+            with self._lock:
+                for (position, card), data in zip(missing, serializer.data):
+                    content = renderer.render(data)
+                    self._store((variant, card.pk), stamps[card.pk], content)
+                    fragments[position] = RawJSON(content)
+        return fragments
+
+    def render_one(self, card, serializer_class, context, variant=''):
+        return self.render([card], serializer_class, context, variant)[0]
+
+    def evict(self, card_id):
+        """Drop every variant of one card version, here and (through its stamp) in every other worker."""
+        # Only once committed, so no worker re-renders the old row under the new stamp
+        transaction.on_commit(lambda: cache.set(STAMP_CACHE_KEY.format(card_id), uuid.uuid4().hex, STAMP_TIMEOUT))
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == card_id]:
+                self._size -= len(self._entries.pop(key)[1])
+
+    def clear(self, bump_generation=True):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            if bump_generation:
+                self._bump_generation()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+    def _store(self, key, stamp, content):
+        if len(content) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous[1])
+        self._entries[key] = (stamp, content)
+        self._size += len(content)
+        while self._size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    @staticmethod
+    def _stamps(card_ids):
+        """The current stamp of each card version, giving a first one to versions without."""
+        keys = {card_id: STAMP_CACHE_KEY.format(card_id) for card_id in card_ids}
+        found = cache.get_many(list(keys.values()))
+        stamps = {card_id: found.get(key) for card_id, key in keys.items()}
+        missing = {keys[card_id]: uuid.uuid4().hex for card_id, stamp in stamps.items() if stamp is None}
+        if missing:
+            # Overwriting a stamp another worker set in the meantime still leaves a new one, so nothing stale is served
+            cache.set_many(missing, STAMP_TIMEOUT)
+            stamps.update({card_id: missing[key] for card_id, key in keys.items() if key in missing})
+        return stamps
+
+    def _bump_generation(self):
+        # Tell other workers their copy is stale; this worker is already current
+        self.generation = uuid.uuid4().hex
+        cache.set(GENERATION_CACHE_KEY, self.generation, None)
+
+    @staticmethod
+    def _base_url(context):
+        # Image fields render absolute URLs that depend on the requested host
+        request = (context or {}).get('request')
+        return request.build_absolute_uri('/') if request else ''
+
+
+_payload_cache = VersionPayloadCache(getattr(settings, 'CARD_PAYLOAD_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+
+
+def get_payload_cache():
+    """Return this process's payload cache, cleared if another worker changed tags."""
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if _payload_cache.generation != generation:
+        _payload_cache.clear(bump_generation=False)
+        _payload_cache.generation = generation
+    return _payload_cache
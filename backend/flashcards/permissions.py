@@ -1,5 +1,8 @@
 from rest_framework.permissions import BasePermission
 
+# With signed token authentication request.user is a users.authentication.TokenUser,
+# whose is_curator() and is_admin() read the token's role claim instead of the database.
+
 
 class IsCuratorOrAdmin(BasePermission):
     """
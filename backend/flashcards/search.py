@@ -0,0 +1,163 @@
+import re
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Q, When
+from .models import Flashcard, FlashcardSearchDocument
+from .transliteration import search_key
+
+# Maximum number of ranked card ids a search returns
+SEARCH_RESULT_LIMIT = 1000
+
+# Characters with special meaning in FTS5 or MySQL boolean mode queries are token separators
+TOKEN_PATTERN = re.compile(r'[^\s"\'*()+\-<>~@:^,.;!?]+')
+MAX_QUERY_TOKENS = 10
+
+
+def tokenize(query):
+    """Normalize a user query (Devanagari, IAST or romanized) and split it into search tokens."""
+    return TOKEN_PATTERN.findall(search_key(query))[:MAX_QUERY_TOKENS]
+
+
+def rank_ordering(card_ids):
+    """Order expression that keeps a queryset in the ranked order of `card_ids`."""
+    return Case(
+        *[When(id=card_id, then=position) for position, card_id in enumerate(card_ids)],
+        output_field=IntegerField(),
+    )
+
+
+class SearchBackend:
+    """Full-text search over the live version of every card group.
+
+    Documents are stored in FlashcardSearchDocument; subclasses only differ in how
+    they query the vendor specific full-text index built over that table.
+    """
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        """Return ids of live cards matching `query`, best match first."""
+        raise NotImplementedError
+
+    def index_card(self, card):
+        """Create or refresh the search document for a live card."""
+        if not card.is_live:
+            return
+        tag_names = card.tags.values_list('name', flat=True)
+        FlashcardSearchDocument.objects.update_or_create(
+            version_group=card.version_group,
+            defaults=self._document_fields(card, tag_names),
+        )
+
+    def index_cards(self, cards):
+        """Refresh search documents for several cards; prefetch `tags` on the queryset."""
+        documents = {
+            card.version_group: FlashcardSearchDocument(
+                version_group=card.version_group,
+                **self._document_fields(card, [tag.name for tag in card.tags.all()])
+            )
+            for card in cards if card.is_live
+        }
+        if not documents:
+            return
+        with transaction.atomic():
+            FlashcardSearchDocument.objects.filter(version_group__in=list(documents)).delete()
+            FlashcardSearchDocument.objects.bulk_create(documents.values(), batch_size=500)
+
+    def rebuild(self):
+        """Recreate every search document from the live cards. Returns the number indexed."""
+        FlashcardSearchDocument.objects.all().delete()
+        documents = {}
+        live_cards = Flashcard.objects.filter(is_live=True).order_by('version_number').prefetch_related('tags')
+        for card in live_cards:
+            documents[card.version_group] = FlashcardSearchDocument(
+                version_group=card.version_group,
+                **self._document_fields(card, [tag.name for tag in card.tags.all()])
+            )
+        FlashcardSearchDocument.objects.bulk_create(documents.values(), batch_size=500)
+        return len(documents)
+
+    @staticmethod
+    def _document_fields(card, tag_names):
+        return {
+            'card': card,
+            'title': card.title,
+            'phrase': card.phrase or '',
+            'definition': card.definition or '',
+            'tag_names': ' '.join(tag_names),
+            'search_keys': card.search_keys,
+        }
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """Search through the FTS5 table kept in sync with the documents by triggers."""
+
+    # bm25 column weights for title, phrase, definition, tag_names and search_keys
+    SQL = """
+        SELECT d.card_id
+        FROM flashcards_search_fts
+        JOIN flashcards_flashcardsearchdocument d ON d.id = flashcards_search_fts.rowid
+        WHERE flashcards_search_fts MATCH %s
+        ORDER BY bm25(flashcards_search_fts, 10.0, 5.0, 1.0, 3.0, 8.0)
+        LIMIT %s
+    """
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Prefix match every token so results update while the user types
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(self.SQL, [match, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class MySQLFullTextBackend(SearchBackend):
+    """Search through InnoDB FULLTEXT indexes on the documents table."""
+
+    SQL = """
+        SELECT card_id
+        FROM flashcards_flashcardsearchdocument
+        WHERE MATCH(title, phrase, definition, tag_names, search_keys) AGAINST (%s IN BOOLEAN MODE)
+        ORDER BY 3 * MATCH(title) AGAINST (%s IN BOOLEAN MODE)
+            + MATCH(title, phrase, definition, tag_names, search_keys) AGAINST (%s IN BOOLEAN MODE) DESC
+        LIMIT %s
+    """
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        match = ' '.join(f'+{token}*' for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(self.SQL, [match, match, match, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class BasicSearchBackend(SearchBackend):
+    """Fallback for databases without a supported full-text index."""
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        documents = FlashcardSearchDocument.objects.all()
+        for token in tokens:
+            documents = documents.filter(
+                Q(title__icontains=token) |
+                Q(phrase__icontains=token) |
+                Q(definition__icontains=token) |
+                Q(tag_names__icontains=token) |
+                Q(search_keys__icontains=token)
+            )
+        title_match = Case(When(search_keys__icontains=tokens[0], then=0), default=1, output_field=IntegerField())
+        return list(documents.order_by(title_match, 'title').values_list('card_id', flat=True)[:limit])
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'mysql': MySQLFullTextBackend,
+}
+
+
+def get_search_backend():
+    """Return the search backend for the default database."""
+    return SEARCH_BACKENDS.get(connection.vendor, BasicSearchBackend)()
@@ -1,4 +1,7 @@
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
+from .images import ImageDerivativeService
 from .models import Flashcard, Tag, DailyCard
 
 
@@ -11,7 +14,52 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class FlashcardSerializer(serializers.ModelSerializer):
+class TagSummarySerializer(serializers.ModelSerializer):
+    """Minimal tag representation for card listings."""
+    
+    class Meta:
+        model = Tag
+        fields = ['id', 'name']
+
+
+class ImageSrcsetListSerializer(serializers.ListSerializer):
+    """Looks up the image derivatives of every card in one query before rendering them."""
+    
+    def to_representation(self, data):
+        cards = list(data.all() if hasattr(data, 'all') else data)
+        # Only the image columns of requested srcsets are loaded by sparse listings
+        fields = [name[:-len('_srcset')] for name in ('front_image_srcset', 'back_image_srcset') if name in self.child.fields]
+        if fields:
+            self.child.srcsets = ImageDerivativeService.srcsets(
+                ImageDerivativeService.image_names(cards, fields), self.context.get('request')
+            )
+        return super().to_representation(cards)
+
+
+class ImageSrcsetMixin(serializers.Serializer):
+    """`front_image_srcset` and `back_image_srcset`: {content type: srcset} once derivatives exist."""
+    
+    front_image_srcset = serializers.SerializerMethodField()
+    back_image_srcset = serializers.SerializerMethodField()
+    
+    srcsets = None
+    
+    def get_front_image_srcset(self, obj):
+        return self._srcset(obj.front_image)
+    
+    def get_back_image_srcset(self, obj):
+        return self._srcset(obj.back_image)
+    
+    def _srcset(self, image):
+        if not image:
+            return None
+        if self.srcsets is None:
+            # Rendered on its own rather than through ImageSrcsetListSerializer
+            return ImageDerivativeService.srcsets([image.name], self.context.get('request')).get(image.name)
+        return self.srcsets.get(image.name)
+
+
+class FlashcardSerializer(ImageSrcsetMixin, serializers.ModelSerializer):
     """Serializer for Flashcard model."""
     
     tags = TagSerializer(many=True, read_only=True)
@@ -26,24 +74,28 @@ class FlashcardSerializer(serializers.ModelSerializer):
         model = Flashcard
         fields = [
             'id', 'title', 'phrase', 'definition', 'front_image', 'back_image',
+            'front_image_srcset', 'back_image_srcset',
             'tags', 'tag_names', 'created_by', 'created_by_username',
             'created_at', 'updated_at', 'is_active', 'version_group', 'version_number', 'is_live'
         ]
         read_only_fields = ['created_by', 'created_at', 'updated_at', 'version_group', 'version_number', 'is_live']
+        list_serializer_class = ImageSrcsetListSerializer
 
     def create(self, validated_data):
         tag_names = validated_data.pop('tag_names', [])
-        flashcard = Flashcard.objects.create(**validated_data)
-        
-        # Handle tags
-        for tag_name in tag_names:
-            tag, created = Tag.objects.get_or_create(name=tag_name.strip())
-            flashcard.tags.add(tag)
+        with transaction.atomic():
+            flashcard = Flashcard.objects.create(**validated_data)
+            
+            # Handle tags
+            tags = [Tag.objects.get_or_create(name=tag_name.strip())[0] for tag_name in tag_names]
+            if tags:
+                flashcard.tags.add(*tags)
         
         return flashcard
 
     def update(self, instance, validated_data):
         tag_names = validated_data.pop('tag_names', None)
+        expected_version = validated_data.pop('expected_version', None)
         
         # Prepare tags list for new version
         tags_to_set = None
@@ -72,6 +124,7 @@ class FlashcardSerializer(serializers.ModelSerializer):
         # Create new version instead of updating in place
         new_version = instance.create_new_version(
             updated_by=self.context['request'].user,
+            expected_version=expected_version,
             tags=tags_to_set,
             **validated_data
         )
@@ -79,6 +132,63 @@ class FlashcardSerializer(serializers.ModelSerializer):
         return new_version
 
 
+class FlashcardListSerializer(ImageSrcsetMixin, serializers.ModelSerializer):
+    """Slim read-only serializer for card listings with sparse fieldsets.
+    
+    The serializer context may carry `fields` (names to include, defaults to
+    DEFAULT_FIELDS) and `expand` (nested objects to render in full, e.g. `tags`).
+    """
+    
+    DEFAULT_FIELDS = [
+        'id', 'title', 'phrase', 'definition', 'front_image', 'back_image',
+        'front_image_srcset', 'back_image_srcset', 'tags', 'created_at',
+    ]
+    EXPANDABLE_FIELDS = ['tags']
+    
+    tags = TagSummarySerializer(many=True, read_only=True)
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+    
+    class Meta:
+        model = Flashcard
+        fields = [
+            'id', 'title', 'phrase', 'phrase_iast', 'definition', 'front_image', 'back_image',
+            'front_image_srcset', 'back_image_srcset',
+            'tags', 'created_by', 'created_by_username',
+            'created_at', 'updated_at', 'is_active', 'version_group', 'version_number', 'is_live'
+        ]
+        read_only_fields = fields
+        list_serializer_class = ImageSrcsetListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields') or self.DEFAULT_FIELDS
+        for name in set(self.fields) - set(requested):
+            self.fields.pop(name)
+        if 'tags' in self.fields and 'tags' in self.context.get('expand', []):
+            self.fields['tags'] = TagSerializer(many=True, read_only=True)
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fields, expand):
+        """Load only the columns and relations needed to render `fields`."""
+        model_fields = {field.name for field in Flashcard._meta.concrete_fields}
+        # id and updated_at are always needed for ordering and keyset pagination
+        columns = {'id', 'updated_at'} | (set(fields) & model_fields)
+        # srcsets are looked up by the image's storage name
+        columns |= {name[:-len('_srcset')] for name in fields if name in ('front_image_srcset', 'back_image_srcset')}
+        
+        if 'created_by_username' in fields:
+            columns |= {'created_by', 'created_by__username'}
+            queryset = queryset.select_related('created_by')
+        queryset = queryset.only(*columns)
+        
+        if 'tags' in fields:
+            if 'tags' in expand:
+                queryset = queryset.prefetch_related('tags')
+            else:
+                queryset = queryset.prefetch_related(Prefetch('tags', queryset=Tag.objects.only('id', 'name')))
+        return queryset
+
+
 class FlashcardVersionHistorySerializer(serializers.ModelSerializer):
     """Serializer for flashcard version history."""
     
@@ -1,82 +1,281 @@
 import random
-from datetime import date, timedelta
-from django.db.models import Q
-from .models import Flashcard, DailyCard, CardUsageLog
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from .models import Flashcard, DailyCard, CardUsageLog, DailyCardSchedule
+from .payload_cache import RawJSON, get_payload_cache
+from .serializers import FlashcardSerializer
+from yoga_flashcards.metrics import DAILY_CARD_SELECTION, count_cache_lookups
 
 
 class DailyCardService:
     """Service for managing daily card selection."""
 
+    PAYLOAD_CACHE_KEY = 'dailycard:payload:{date}'
+    PAYLOAD_LOCK_KEY = 'dailycard:lock:{date}'
+    LOCK_TIMEOUT = 30
+    LOCK_WAIT = 5
+    LOCK_POLL_INTERVAL = 0.05
+
     @staticmethod
-    def get_daily_card():
-        """Get or create the daily card for today."""
-        today = date.today()
-        
-        # Check if we already have a daily card for today
-        try:
-            daily_card = DailyCard.objects.get(date=today)
+    def get_daily_card(for_date=None):
+        """Get or create the daily card for a date (today by default)."""
+        day = for_date or date.today()
+
+        # Check if we already have a daily card for this date
+        daily_card = DailyCard.objects.select_related('card__created_by').filter(date=day).first()
+        if daily_card:
             return daily_card.card
-        except DailyCard.DoesNotExist:
-            pass
-        
-        # Select a new daily card
-        card = DailyCardService._select_next_card()
+
+        # Take the next card from the precomputed schedule
+        slot, card = DailyCardService._next_scheduled_card()
         if card:
-            # Create daily card record
-            DailyCard.objects.create(card=card, date=today)
-            
-            # Log usage
-            current_cycle = DailyCardService._get_current_cycle()
-            CardUsageLog.objects.create(
-                card=card,
-                used_date=today,
-                cycle_number=current_cycle
-            )
-            
+            try:
+                with transaction.atomic():
+                    # Create daily card record - the unique date makes this the race arbiter
+                    DailyCard.objects.create(card=card, date=day)
+
+                    slot.used_date = day
+                    slot.save(update_fields=['used_date'])
+
+                    # Log usage
+                    CardUsageLog.objects.create(
+                        card=card,
+                        used_date=day,
+                        cycle_number=slot.cycle_number
+                    )
+            except IntegrityError:
+                # Another worker created the daily card first, use theirs
+                return DailyCard.objects.select_related('card__created_by').get(date=day).card
+
             return card
-        
+
         return None
 
     @staticmethod
-    def _select_next_card():
-        """Select the next card to be the daily card."""
-        # Only select from live versions of active cards
-        active_cards = Flashcard.objects.filter(is_active=True, is_live=True)
-        
-        if not active_cards.exists():
-            return None
-        
-        current_cycle = DailyCardService._get_current_cycle()
-        
-        # Get cards that haven't been used in the current cycle
-        used_card_ids = CardUsageLog.objects.filter(
-            cycle_number=current_cycle
-        ).values_list('card_id', flat=True)
-        
-        unused_cards = active_cards.exclude(id__in=used_card_ids)
-        
-        if unused_cards.exists():
-            # Return a random unused card
-            return random.choice(unused_cards)
-        else:
-            # All cards have been used, start a new cycle
-            new_cycle = current_cycle + 1
-            return random.choice(active_cards)
+    def get_daily_payload(for_date=None):
+        """Get the serialized daily card for a date, computing it in at most one worker at a time.
+
+        The payload is cached until the end of the day. On a miss, workers race for a
+        short-lived cache lock; the winner selects and serializes the card while the
+        others poll the cache for its result. Returns the card as a RawJSON fragment,
+        or None if there are no cards.
+        """
+        day = for_date or date.today()
+        payload_key = DailyCardService.PAYLOAD_CACHE_KEY.format(date=day.isoformat())
+        lock_key = DailyCardService.PAYLOAD_LOCK_KEY.format(date=day.isoformat())
+
+        payload = cache.get(payload_key)
+        if payload is not None:
+            count_cache_lookups('daily_payload', hits=1)
+            return RawJSON(payload)
+        count_cache_lookups('daily_payload', misses=1)
+
+        deadline = time.monotonic() + DailyCardService.LOCK_WAIT
+        acquired = cache.add(lock_key, True, DailyCardService.LOCK_TIMEOUT)
+        while not acquired:
+            time.sleep(DailyCardService.LOCK_POLL_INTERVAL)
+            payload = cache.get(payload_key)
+            if payload is not None:
+                return RawJSON(payload)
+            if time.monotonic() >= deadline:
+                # Lock holder is stuck; compute ourselves, the database path is still race-safe
+                break
+            acquired = cache.add(lock_key, True, DailyCardService.LOCK_TIMEOUT)
+
+        try:
+            payload = cache.get(payload_key)
+            if payload is None:
+                with DAILY_CARD_SELECTION.time():
+                    card = DailyCardService.get_daily_card(day)
+                if card is None:
+                    return None
+                payload = get_payload_cache().render_one(card, FlashcardSerializer, {}).content
+                cache.set(payload_key, payload, DailyCardService._seconds_until_end_of(day))
+            return RawJSON(payload)
+        finally:
+            if acquired:
+                cache.delete(lock_key)
+
+    @staticmethod
+    def invalidate_payload():
+        """Drop cached daily payloads for today and tomorrow."""
+        today = date.today()
+        cache.delete_many([
+            DailyCardService.PAYLOAD_CACHE_KEY.format(date=day.isoformat())
+            for day in (today, today + timedelta(days=1))
+        ])
+
+    @staticmethod
+    def preview(days):
+        """Return (date, card) pairs for the next `days` days without changing the schedule.
+
+        Days beyond the current cycle have no order yet and are returned with a card of None.
+        """
+        today = date.today()
+        dates = [today + timedelta(days=offset) for offset in range(days)]
+
+        # Days that already have a card (e.g. pre-warmed tomorrow)
+        assigned = {
+            daily_card.date: daily_card.card
+            for daily_card in DailyCard.objects.select_related('card').filter(date__in=dates)
+        }
+        open_dates = iter([day for day in dates if day not in assigned])
+
+        slots = DailyCardSchedule.objects.filter(used_date__isnull=True).order_by('position')
+        for slot in slots.iterator():
+            if len(assigned) >= days:
+                break
+            card = DailyCardService._live_card_for_group(slot.version_group)
+            if card:
+                assigned[next(open_dates)] = card
+
+        return [(day, assigned.get(day)) for day in dates]
+
+    @staticmethod
+    def schedule_card(version_group):
+        """Add a newly created card group to a random pending slot of the current cycle."""
+        with transaction.atomic():
+            last_slot = DailyCardSchedule.objects.select_for_update().order_by('-position').first()
+            if not last_slot:
+                # No schedule yet - the card is picked up when the first cycle is generated
+                return
+
+            pending = DailyCardSchedule.objects.filter(used_date__isnull=True)
+            if pending.filter(version_group=version_group).exists():
+                return
+
+            new_slot = DailyCardSchedule.objects.create(
+                version_group=version_group,
+                cycle_number=last_slot.cycle_number,
+                position=last_slot.position + 1,
+            )
+
+            # Swap with a random pending slot so the new card lands anywhere in the remaining cycle.
+            # The groups are swapped rather than the positions, which are unique.
+            pending_count = pending.count()
+            swap_slot = pending.order_by('position')[random.randrange(pending_count)]
+            if swap_slot.pk != new_slot.pk:
+                new_slot.version_group, swap_slot.version_group = swap_slot.version_group, new_slot.version_group
+                new_slot.save(update_fields=['version_group'])
+                swap_slot.save(update_fields=['version_group'])
+
+    @staticmethod
+    def schedule_cards(version_groups):
+        """Add many new card groups to random pending slots of the current cycle at once."""
+        with transaction.atomic():
+            last_slot = DailyCardSchedule.objects.select_for_update().order_by('-position').first()
+            if not last_slot:
+                return
+
+            pending = DailyCardSchedule.objects.filter(used_date__isnull=True)
+            scheduled = set(pending.filter(version_group__in=version_groups).values_list('version_group', flat=True))
+            new_groups = [group for group in dict.fromkeys(version_groups) if group not in scheduled]
+            if not new_groups:
+                return
+
+            # Same random swaps schedule_card makes, done on (id, version_group) pairs and written back in bulk
+            slots = [list(slot) for slot in pending.order_by('position').values_list('id', 'version_group')]
+            first_new = len(slots)
+            slots += [[None, group] for group in new_groups]
+            swapped = set()
+            for index in range(first_new, len(slots)):
+                swap_index = random.randrange(index + 1)
+                slots[index][1], slots[swap_index][1] = slots[swap_index][1], slots[index][1]
+                swapped.add(swap_index)
+
+            DailyCardSchedule.objects.bulk_create([
+                DailyCardSchedule(
+                    version_group=slots[index][1],
+                    cycle_number=last_slot.cycle_number,
+                    position=last_slot.position + 1 + index - first_new,
+                )
+                for index in range(first_new, len(slots))
+            ])
+            DailyCardSchedule.objects.bulk_update(
+                [DailyCardSchedule(pk=slots[index][0], version_group=slots[index][1]) for index in swapped if index < first_new],
+                ['version_group'],
+                batch_size=500,
+            )
+
+    @staticmethod
+    def unschedule_card(version_group):
+        """Drop pending slots for a card group that no longer has a live active version."""
+        if DailyCardService._live_card_for_group(version_group):
+            return
+        DailyCardSchedule.objects.filter(version_group=version_group, used_date__isnull=True).delete()
+
+    @staticmethod
+    def _next_scheduled_card():
+        """Return the next pending schedule slot and its live card, generating a new cycle if needed."""
+        while True:
+            slot = DailyCardSchedule.objects.filter(used_date__isnull=True).order_by('position').first()
+            if not slot:
+                if not DailyCardService._generate_cycle():
+                    return None, None
+                continue
+
+            card = DailyCardService._live_card_for_group(slot.version_group)
+            if card:
+                return slot, card
+
+            # Card was retired since the schedule was generated
+            slot.delete()
+
+    @staticmethod
+    def _generate_cycle():
+        """Shuffle all live active card groups into a new cycle. Returns False if there are no cards.
+
+        Takes the same lock on the last slot as schedule_card, and adds nothing if another
+        worker appended slots while this one waited for it.
+        """
+        try:
+            with transaction.atomic():
+                last_slot = DailyCardSchedule.objects.select_for_update().order_by('-position').first()
+                if DailyCardSchedule.objects.filter(used_date__isnull=True).exists():
+                    return True
+
+                version_groups = list(
+                    Flashcard.objects.filter(is_active=True, is_live=True)
+                    .values_list('version_group', flat=True)
+                    .distinct()
+                )
+                if not version_groups:
+                    return False
+
+                random.shuffle(version_groups)
+
+                if last_slot:
+                    cycle_number = last_slot.cycle_number + 1
+                    start = last_slot.position + 1
+                else:
+                    # Continue numbering from any cycles recorded before the schedule existed
+                    latest_cycle = CardUsageLog.objects.aggregate(latest=Max('cycle_number'))['latest']
+                    cycle_number = (latest_cycle or 0) + 1
+                    start = 1
+
+                DailyCardSchedule.objects.bulk_create([
+                    DailyCardSchedule(version_group=version_group, cycle_number=cycle_number, position=start + offset)
+                    for offset, version_group in enumerate(version_groups)
+                ])
+        except IntegrityError:
+            # With no slots to lock, another worker created the first cycle at the same time; use theirs
+            pass
+        return True
+
+    @staticmethod
+    def _seconds_until_end_of(day):
+        """Seconds from now until midnight at the end of `day`, at least one."""
+        end_of_day = datetime.combine(day + timedelta(days=1), dt_time.min)
+        return max(int((end_of_day - datetime.now()).total_seconds()), 1)
 
     @staticmethod
-    def _get_current_cycle():
-        """Get the current cycle number."""
-        latest_log = CardUsageLog.objects.order_by('-cycle_number').first()
-        if latest_log:
-            # Check if all active live cards have been used in this cycle
-            active_card_count = Flashcard.objects.filter(is_active=True, is_live=True).count()
-            used_in_current_cycle = CardUsageLog.objects.filter(
-                cycle_number=latest_log.cycle_number
-            ).count()
-            
-            if used_in_current_cycle >= active_card_count:
-                return latest_log.cycle_number + 1
-            else:
-                return latest_log.cycle_number
-        else:
-            return 1
+    def _live_card_for_group(version_group):
+        """Get the live active version of a card group, if any."""
+        return Flashcard.objects.filter(
+            version_group=version_group,
+            is_live=True,
+            is_active=True
+        ).first()
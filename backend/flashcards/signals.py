@@ -0,0 +1,228 @@
+import threading
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from .history import VersionHistory
+from .image_references import ImageReferenceService, image_names
+from .images import ImageDerivativeService
+from .models import Flashcard, Tag, version_published
+from .payload_cache import get_payload_cache
+from .search import get_search_backend
+from .services import DailyCardService
+from .suggest import loaded_suggest_index, publish_change
+
+# Card ids whose search document ('index') or content hash ('hash') is refreshed on commit
+_pending = threading.local()
+
+
+def refresh_on_commit(kind, card_ids):
+    """Refresh cards once the current transaction commits, however many signals asked for it.
+
+    Saving a card, setting its tags and publishing it as a new version each fire
+    signals; collected here they cost one search document and content hash update
+    per card, read after the tags are in place.
+    """
+    pending = getattr(_pending, 'cards', None)
+    if pending is None:
+        pending = _pending.cards = {'index': set(), 'hash': set()}
+    pending[kind].update(card_ids)
+    transaction.on_commit(_refresh_pending)
+
+
+def _refresh_pending():
+    pending = getattr(_pending, 'cards', None)
+    if not pending or not (pending['index'] or pending['hash']):
+        # Already done by an earlier callback of the same transaction
+        return
+    _pending.cards = None
+    cards = list(Flashcard.objects.filter(pk__in=pending['index'] | pending['hash']).prefetch_related('tags'))
+    get_search_backend().index_cards([card for card in cards if card.pk in pending['index']])
+    Flashcard.refresh_content_hashes([card for card in cards if card.pk in pending['hash']])
+
+
+@receiver(post_save, sender=Flashcard)
+def schedule_new_card(sender, instance, created, **kwargs):
+    """Add brand new cards to the current daily card cycle."""
+    # New versions of existing cards keep their group's slot
+    if created and instance.version_number == 1 and instance.is_live and instance.is_active:
+        DailyCardService.schedule_card(instance.version_group)
+
+
+@receiver(post_delete, sender=Flashcard)
+def unschedule_deleted_card(sender, instance, **kwargs):
+    """Remove pending daily card slots when a card's live version is deleted."""
+    if instance.is_live:
+        DailyCardService.unschedule_card(instance.version_group)
+    # The deleted row may be the one a cached daily payload points to
+    DailyCardService.invalidate_payload()
+
+
+@receiver(post_save, sender=Flashcard)
+def index_live_card(sender, instance, **kwargs):
+    """Point the group's search document at a newly published live version."""
+    if instance.is_live:
+        refresh_on_commit('index', [instance.pk])
+
+
+@receiver(m2m_changed, sender=Flashcard.tags.through)
+def index_card_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """Refresh tag names in search documents when card tags change."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        if instance.is_live:
+            refresh_on_commit('index', [instance.pk])
+    elif pk_set:
+        refresh_on_commit('index', pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def index_renamed_tag(sender, instance, created, **kwargs):
+    """Refresh search documents of cards carrying a renamed tag."""
+    if not created:
+        cards = instance.flashcards.filter(is_live=True).prefetch_related('tags')
+        get_search_backend().index_cards(cards)
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tagged_cards(sender, instance, **kwargs):
+    instance._search_card_ids = list(instance.flashcards.filter(is_live=True).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def index_deleted_tag(sender, instance, **kwargs):
+    """Drop a deleted tag's name from the search documents of its cards."""
+    card_ids = getattr(instance, '_search_card_ids', [])
+    if card_ids:
+        cards = Flashcard.objects.filter(pk__in=card_ids).prefetch_related('tags')
+        get_search_backend().index_cards(cards)
+
+
+@receiver(post_save, sender=Flashcard)
+def suggest_index_card(sender, instance, **kwargs):
+    """Add live cards to the typeahead index and drop superseded versions."""
+    index = loaded_suggest_index()
+    if index:
+        index.update_card(instance)
+    publish_change('card', instance.pk)
+
+
+@receiver(post_delete, sender=Flashcard)
+def suggest_remove_card(sender, instance, **kwargs):
+    index = loaded_suggest_index()
+    if index:
+        index.remove_card(instance)
+    publish_change('card', instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+def suggest_index_tag(sender, instance, **kwargs):
+    index = loaded_suggest_index()
+    if index:
+        index.update_tag(instance)
+    publish_change('tag', instance.pk)
+
+
+@receiver(post_delete, sender=Tag)
+def suggest_remove_tag(sender, instance, **kwargs):
+    index = loaded_suggest_index()
+    if index:
+        index.remove_tag(instance)
+    publish_change('tag', instance.pk)
+
+
+@receiver(post_save, sender=Flashcard)
+@receiver(post_delete, sender=Flashcard)
+def evict_card_payload(sender, instance, **kwargs):
+    """Drop cached JSON of a version whose row changed (e.g. it is no longer live)."""
+    get_payload_cache().evict(instance.pk)
+
+
+@receiver(post_save, sender=Flashcard)
+def queue_image_derivatives(sender, instance, raw=False, **kwargs):
+    """Resize newly referenced images in the background once the save commits."""
+    if not raw:
+        ImageDerivativeService.schedule(ImageDerivativeService.image_names([instance]))
+
+
+@receiver(post_save, sender=Flashcard)
+def reference_card_images(sender, instance, created, raw=False, **kwargs):
+    """Count a new version's use of its (possibly shared) image files."""
+    if created and not raw:
+        ImageReferenceService.add(image_names([instance]))
+
+
+@receiver(post_delete, sender=Flashcard)
+def dereference_card_images(sender, instance, **kwargs):
+    ImageReferenceService.remove(image_names([instance]))
+
+
+@receiver(m2m_changed, sender=Flashcard.tags.through)
+def evict_card_tags_payload(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        get_payload_cache().clear()
+    else:
+        get_payload_cache().evict(instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def clear_tag_payloads(sender, instance, **kwargs):
+    """Tags are nested in every card payload, so any tag change drops the whole cache."""
+    get_payload_cache().clear()
+
+
+@receiver(version_published, sender=Flashcard)
+def sync_published_version(sender, instance, previous, **kwargs):
+    """Catch up on changes create_new_version makes without model signals.
+    
+    The previous version is demoted with a queryset UPDATE and the new version's
+    tags are bulk inserted, so neither fires post_save or m2m_changed. The new
+    version's own post_save already indexed it, after the commit and so with its tags.
+    """
+    get_payload_cache().evict(previous.pk)
+    index = loaded_suggest_index()
+    if index:
+        index.update_card(previous)
+    publish_change('card', previous.pk)
+
+
+@receiver(version_published, sender=Flashcard)
+def compact_version_history(sender, instance, previous, **kwargs):
+    """Move versions beyond the recent history out of the hot table."""
+    VersionHistory.compact(instance.version_group)
+
+
+@receiver(post_save, sender=Flashcard)
+def hash_saved_card(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Keep the content hash current when a card is saved directly (e.g. in the admin)."""
+    if raw or (created and instance.content_hash):
+        return
+    if update_fields is None or {'title', 'phrase', 'definition'} & set(update_fields):
+        refresh_on_commit('hash', [instance.pk])
+
+
+@receiver(m2m_changed, sender=Flashcard.tags.through)
+def hash_card_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_on_commit('hash', [instance.pk])
+    elif pk_set:
+        refresh_on_commit('hash', pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def hash_renamed_tag(sender, instance, created, **kwargs):
+    """Tag names are part of the content hash of every live card carrying them."""
+    if not created:
+        Flashcard.refresh_content_hashes(instance.flashcards.filter(is_live=True).prefetch_related('tags'))
+
+
+@receiver(post_delete, sender=Tag)
+def hash_deleted_tag(sender, instance, **kwargs):
+    card_ids = getattr(instance, '_search_card_ids', [])
+    if card_ids:
+        Flashcard.refresh_content_hashes(Flashcard.objects.filter(pk__in=card_ids).prefetch_related('tags'))
@@ -0,0 +1,54 @@
+"""
+Content-addressed file storage for card images.
+
+Uploads are stored under the SHA-256 of their bytes, e.g.
+flashcard_images/3f/3fa2...c9.jpg, so uploading the same image again (for a new
+version, a revert or another card) reuses the existing file instead of writing a
+copy. A stored name therefore never changes content, which lets media be served
+with immutable cache headers. Files are shared, so they are only deleted by the
+collect_images command once no card version references them (see
+flashcards.image_references).
+"""
+import hashlib
+import os
+import posixpath
+import uuid
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def content_digest(content):
+    """Hex SHA-256 of a Django File, leaving it positioned at the start."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files after their content."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        digest = content_digest(content)
+        extension = os.path.splitext(filename)[1].lower()
+        return super().save(posixpath.join(directory, digest[:2], digest + extension), content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # An existing file with this name has the same bytes and is reused
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        # Write under a unique name and rename, so concurrent uploads of one image cannot collide
+        partial = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(partial), self.path(name))
+        return name
@@ -0,0 +1,259 @@
+import bisect
+import threading
+import time
+import uuid
+from django.core.cache import cache
+from django.db import connection, transaction
+from .models import Flashcard, Tag
+from .transliteration import fold_diacritics, search_key
+
+# Cache key holding the generation of the last bulk change, after which every worker rebuilds
+GENERATION_CACHE_KEY = 'suggest:generation'
+# Sequence number of the last single card or tag change, and the change recorded under each number
+SEQUENCE_CACHE_KEY = 'suggest:sequence'
+CHANGE_CACHE_KEY = 'suggest:change:{}'
+CHANGE_TIMEOUT = 24 * 60 * 60
+# A worker further behind than this rebuilds instead of replaying the changes
+MAX_CATCH_UP = 200
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+CARD_COLUMNS = ('id', 'title', 'title_key', 'phrase_key', 'phrase_ascii')
+
+
+def _word_keys(text):
+    """Keys for every word start in `text`, so "pranidhana" finds "Ishvara Pranidhana"."""
+    words = text.split()
+    return {' '.join(words[index:]) for index in range(len(words))}
+
+
+class SuggestIndex:
+    """Per-process sorted-array prefix index over live card titles, phrases and tag names.
+
+    Entries are (key, kind, object_id, label) tuples kept sorted by key, so a prefix
+    lookup is a bisect plus a short scan. A changed card or tag is updated in place
+    with bisect.insort and del, under a lock that lookups hold for their scan.
+
+    Other workers learn of single changes through a journal in the shared cache: each
+    change gets the next SEQUENCE_CACHE_KEY number, and sync() re-reads just the
+    cards and tags changed since this index's sequence. Bulk changes bump
+    GENERATION_CACHE_KEY instead; the full rebuild they need runs in a background
+    thread while requests keep using the current entries.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._entries = []
+        # (kind, object_id) -> that object's entries, to find them again by bisect
+        self._objects = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._rebuilding = False
+        self.generation = None
+        self.sequence = 0
+        self.build_ms = 0.0
+        self.built_at = None
+
+    def build(self):
+        """Rebuild the whole index from the database."""
+        started = time.perf_counter()
+        # Read before the data, so changes made during the build are replayed afterwards
+        _start_sequence()
+        generation, sequence = _journal_position()
+        objects = {}
+        live_cards = Flashcard.objects.filter(is_active=True, is_live=True).values_list(*CARD_COLUMNS)
+        for card_id, title, title_key, phrase_key, phrase_ascii in live_cards:
+            objects[('card', card_id)] = self._card_entries(card_id, title, title_key, phrase_key, phrase_ascii)
+        for tag_id, name in Tag.objects.values_list('id', 'name'):
+            objects[('tag', tag_id)] = self._tag_entries(tag_id, name)
+        entries = sorted(entry for object_entries in objects.values() for entry in object_entries)
+
+        with self._lock:
+            self._keys = [entry[0] for entry in entries]
+            self._entries = entries
+            self._objects = objects
+            self.generation = generation
+            self.sequence = sequence
+            self.build_ms = (time.perf_counter() - started) * 1000
+            self.built_at = time.time()
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """Return up to `limit` distinct matches whose key starts with the normalized query."""
+        prefix = search_key(query)
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        with self._lock:
+            keys, entries = self._keys, self._entries
+            index = bisect.bisect_left(keys, prefix)
+            while index < len(keys) and keys[index].startswith(prefix) and len(results) < limit:
+                key, kind, object_id, label = entries[index]
+                if (kind, object_id) not in seen:
+                    seen.add((kind, object_id))
+                    results.append({'type': kind, 'id': object_id, 'label': label})
+                index += 1
+        return results
+
+    def update_card(self, card):
+        """Index a card if it is live, or drop it once a newer version replaced it."""
+        entries = []
+        if card.is_live and card.is_active:
+            entries = self._card_entries(card.id, card.title, card.title_key, card.phrase_key, card.phrase_ascii)
+        self._replace('card', card.id, entries)
+
+    def remove_card(self, card):
+        self._replace('card', card.id, [])
+
+    def update_tag(self, tag):
+        self._replace('tag', tag.id, self._tag_entries(tag.id, tag.name))
+
+    def remove_tag(self, tag):
+        self._replace('tag', tag.id, [])
+
+    def sync(self):
+        """Catch up on other workers' changes: replay recent ones, or rebuild in the background."""
+        generation, sequence = _journal_position()
+        if generation != self.generation or sequence < self.sequence:
+            # A bulk change, or the sequence counter was evicted and numbering started again
+            self._rebuild_in_background()
+            return
+        if sequence == self.sequence or not self._sync_lock.acquire(blocking=False):
+            # Up to date, or another request thread is already catching up
+            return
+        try:
+            self._catch_up(self.sequence, sequence)
+        finally:
+            self._sync_lock.release()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'sequence': self.sequence,
+            'build_ms': round(self.build_ms, 3),
+            'built_at': self.built_at,
+        }
+
+    def _catch_up(self, start, end):
+        if end - start > MAX_CATCH_UP:
+            self._rebuild_in_background()
+            return
+        changes = cache.get_many([CHANGE_CACHE_KEY.format(number) for number in range(start + 1, end + 1)])
+        if len(changes) < end - start:
+            # Evicted, or not written yet by the worker that took the number
+            self._rebuild_in_background()
+            return
+
+        card_ids = {object_id for kind, object_id in changes.values() if kind == 'card'}
+        tag_ids = {object_id for kind, object_id in changes.values() if kind == 'tag'}
+        cards = {}
+        if card_ids:
+            live_cards = Flashcard.objects.filter(pk__in=card_ids, is_active=True, is_live=True).values_list(*CARD_COLUMNS)
+            cards = {row[0]: self._card_entries(*row) for row in live_cards}
+        tags = {}
+        if tag_ids:
+            tags = {tag_id: self._tag_entries(tag_id, name) for tag_id, name in Tag.objects.filter(pk__in=tag_ids).values_list('id', 'name')}
+
+        for card_id in card_ids:
+            self._replace('card', card_id, cards.get(card_id, []))
+        for tag_id in tag_ids:
+            self._replace('tag', tag_id, tags.get(tag_id, []))
+        with self._lock:
+            self.sequence = max(self.sequence, end)
+
+    def _replace(self, kind, object_id, new_entries):
+        """Replace the entries of one card or tag in place."""
+        with self._lock:
+            for entry in self._objects.pop((kind, object_id), []):
+                index = bisect.bisect_left(self._entries, entry)
+                if index < len(self._entries) and self._entries[index] == entry:
+                    del self._entries[index]
+                    del self._keys[index]
+            for entry in new_entries:
+                index = bisect.bisect_left(self._entries, entry)
+                self._entries.insert(index, entry)
+                self._keys.insert(index, entry[0])
+            if new_entries:
+                self._objects[(kind, object_id)] = new_entries
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._background_build, name='suggest-index-rebuild', daemon=True).start()
+
+    def _background_build(self):
+        try:
+            self.build()
+        finally:
+            self._rebuilding = False
+            connection.close()
+
+    @staticmethod
+    def _card_entries(card_id, title, title_key, phrase_key, phrase_ascii):
+        keys = _word_keys(title_key or fold_diacritics(title))
+        for phrase in (phrase_key, phrase_ascii):
+            if phrase:
+                keys |= _word_keys(phrase)
+        return [(key, 'card', card_id, title) for key in keys]
+
+    @staticmethod
+    def _tag_entries(tag_id, name):
+        return [(key, 'tag', tag_id, name) for key in _word_keys(fold_diacritics(name))]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _journal_position():
+    values = cache.get_many([GENERATION_CACHE_KEY, SEQUENCE_CACHE_KEY])
+    return values.get(GENERATION_CACHE_KEY), values.get(SEQUENCE_CACHE_KEY, 0)
+
+
+def get_suggest_index():
+    """Return this process's index, built on first use and kept in step with other workers."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = SuggestIndex()
+            index.build()
+            _index = index
+    _index.sync()
+    return _index
+
+
+def loaded_suggest_index():
+    """Return this process's index only if it has been built, for incremental updates."""
+    return _index
+
+
+def publish_change(kind, object_id):
+    """Record a changed card or tag for the other workers, once the surrounding transaction commits."""
+    transaction.on_commit(lambda: _append_change(kind, object_id))
+
+
+def _append_change(kind, object_id):
+    try:
+        sequence = cache.incr(SEQUENCE_CACHE_KEY)
+    except ValueError:
+        _start_sequence()
+        sequence = cache.incr(SEQUENCE_CACHE_KEY)
+    cache.set(CHANGE_CACHE_KEY.format(sequence), (kind, object_id), CHANGE_TIMEOUT)
+
+
+def _start_sequence():
+    """Create the sequence counter if the cache has lost it (or never had it).
+
+    Numbering then starts again at 0, handing out numbers other workers have already
+    replayed, so they are made to rebuild instead of skipping those changes.
+    """
+    if cache.add(SEQUENCE_CACHE_KEY, 0, None):
+        invalidate_suggest_index()
+
+
+def invalidate_suggest_index():
+    """Make every worker rebuild its index, after bulk changes made without model signals."""
+    cache.set(GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
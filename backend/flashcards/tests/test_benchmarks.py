@@ -0,0 +1,63 @@
+"""
+API benchmarks at several catalog sizes. Skipped by default; run with
+
+    pytest -m benchmark --benchmark-scales 10000,100000 --benchmark-baseline results.json
+
+Each scale seeds the test database on the configured engine (SQLite, or MySQL
+when DATABASE_URL points at one) and is flushed again afterwards.
+"""
+import json
+import pytest
+from django.core.cache import cache
+from flashcards.benchmark import DEFAULT_TOLERANCE, ApiBenchmark, find_regressions, results_document, seed_volumes
+from flashcards.loadgen import LOAD_PREFIX, LoadDataGenerator
+from users.models import User
+
+
+def pytest_generate_tests(metafunc):
+    if 'scale' in metafunc.fixturenames:
+        scales = [int(scale) for scale in metafunc.config.getoption('benchmark_scales').split(',') if scale.strip()]
+        metafunc.parametrize('scale', scales)
+
+
+@pytest.fixture(scope='module')
+def results(request):
+    """Per-scale results of this run, written to --benchmark-output when the module finishes."""
+    collected = {}
+    yield collected
+    if collected:
+        with open(request.config.getoption('benchmark_output'), 'w', encoding='utf-8') as file:
+            json.dump(results_document(collected), file, indent=2)
+
+
+@pytest.fixture
+def baseline(request):
+    path = request.config.getoption('benchmark_baseline')
+    if not path:
+        return None
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_api_benchmark(scale, request, results, baseline):
+    config = request.config
+    cache.clear()
+    LoadDataGenerator(seed=config.getoption('benchmark_seed')).generate(**seed_volumes(scale))
+    cache.clear()
+    try:
+        curator = User.objects.filter(username__startswith=LOAD_PREFIX, role='curator').order_by('username').first()
+        benchmark = ApiBenchmark(
+            iterations=config.getoption('benchmark_iterations'),
+            warmup=config.getoption('benchmark_warmup'),
+        )
+        results[scale] = benchmark.run(curator)
+    finally:
+        LoadDataGenerator._invalidate()
+        cache.clear()
+
+    if baseline is not None:
+        tolerance = config.getoption('benchmark_tolerance') or DEFAULT_TOLERANCE
+        regressions = find_regressions(results_document({scale: results[scale]}), baseline, tolerance)
+        assert not regressions, '\n'.join(regressions)
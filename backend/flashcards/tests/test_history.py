@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from flashcards.history import VersionHistory
+from flashcards.models import Flashcard, FlashcardRevision
+from users.models import User, UserProfile
+
+
+class CompactionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.curator = User.objects.create_user('curator1', 'curator1@example.com', 'pw12345!', role='curator')
+        card = Flashcard.objects.create(title='Tadasana', definition='Mountain pose', created_by=self.curator)
+        self.versions = [card]
+        for number in range(2, 5):
+            card = card.create_new_version(self.curator, definition=f'Mountain pose, take {number}')
+            self.versions.append(card)
+        self.version_group = card.version_group
+
+    def test_superseded_versions_are_archived(self):
+        self.assertEqual(VersionHistory.compact(self.version_group, keep=0), 3)
+        self.assertEqual(Flashcard.objects.filter(version_group=self.version_group).count(), 1)
+        self.assertEqual(FlashcardRevision.objects.filter(version_group=self.version_group).count(), 3)
+
+    def test_favorites_survive_compaction(self):
+        profile = UserProfile.objects.create(user=User.objects.create_user('user1', 'user1@example.com', 'pw12345!'))
+        favorite = self.versions[1]
+        profile.favorite_cards.add(favorite)
+
+        self.assertEqual(VersionHistory.compact(self.version_group, keep=0), 2)
+
+        self.assertTrue(Flashcard.objects.filter(pk=favorite.pk).exists())
+        self.assertEqual(list(profile.favorite_cards.values_list('pk', flat=True)), [favorite.pk])
+        self.assertEqual(
+            [version.version_number for version in VersionHistory.versions(self.version_group)], [4, 3, 2, 1]
+        )
+
+    def test_version_favorited_after_selection_is_not_archived(self):
+        profile = UserProfile.objects.create(user=User.objects.create_user('user1', 'user1@example.com', 'pw12345!'))
+        profile.favorite_cards.add(self.versions[0])
+
+        self.assertEqual(VersionHistory.archive(self.versions[:2]), 1)
+        self.assertEqual(list(profile.favorite_cards.values_list('pk', flat=True)), [self.versions[0].pk])
+
+    def test_archived_version_is_reverted_by_number(self):
+        VersionHistory.compact(self.version_group, keep=0)
+        client = APIClient()
+        client.force_authenticate(self.curator)
+
+        response = client.post(f'/api/cards/{self.versions[-1].pk}/revert_version/', {'version_number': 2}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version_number'], 5)
+        self.assertEqual(response.data['definition'], 'Mountain pose, take 2')
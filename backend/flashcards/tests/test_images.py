@@ -0,0 +1,60 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from flashcards.images import ImageDerivativeService
+from flashcards.models import ImageDerivativeSet, image_storage
+
+
+def png_bytes(size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class DerivativeGenerationTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, CARD_IMAGE_WIDTHS=[32])
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def generate(self, data):
+        source = image_storage.save('flashcard_images/pose.png', ContentFile(data))
+        ImageDerivativeSet.objects.create(source=source)
+        return ImageDerivativeService.generate(source)
+
+    def test_image_gets_derivatives(self):
+        derivative_set = self.generate(png_bytes())
+        self.assertEqual(derivative_set.status, ImageDerivativeSet.READY)
+        self.assertEqual((derivative_set.width, derivative_set.height), (64, 48))
+
+    def test_truncated_image_is_marked_failed(self):
+        with self.assertLogs('flashcards.images', 'WARNING'):
+            derivative_set = self.generate(png_bytes()[:60])
+        self.assertEqual(derivative_set.status, ImageDerivativeSet.FAILED)
+        self.assertTrue(derivative_set.error)
+
+    def test_decompression_bomb_is_marked_failed(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 100), self.assertLogs('flashcards.images', 'WARNING'):
+            derivative_set = self.generate(png_bytes())
+        self.assertEqual(derivative_set.status, ImageDerivativeSet.FAILED)
+        self.assertIn('decompression bomb', derivative_set.error)
+
+    def test_changed_rendering_parameters_give_new_names_and_drop_the_old_files(self):
+        first = self.generate(png_bytes())
+        with mock.patch('flashcards.images.VARIANT_TAG', '0badc0de'):
+            second = ImageDerivativeService.generate(first.source)
+
+        old_names = {variant['name'] for variant in first.variants}
+        new_names = {variant['name'] for variant in second.variants}
+        self.assertFalse(old_names & new_names)
+        self.assertTrue(all('-0badc0de.' in name for name in new_names))
+        self.assertFalse(any(image_storage.exists(name) for name in old_names))
+        self.assertTrue(all(image_storage.exists(name) for name in new_names))
@@ -0,0 +1,35 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from flashcards import payload_cache
+from flashcards.importer import CardImporter
+from flashcards.models import Flashcard
+from users.models import User
+
+
+class CardImporterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.curator = User.objects.create_user('curator1', 'curator1@example.com', 'pw12345!', role='curator')
+
+    def rows(self, count):
+        return [(number, {'title': f'Asana {number}', 'definition': 'A pose'}) for number in range(1, count + 1)]
+
+    def test_failed_import_still_invalidates_other_workers_caches(self):
+        importer = CardImporter(self.curator, batch_size=2)
+        write_batch = importer._write_batch
+        calls = []
+
+        def fail_second_batch(cards):
+            calls.append(cards)
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return write_batch(cards)
+
+        generation = cache.get(payload_cache.GENERATION_CACHE_KEY)
+        with mock.patch.object(importer, '_write_batch', side_effect=fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                importer.run(self.rows(4))
+
+        self.assertEqual(Flashcard.objects.count(), 2)
+        self.assertNotEqual(cache.get(payload_cache.GENERATION_CACHE_KEY), generation)
@@ -0,0 +1,50 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from flashcards.models import Flashcard
+from flashcards.payload_cache import STAMP_TIMEOUT, VersionPayloadCache
+from flashcards.serializers import FlashcardListSerializer
+from users.models import User
+
+
+class PayloadCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('curator1', 'curator1@example.com', 'pw12345!', role='curator')
+        self.cards = [
+            Flashcard.objects.create(title=title, definition='Pose', created_by=self.user)
+            for title in ('Tadasana', 'Vrksasana')
+        ]
+        # Two workers' caches
+        self.here = VersionPayloadCache()
+        self.there = VersionPayloadCache()
+
+    def render(self, payload_cache):
+        return payload_cache.render(self.cards, FlashcardListSerializer, {})
+
+    def test_eviction_elsewhere_drops_only_that_card(self):
+        self.render(self.there)
+        self.assertEqual(self.there.misses, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.here.evict(self.cards[0].pk)
+        Flashcard.objects.filter(pk=self.cards[0].pk).update(title='Mountain')
+        self.cards[0].refresh_from_db()
+        fragments = self.render(self.there)
+
+        self.assertEqual((self.there.hits, self.there.misses), (1, 3))
+        self.assertIn(b'"Mountain"', fragments[0].content)
+
+    def test_unchanged_cards_are_served_from_cache(self):
+        self.render(self.there)
+        self.render(self.there)
+        self.assertEqual((self.there.hits, self.there.misses), (2, 2))
+
+    def test_missing_stamps_are_written_in_one_call_and_expire(self):
+        with mock.patch.object(cache, 'set_many', wraps=cache.set_many) as set_many:
+            self.render(self.there)
+            self.render(self.here)
+
+        set_many.assert_called_once()
+        self.assertEqual(set_many.call_args.args[1], STAMP_TIMEOUT)
+        self.assertEqual(self.here.misses, 2)
@@ -0,0 +1,89 @@
+import json
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import resolve
+from rest_framework.test import APIClient
+from flashcards import suggest
+from flashcards.models import DailyCard, Flashcard, Tag
+from flashcards.payload_cache import get_payload_cache
+from users.models import User
+from yoga_flashcards.querycount import QueryRecorder
+
+CARDS = 25
+VERSIONS = 8
+
+
+class QueryBudgetTests(TestCase):
+    """The hot endpoints stay within QUERY_BUDGETS however many cards, tags and versions there are.
+
+    Enough rows are created (including archived versions) that a query per card, tag
+    or version would exceed the budget, and the payload cache is cleared so every
+    card is serialized.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.curator = User.objects.create_user('curator1', 'curator1@example.com', 'pw12345!', role='curator')
+        tags = [Tag.objects.create(name=f'Tag {number}') for number in range(5)]
+        cls.cards = []
+        for number in range(CARDS):
+            card = Flashcard.objects.create(
+                title=f'Asana {number}', phrase=f'आसन {number}', definition='A pose', created_by=cls.curator,
+                front_image=f'flashcard_images/front-{number}.png', back_image=f'flashcard_images/back-{number}.png',
+            )
+            card.tags.set(tags[:3])
+            cls.cards.append(card)
+        card = cls.cards[0]
+        for number in range(VERSIONS):
+            card = card.create_new_version(cls.curator, definition=f'A pose, take {number}')
+        cls.card = card
+        DailyCard.objects.create(date=date.today(), card=card)
+
+    def setUp(self):
+        cache.clear()
+        get_payload_cache().clear()
+        suggest._index = None
+        self.client = APIClient()
+        self.client.login(username='curator1', password='pw12345!')
+
+    def assertWithinBudget(self, path):
+        method_and_name = f'GET {resolve(path.split("?")[0]).view_name}'
+        budget = settings.QUERY_BUDGETS[method_and_name]
+        with QueryRecorder() as recorder:
+            response = self.client.get(path)
+            # Streaming responses run their queries while the body is read
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            recorder.count, budget,
+            f'{method_and_name} ran {recorder.count} queries, budget is {budget}:\n' + '\n'.join(recorder.shapes),
+        )
+        self.assertEqual(recorder.repeated(), [], method_and_name)
+        return content
+
+    def test_list(self):
+        self.assertEqual(json.loads(self.assertWithinBudget('/api/cards/'))['count'], CARDS)
+
+    def test_list_with_expanded_tags(self):
+        self.assertWithinBudget('/api/cards/?fields=id,title,tags,created_by_username,back_image_srcset&expand=tags')
+
+    def test_retrieve(self):
+        self.assertWithinBudget(f'/api/cards/{self.card.pk}/')
+
+    def test_versions(self):
+        self.assertEqual(len(json.loads(self.assertWithinBudget(f'/api/cards/{self.card.pk}/versions/'))), VERSIONS + 1)
+
+    def test_daily_card(self):
+        self.assertWithinBudget('/api/dailycard/')
+
+    def test_suggest(self):
+        suggest.get_suggest_index()
+        self.assertWithinBudget('/api/cards/suggest/?q=asa')
+
+    def test_tags(self):
+        self.assertWithinBudget('/api/tags/')
+
+    def test_export(self):
+        self.assertEqual(len(self.assertWithinBudget('/api/cards/export/?type=jsonl').splitlines()), CARDS)
@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.test import TestCase
+from flashcards.models import DailyCardSchedule, Flashcard
+from flashcards.services import DailyCardService
+from users.models import User
+
+
+class DailyCardScheduleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.curator = User.objects.create_user('curator1', 'curator1@example.com', 'pw12345!', role='curator')
+        for number in range(5):
+            Flashcard.objects.create(title=f'Card {number}', definition='Definition', created_by=self.curator)
+
+    def positions(self):
+        return list(DailyCardSchedule.objects.order_by('position').values_list('position', flat=True))
+
+    def test_cycle_is_not_generated_again_by_a_worker_that_waited_for_the_lock(self):
+        self.assertTrue(DailyCardService._generate_cycle())
+        # A second worker that found no pending slot before the first one appended its cycle
+        self.assertTrue(DailyCardService._generate_cycle())
+
+        self.assertEqual(self.positions(), [1, 2, 3, 4, 5])
+
+    def test_new_cards_join_the_pending_cycle_with_unique_positions(self):
+        DailyCardService.get_daily_card(date.today())
+        single = Flashcard.objects.create(title='Single', definition='Definition', created_by=self.curator)
+        many = [
+            Flashcard.objects.create(title=f'Imported {number}', definition='Definition', created_by=self.curator)
+            for number in range(3)
+        ]
+        DailyCardService.schedule_cards([card.version_group for card in many])
+
+        self.assertEqual(self.positions(), list(range(1, 10)))
+        pending = set(DailyCardSchedule.objects.filter(used_date__isnull=True).values_list('version_group', flat=True))
+        self.assertEqual(len(pending), 8)
+        self.assertTrue({single.version_group, *(card.version_group for card in many)} <= pending)
+
+    def test_every_card_is_served_once_per_cycle(self):
+        served = [DailyCardService.get_daily_card(date.today() + timedelta(days=offset)) for offset in range(5)]
+
+        self.assertEqual(len({card.version_group for card in served}), 5)
+        self.assertEqual(self.positions(), [1, 2, 3, 4, 5])
@@ -0,0 +1,46 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from flashcards.models import Flashcard, FlashcardSearchDocument, Tag
+from flashcards.search import SearchBackend
+from users.models import User
+
+
+class SearchIndexSignalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.curator = User.objects.create_user('curator1', 'curator1@example.com', 'pw12345!', role='curator')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.card = Flashcard.objects.create(title='Tadasana', definition='Mountain pose', created_by=self.curator)
+            self.card.tags.add(Tag.objects.create(name='Standing'))
+
+    def indexed(self):
+        return FlashcardSearchDocument.objects.get(version_group=self.card.version_group)
+
+    def test_published_version_is_indexed_once_with_its_tags(self):
+        with mock.patch.object(SearchBackend, 'index_cards', autospec=True, side_effect=SearchBackend.index_cards) as index_cards:
+            with self.captureOnCommitCallbacks(execute=True):
+                new_version = self.card.create_new_version(self.curator, definition='Tall mountain pose')
+
+        indexed = [card.pk for call in index_cards.call_args_list for card in call.args[1]]
+        self.assertEqual(indexed, [new_version.pk])
+        self.assertIn('Tall mountain', self.indexed().definition)
+        self.assertIn('Standing', self.indexed().tag_names)
+
+    def test_created_card_is_indexed_and_hashed_once_after_its_tags(self):
+        client = APIClient()
+        client.force_authenticate(self.curator)
+        with mock.patch.object(SearchBackend, 'index_cards', autospec=True, side_effect=SearchBackend.index_cards) as index_cards, \
+                mock.patch.object(Flashcard, 'refresh_content_hashes', side_effect=Flashcard.refresh_content_hashes) as rehash:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post('/api/cards/', {
+                    'title': 'Vrksasana', 'definition': 'Tree pose', 'is_active': True,
+                    'tag_names': ['Standing', 'Balance', 'Beginner'],
+                }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        card = Flashcard.objects.get(title='Vrksasana')
+        self.assertEqual(index_cards.call_count, 1)
+        self.assertEqual(rehash.call_count, 1)
+        self.assertEqual(card.content_hash, Flashcard.fingerprint('Vrksasana', None, 'Tree pose', ['Standing', 'Balance', 'Beginner']))
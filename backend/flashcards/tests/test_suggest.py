@@ -0,0 +1,79 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from flashcards import suggest
+from flashcards.models import Flashcard, Tag
+from flashcards.suggest import SuggestIndex, invalidate_suggest_index
+from users.models import User
+
+
+class SuggestIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        suggest._index = None
+        self.curator = User.objects.create_user('curator1', 'curator1@example.com', 'pw12345!', role='curator')
+        self.card = Flashcard.objects.create(title='Tadasana', definition='Mountain pose', created_by=self.curator)
+
+    def tearDown(self):
+        suggest._index = None
+
+    def labels(self, index, query):
+        return [result['label'] for result in index.suggest(query)]
+
+    def test_edits_update_the_loaded_index_in_place(self):
+        index = suggest.get_suggest_index()
+        self.card.create_new_version(self.curator, title='Vrksasana')
+        Tag.objects.create(name='Standing')
+
+        self.assertEqual(self.labels(index, 'tada'), [])
+        self.assertEqual(self.labels(index, 'vrks'), ['Vrksasana'])
+        self.assertEqual(self.labels(index, 'stand'), ['Standing'])
+        self.assertEqual(index._keys, [entry[0] for entry in index._entries])
+        self.assertEqual(index._entries, sorted(index._entries))
+
+    def test_other_workers_replay_changes_without_rebuilding(self):
+        other = SuggestIndex()
+        other.build()
+        built_at = other.built_at
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.card.create_new_version(self.curator, title='Vrksasana')
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create(name='Standing')
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+
+        with mock.patch.object(SuggestIndex, '_rebuild_in_background') as rebuild:
+            other.sync()
+        rebuild.assert_not_called()
+        self.assertEqual(other.built_at, built_at)
+        self.assertEqual(self.labels(other, 'tada'), [])
+        self.assertEqual(self.labels(other, 'vrks'), ['Vrksasana'])
+        self.assertEqual(self.labels(other, 'stand'), [])
+
+    def test_bulk_changes_rebuild_off_the_request_path(self):
+        index = suggest.get_suggest_index()
+        invalidate_suggest_index()
+
+        with mock.patch.object(SuggestIndex, '_rebuild_in_background') as rebuild:
+            self.assertIs(suggest.get_suggest_index(), index)
+        rebuild.assert_called_once_with()
+        self.assertEqual(self.labels(index, 'tada'), ['Tadasana'])
+
+    def test_workers_rebuild_when_the_sequence_counter_is_evicted(self):
+        other = SuggestIndex()
+        other.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.card.create_new_version(self.curator, title='Vrksasana')
+        other.sync()
+        self.assertEqual(other.sequence, 2)
+
+        cache.delete(suggest.SEQUENCE_CACHE_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Standing')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Seated')
+
+        with mock.patch.object(SuggestIndex, '_rebuild_in_background') as rebuild:
+            other.sync()
+        rebuild.assert_called_once_with()
@@ -0,0 +1,72 @@
+import threading
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase
+from flashcards.models import Flashcard, VersionConflict
+from users.models import User
+
+WORKERS = 8
+ROUNDS = 3
+
+
+class ConcurrentEditTests(TransactionTestCase):
+    """Editors racing on one live version: exactly one wins, the rest get a VersionConflict."""
+
+    def setUp(self):
+        cache.clear()
+        self.editor = User.objects.create_user('curator1', 'curator1@example.com', 'pw12345!', role='curator')
+        self.card = Flashcard.objects.create(title='Tadasana', definition='Mountain pose', created_by=self.editor)
+
+    def race(self, base):
+        results = []
+        barrier = threading.Barrier(WORKERS)
+
+        def edit(worker):
+            stale = Flashcard.objects.get(pk=base.pk)
+            barrier.wait()
+            definition = f'{base.definition} [{worker}]'
+            try:
+                while True:
+                    try:
+                        stale.create_new_version(
+                            updated_by=self.editor, expected_version=base.version_number, definition=definition
+                        )
+                        results.append('won')
+                    except OperationalError as error:
+                        if connection.vendor != 'sqlite' or 'locked' not in str(error):
+                            results.append(f'error: {error!r}')
+                        # SQLite refuses some lock upgrades between concurrent transactions instead of
+                        # waiting. Before the commit the edit was rolled back and is tried again; after
+                        # it only a signal receiver failed and the edit stands
+                        elif Flashcard.objects.filter(version_group=base.version_group, definition=definition).exists():
+                            results.append('won')
+                        else:
+                            continue
+                    except VersionConflict:
+                        results.append('conflict')
+                    except Exception as error:
+                        results.append(f'error: {error!r}')
+                    break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=edit, args=(worker,)) for worker in range(WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_exactly_one_concurrent_edit_wins(self):
+        for round_number in range(1, ROUNDS + 1):
+            base = Flashcard.objects.get(version_group=self.card.version_group, is_live=True)
+
+            results = self.race(base)
+
+            self.assertEqual(results.count('won'), 1, results)
+            self.assertEqual(results.count('conflict'), WORKERS - 1, results)
+            live = Flashcard.objects.filter(version_group=self.card.version_group, is_live=True)
+            self.assertEqual(live.count(), 1)
+            self.assertEqual(live.get().version_number, round_number + 1)
+        numbers = Flashcard.objects.filter(version_group=self.card.version_group).values_list('version_number', flat=True)
+        self.assertEqual(sorted(numbers), list(range(1, ROUNDS + 2)))
@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from flashcards.models import Flashcard
+from users.models import User
+
+
+class CardListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user1', 'user1@example.com', 'pw12345!')
+        self.card = Flashcard.objects.create(
+            title='Tadasana', definition='Mountain pose', created_by=self.user, back_image='flashcard_images/back.png'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_includes_back_image_by_default(self):
+        response = self.client.get('/api/cards/')
+
+        self.assertEqual(response.status_code, 200)
+        card = response.json()['results'][0]
+        self.assertTrue(card['back_image'].endswith('/media/flashcard_images/back.png'))
+        self.assertIn('back_image_srcset', card)
+
+
+class RankedSearchPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user1', 'user1@example.com', 'pw12345!')
+        # The best match is the least recently updated card
+        for title, definition in [
+            ('Tadasana', 'Mountain pose'),
+            ('Vrksasana', 'Tree pose, balancing like a mountain'),
+            ('Utkatasana', 'Chair pose'),
+        ]:
+            # Cards are indexed for search once their transaction commits
+            with self.captureOnCommitCallbacks(execute=True):
+                Flashcard.objects.create(title=title, definition=definition, created_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def titles(self, response):
+        return [card['title'] for card in response.json()['results']]
+
+    def test_search_keeps_rank_order_with_cursor(self):
+        ranked = self.client.get('/api/cards/?search=mountain')
+        with_cursor = self.client.get('/api/cards/?search=mountain&cursor=&page_size=1')
+
+        self.assertEqual(self.titles(ranked)[0], 'Tadasana')
+        self.assertEqual(self.titles(with_cursor), ['Tadasana'])
+        self.assertEqual(with_cursor.json()['count'], 2)
+        self.assertNotIn('cursor=', with_cursor.json()['next'])
+        self.assertIn('page=2', with_cursor.json()['next'])
+
+    def test_cursor_pages_without_search(self):
+        response = self.client.get('/api/cards/?cursor=&page_size=1')
+        self.assertEqual(self.titles(response), ['Utkatasana'])
+        self.assertIn('cursor=', response.json()['next'])
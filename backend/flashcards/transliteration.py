@@ -0,0 +1,102 @@
+"""
+Normalization of Sanskrit terms for search.
+
+Cards mix romanized titles ("Pranayama"), IAST with diacritics ("prāṇāyāma") and
+Devanagari phrases ("प्राणायाम"). These helpers reduce all of them to plain
+lowercase ASCII keys so every spelling can be matched against the same index.
+"""
+import re
+import unicodedata
+
+INDEPENDENT_VOWELS = {
+    'अ': 'a', 'आ': 'ā', 'इ': 'i', 'ई': 'ī', 'उ': 'u', 'ऊ': 'ū',
+    'ऋ': 'ṛ', 'ॠ': 'ṝ', 'ऌ': 'ḷ', 'ॡ': 'ḹ',
+    'ए': 'e', 'ऐ': 'ai', 'ओ': 'o', 'औ': 'au',
+}
+
+VOWEL_SIGNS = {
+    'ा': 'ā', 'ि': 'i', 'ी': 'ī', 'ु': 'u', 'ू': 'ū',
+    'ृ': 'ṛ', 'ॄ': 'ṝ', 'ॢ': 'ḷ', 'ॣ': 'ḹ',
+    'े': 'e', 'ै': 'ai', 'ो': 'o', 'ौ': 'au',
+}
+
+CONSONANTS = {
+    'क': 'k', 'ख': 'kh', 'ग': 'g', 'घ': 'gh', 'ङ': 'ṅ',
+    'च': 'c', 'छ': 'ch', 'ज': 'j', 'झ': 'jh', 'ञ': 'ñ',
+    'ट': 'ṭ', 'ठ': 'ṭh', 'ड': 'ḍ', 'ढ': 'ḍh', 'ण': 'ṇ',
+    'त': 't', 'थ': 'th', 'द': 'd', 'ध': 'dh', 'न': 'n',
+    'प': 'p', 'फ': 'ph', 'ब': 'b', 'भ': 'bh', 'म': 'm',
+    'य': 'y', 'र': 'r', 'ल': 'l', 'व': 'v',
+    'श': 'ś', 'ष': 'ṣ', 'स': 's', 'ह': 'h', 'ळ': 'ḷ',
+}
+
+OTHER_SIGNS = {
+    'ं': 'ṃ', 'ः': 'ḥ', 'ँ': 'm̐', 'ऽ': "'", 'ॐ': 'oṃ', '।': '|', '॥': '||',
+    '०': '0', '१': '1', '२': '2', '३': '3', '४': '4',
+    '५': '5', '६': '6', '७': '7', '८': '8', '९': '9',
+}
+
+VIRAMA = '्'
+NUKTA = '़'
+
+# Anusvara is pronounced as the nasal of the following consonant class
+ANUSVARA_BEFORE_N = re.compile(r'ṃ(?=[tdncj])')
+ASCII_DIGRAPHS = re.compile(r'ch|c|ś|ṣ|ṛ|ṝ|ḷ|ḹ')
+ASCII_REPLACEMENTS = {
+    'ch': 'chh', 'c': 'ch', 'ś': 'sh', 'ṣ': 'sh', 'ṛ': 'ri', 'ṝ': 'ri', 'ḷ': 'li', 'ḹ': 'li',
+}
+
+
+def devanagari_to_iast(text):
+    """Transliterate Devanagari characters in `text` to IAST, leaving other characters as they are."""
+    if not text:
+        return ''
+
+    result = []
+    chars = [char for char in text if char != NUKTA]
+    index = 0
+    while index < len(chars):
+        char = chars[index]
+        if char in CONSONANTS:
+            result.append(CONSONANTS[char])
+            following = chars[index + 1] if index + 1 < len(chars) else ''
+            if following in VOWEL_SIGNS:
+                result.append(VOWEL_SIGNS[following])
+                index += 1
+            elif following == VIRAMA:
+                index += 1
+            else:
+                # Inherent vowel
+                result.append('a')
+        elif char in INDEPENDENT_VOWELS:
+            result.append(INDEPENDENT_VOWELS[char])
+        elif char in OTHER_SIGNS:
+            result.append(OTHER_SIGNS[char])
+        elif char in VOWEL_SIGNS:
+            result.append(VOWEL_SIGNS[char])
+        elif char != VIRAMA:
+            result.append(char)
+        index += 1
+    return ''.join(result)
+
+
+def fold_diacritics(text):
+    """Lowercase `text` and strip diacritics, e.g. "Prāṇāyāma" -> "pranayama"."""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def to_ascii(text):
+    """Popular ASCII romanization of IAST text, e.g. "saṃtoṣa" -> "santosha"."""
+    if not text:
+        return ''
+    text = ANUSVARA_BEFORE_N.sub('n', text.lower())
+    text = ASCII_DIGRAPHS.sub(lambda match: ASCII_REPLACEMENTS[match.group()], text)
+    return fold_diacritics(text)
+
+
+def search_key(text):
+    """Normalize any spelling (Devanagari, IAST or romanized) to the folded IAST key used for lookups."""
+    return fold_diacritics(devanagari_to_iast(text)).strip()
@@ -1,12 +1,19 @@
-from django.db.models import Q
+from datetime import date
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from .models import Flashcard, Tag
-from .serializers import FlashcardSerializer, TagSerializer, FlashcardVersionHistorySerializer
+from .models import Flashcard, Tag, VersionConflict
+from .serializers import FlashcardSerializer, FlashcardListSerializer, TagSerializer, FlashcardVersionHistorySerializer
+from .exporter import EXPORT_FORMATS, export_records, render_export
+from .history import VersionHistory
 from .permissions import IsCuratorOrAdmin
 from .pagination import CardPagination
+from .payload_cache import FragmentJSONRenderer, get_payload_cache
+from .search import get_search_backend, rank_ordering
+from .suggest import DEFAULT_LIMIT, MAX_LIMIT, get_suggest_index
 
 
 class FlashcardViewSet(viewsets.ModelViewSet):
@@ -14,28 +21,59 @@ class FlashcardViewSet(viewsets.ModelViewSet):
     
     serializer_class = FlashcardSerializer
     pagination_class = CardPagination
+    renderer_classes = [FragmentJSONRenderer, BrowsableAPIRenderer]
     
     def get_permissions(self):
         """Set permissions based on action."""
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'suggest']:
             permission_classes = [IsAuthenticated]
         else:
             permission_classes = [IsCuratorOrAdmin]
         return [permission() for permission in permission_classes]
     
+    def get_serializer_class(self):
+        """Use the slim serializer for listings."""
+        if self.action == 'list':
+            return FlashcardListSerializer
+        return super().get_serializer_class()
+    
+    def get_serializer_context(self):
+        """Pass the requested sparse fieldset to the list serializer."""
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['fields'] = self.get_list_fields()
+            context['expand'] = self.get_list_expand()
+        return context
+    
+    def get_list_fields(self):
+        """Fields requested with ?fields=, limited to known ones, or the default list fields."""
+        requested = self._split_query_param('fields')
+        allowed = FlashcardListSerializer.Meta.fields
+        return [name for name in requested if name in allowed] or FlashcardListSerializer.DEFAULT_FIELDS
+    
+    def get_list_expand(self):
+        """Nested objects requested in full with ?expand=."""
+        return [name for name in self._split_query_param('expand') if name in FlashcardListSerializer.EXPANDABLE_FIELDS]
+    
+    def _split_query_param(self, name):
+        value = self.request.query_params.get(name, '')
+        return [item.strip() for item in value.split(',') if item.strip()]
+    
     def get_queryset(self):
         """Return active live flashcards with filtering and search."""
-        queryset = Flashcard.objects.filter(is_active=True, is_live=True).select_related('created_by').prefetch_related('tags')
+        queryset = Flashcard.objects.filter(is_active=True, is_live=True)
+        if self.action == 'list':
+            queryset = FlashcardListSerializer.optimize_queryset(queryset, self.get_list_fields(), self.get_list_expand())
+        else:
+            queryset = queryset.select_related('created_by').prefetch_related('tags')
         
-        # Search functionality
+        # Search functionality - ranked ids come from the full-text index
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(phrase__icontains=search) |
-                Q(definition__icontains=search) |
-                Q(tags__name__icontains=search)
-            ).distinct()
+            card_ids = get_search_backend().search(search)
+            if not card_ids:
+                return queryset.none()
+            queryset = queryset.filter(id__in=card_ids).order_by(rank_ordering(card_ids))
         
         # Tag filtering
         tags = self.request.query_params.get('tags', None)
@@ -51,40 +89,191 @@ class FlashcardViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        """List cards, reusing cached JSON for card versions rendered before."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        cards = page if page is not None else queryset
+        
+        variant = self.list_variant(self.get_list_fields(), self.get_list_expand())
+        data = get_payload_cache().render(
+            cards, self.get_serializer_class(), self.get_serializer_context(), variant=variant
+        )
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+    
+    @staticmethod
+    def list_variant(fields, expand):
+        """Payload cache variant of a list rendered with these sparse fieldset options."""
+        return f"{','.join(fields)}|{','.join(expand)}"
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Get a card, reusing cached JSON for its version."""
+        flashcard = self.get_object()
+        response = Response(get_payload_cache().render_one(flashcard, FlashcardSerializer, self.get_serializer_context()))
+        response['ETag'] = self.version_etag(flashcard)
+        return response
+    
+    def update(self, request, *args, **kwargs):
+        """Publish a new version, honouring an If-Match precondition on the version number."""
+        try:
+            response = super().update(request, *args, **kwargs)
+        except VersionConflict as conflict:
+            return self.version_conflict_response(conflict)
+        response['ETag'] = self.version_etag(response.data)
+        return response
+    
+    def perform_update(self, serializer):
+        serializer.save(expected_version=self.get_expected_version())
+    
+    def get_expected_version(self):
+        """Version number the client last saw, from If-Match or `expected_version`, if given."""
+        value = self.request.headers.get('If-Match') or self.request.data.get('expected_version')
+        if value in (None, '', '*'):
+            return None
+        value = str(value)
+        if value.startswith('W/'):
+            value = value[2:]
+        try:
+            return int(value.strip('"'))
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def version_etag(flashcard):
+        version_number = flashcard['version_number'] if isinstance(flashcard, dict) else flashcard.version_number
+        return f'"{version_number}"'
+    
+    def version_conflict_response(self, conflict):
+        """412 when the client's If-Match version is stale, 409 when a concurrent edit won."""
+        current = Flashcard.objects.filter(version_group=conflict.version_group, is_live=True).values_list(
+            'id', 'version_number'
+        ).first()
+        body = {'error': 'This card was changed by someone else. Reload it and try again.'}
+        if current:
+            body['current_id'], body['current_version'] = current
+        precondition = self.get_expected_version() is not None
+        return Response(
+            body,
+            status=status.HTTP_412_PRECONDITION_FAILED if precondition else status.HTTP_409_CONFLICT,
+        )
+    
     def perform_create(self, serializer):
         """Set the created_by field when creating a new flashcard."""
         serializer.save(created_by=self.request.user)
     
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Typeahead suggestions for card titles, phrases and tag names."""
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            limit = DEFAULT_LIMIT
+        
+        index = get_suggest_index()
+        return Response({
+            'results': index.suggest(query, limit),
+            'index': index.stats(),
+        })
+    
     @action(detail=True, methods=['get'])
     def versions(self, request, pk=None):
-        """Get version history for a flashcard."""
+        """Get version history for a flashcard, including versions moved to delta storage."""
+        flashcard = self.get_object()
+        history = flashcard.get_version_history()
+        
+        # Hot versions come from the payload cache; archived ones have no id to cache under
+        hot = [version for version in history if version.pk is not None]
+        rendered = dict(zip(
+            [version.version_number for version in hot],
+            get_payload_cache().render(hot, FlashcardVersionHistorySerializer, self.get_serializer_context()),
+        ))
+        archived = [version for version in history if version.pk is None]
+        serializer = FlashcardVersionHistorySerializer(archived, many=True, context=self.get_serializer_context())
+        rendered.update(zip([version.version_number for version in archived], serializer.data))
+        return Response([rendered[version.version_number] for version in history])
+    
+    @action(detail=True, methods=['get'])
+    def diff(self, request, pk=None):
+        """Changes between two versions: `?from=<version>&to=<version>`, `to` defaulting to this card."""
         flashcard = self.get_object()
-        versions = flashcard.get_version_history()
+        try:
+            from_number = int(request.query_params['from'])
+            to_number = int(request.query_params.get('to', flashcard.version_number))
+        except (KeyError, ValueError):
+            return Response({'error': 'from must be a version number'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        old_version = VersionHistory.get_version(flashcard.version_group, from_number)
+        new_version = flashcard if to_number == flashcard.version_number else VersionHistory.get_version(flashcard.version_group, to_number)
+        if old_version is None or new_version is None:
+            return Response({'error': 'Version not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(VersionHistory.diff(old_version, new_version))
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the catalog as `?type=csv|jsonl|ndjson`, with every version if `?history=1`."""
+        # `format` is taken by DRF's format suffix handling
+        export_format = request.query_params.get('type', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f'type must be one of: {", ".join(EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        include_history = request.query_params.get('history') in ('1', 'true')
         
-        serializer = FlashcardVersionHistorySerializer(versions, many=True)
-        return Response(serializer.data)
+        lines = render_export(export_records(include_history), export_format, include_history)
+        response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+        extension = 'csv' if export_format == 'csv' else 'jsonl'
+        response['Content-Disposition'] = f'attachment; filename="cards-{date.today().isoformat()}.{extension}"'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Hit/miss counters and size of this worker's card payload cache."""
+        return Response(get_payload_cache().stats())
     
     @action(detail=True, methods=['post'])
     def revert_version(self, request, pk=None):
         """Revert to a specific version of a flashcard."""
         current_card = self.get_object()
         version_id = request.data.get('version_id')
+        version_number = request.data.get('version_number')
         
-        if not version_id:
-            return Response({'error': 'version_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not version_id and not version_number:
+            return Response({'error': 'version_id or version_number is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            target_version = Flashcard.objects.get(id=version_id)
+            if version_id:
+                target_version = Flashcard.objects.get(id=version_id)
+            else:
+                # Archived versions have no id and are only reachable by number
+                target_version = VersionHistory.get_version(current_card.version_group, int(version_number))
+                if target_version is None:
+                    raise Flashcard.DoesNotExist
             
             # Verify this version belongs to the same card family
             if target_version.version_group != current_card.version_group:
                 return Response({'error': 'Invalid version - not part of same card'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Use model method to revert
-            new_version = target_version.revert_to_this_version(reverted_by=request.user)
+            new_version = target_version.revert_to_this_version(
+                reverted_by=request.user,
+                live_version=current_card,
+                expected_version=self.get_expected_version(),
+            )
             
             serializer = FlashcardSerializer(new_version)
-            return Response(serializer.data)
+            response = Response(serializer.data)
+            response['ETag'] = self.version_etag(new_version)
+            return response
+        
+        except VersionConflict as conflict:
+            return self.version_conflict_response(conflict)
+            
+        except (ValueError, TypeError):
+            return Response({'error': 'version_number must be a number'}, status=status.HTTP_400_BAD_REQUEST)
             
         except Flashcard.DoesNotExist:
             return Response({'error': 'Version not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,31 @@
+"""
+Gunicorn settings: gunicorn -c gunicorn.conf.py yoga_flashcards.wsgi
+
+Set PROMETHEUS_MULTIPROC_DIR to a writable directory to have /metrics report all
+workers together (see yoga_flashcards.metrics).
+"""
+import os
+import shutil
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+
+
+def on_starting(server):
+    # Samples of a previous run's processes would otherwise be added to this run's
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def post_worker_init(worker):
+    # Warm this worker's caches right away instead of waiting for the first readiness probe
+    from core.warmup import start_warmup
+    start_warmup()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -36,5 +36,10 @@ python manage.py collectstatic --noinput
 echo "Seeding initial data..."
 python manage.py seed_initial_data || echo "Warning: Initial data seeding failed or already exists"
 
-echo "Starting Django development server..."
-python manage.py runserver 0.0.0.0:8000
+# gunicorn warms each worker's caches as it boots; in development it also reloads on code changes
+RELOAD=""
+if [ "${DEBUG:-0}" = "1" ]; then
+    RELOAD="--reload"
+fi
+echo "Starting gunicorn..."
+exec gunicorn -c gunicorn.conf.py $RELOAD yoga_flashcards.wsgi
@@ -0,0 +1,74 @@
+from django.utils.functional import SimpleLazyObject
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+from .tokens import ACCESS, TokenError, TokenService
+
+
+class TokenUser(SimpleLazyObject):
+    """The user of a signed access token.
+
+    Identity and role come from the token's claims, so authentication and role
+    permission checks do not query the database. Anything else (e.g. assigning
+    the user to a foreign key or serializing the profile) loads the User row once.
+    """
+
+    def __init__(self, claims):
+        from .models import User
+
+        super().__init__(lambda: User.objects.get(pk=claims['uid']))
+        self.__dict__['claims'] = claims
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    @property
+    def pk(self):
+        return self.__dict__['claims']['uid']
+
+    id = pk
+
+    @property
+    def username(self):
+        return self.__dict__['claims']['usr']
+
+    @property
+    def role(self):
+        return self.__dict__['claims']['role']
+
+    @property
+    def is_staff(self):
+        return self.__dict__['claims']['staff']
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def is_curator(self):
+        return self.role in ['curator', 'admin']
+
+    def __bool__(self):
+        return True
+
+    def __str__(self):
+        return self.username
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """`Authorization: Bearer <access token>` with tokens from users.tokens. `request.auth` is the claims dict."""
+
+    keyword = b'bearer'
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword:
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed('Invalid Authorization header: expected "Bearer <token>"')
+        try:
+            claims = TokenService.decode(header[1].decode('ascii'), ACCESS)
+        except (TokenError, UnicodeDecodeError) as error:
+            raise AuthenticationFailed(str(error) or 'Invalid token')
+        return TokenUser(claims), claims
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
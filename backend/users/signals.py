@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import User
+from .tokens import fingerprint_of, store_fingerprint
+
+
+@receiver(post_save, sender=User)
+def publish_token_fingerprint(sender, instance, **kwargs):
+    """Invalidate tokens issued before a password, role, staff or active change, once it is committed."""
+    fingerprint = fingerprint_of(instance)
+    transaction.on_commit(lambda: store_fingerprint(instance.pk, fingerprint))
+
+
+@receiver(post_delete, sender=User)
+def drop_token_fingerprint(sender, instance, **kwargs):
+    """Tokens of a deleted user are rejected without a database lookup."""
+    user_id = instance.pk
+    transaction.on_commit(lambda: store_fingerprint(user_id, ''))
@@ -0,0 +1,80 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import User
+from users.tokens import TokenError, TokenService, denylist
+
+
+class TokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('curator1', 'curator1@example.com', 'pw12345!', role='curator')
+        self.client = APIClient()
+
+    def authenticate(self, tokens):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        return self.client.get('/api/users/auth-status/')
+
+    def assertRejected(self, response):
+        # Session authentication comes first, so DRF answers failed authentication with 403
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(str(response.data['detail']), 'Token has been revoked')
+
+    def change(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in fields.items():
+                if name == 'password':
+                    self.user.set_password(value)
+                else:
+                    setattr(self.user, name, value)
+            self.user.save()
+
+    def test_access_token_authenticates(self):
+        response = self.authenticate(TokenService.issue(self.user))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['authenticated'])
+
+    def test_refresh_token_is_single_use(self):
+        tokens = TokenService.issue(self.user)
+        TokenService.refresh(tokens['refresh'])
+        with self.assertRaises(TokenError):
+            TokenService.refresh(tokens['refresh'])
+
+    def test_only_one_claim_of_a_refresh_token_wins(self):
+        claims = TokenService.decode(TokenService.issue(self.user)['refresh'], 'refresh')
+        results = [denylist.claim_token(claims['jti'], claims['exp']) for _ in range(3)]
+        self.assertEqual(results, [True, False, False])
+
+    def test_password_change_invalidates_tokens(self):
+        tokens = TokenService.issue(self.user)
+        self.change(password='new-pw-6789!')
+        self.assertRejected(self.authenticate(tokens))
+        with self.assertRaises(TokenError):
+            TokenService.refresh(tokens['refresh'])
+
+    def test_role_change_invalidates_tokens(self):
+        tokens = TokenService.issue(self.user)
+        self.change(role='user')
+        self.assertRejected(self.authenticate(tokens))
+        with self.assertRaises(TokenError):
+            TokenService.refresh(tokens['refresh'])
+
+    def test_change_is_seen_without_cached_fingerprint(self):
+        tokens = TokenService.issue(self.user)
+        User.objects.filter(pk=self.user.pk).update(role='user')
+        cache.clear()
+        self.assertRejected(self.authenticate(tokens))
+
+    def test_revocation_cuts_off_within_the_same_second(self):
+        with mock.patch('users.tokens.time.time', return_value=1_800_000_000.2):
+            before = TokenService.issue(self.user)
+        with mock.patch('users.tokens.time.time', return_value=1_800_000_000.5):
+            TokenService.revoke_user(self.user)
+        with mock.patch('users.tokens.time.time', return_value=1_800_000_000.8):
+            after = TokenService.issue(self.user)
+
+        with mock.patch('users.tokens.time.time', return_value=1_800_000_000.9):
+            with self.assertRaises(TokenError):
+                TokenService.decode(before['access'])
+            self.assertEqual(TokenService.decode(after['access'])['uid'], self.user.pk)
@@ -0,0 +1,198 @@
+"""
+Signed, stateless API tokens.
+
+An access token is the user's id, username and role, signed with SECRET_KEY by
+django.core.signing and valid for TOKEN_ACCESS_LIFETIME seconds. Authenticating
+with one reads no session or user row, and the role permissions are checked
+against the token's role claim. A refresh token lives for TOKEN_REFRESH_LIFETIME
+and is exchanged for a new pair; it is single use, so the user is re-read from the
+database (and must still be active) at most once per access token lifetime.
+
+Both tokens carry a fingerprint of the user's password hash, role, staff and
+active flags. Changing any of them (e.g. a password reset or a demotion) makes
+every token issued before the change invalid: refresh compares the claim with the
+user row, and access compares it with the current fingerprint kept in the cache
+next to the denylist entries, so it costs no extra round trip.
+
+Revoked tokens are remembered by TokenDenylist only until they would have expired.
+"""
+import secrets
+import threading
+import time
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+SALT = 'users.tokens'
+
+DENYLIST_CACHE_PREFIX = 'token_denylist:'
+FINGERPRINT_CACHE_PREFIX = 'token_fingerprint:'
+
+
+class TokenError(Exception):
+    """Raised for tokens that are malformed, forged, expired, revoked or of the wrong type."""
+
+
+def role_of(user):
+    """The role claim of a user: superusers are admins whatever their role field says."""
+    return 'admin' if user.is_superuser else user.role
+
+
+def fingerprint_of(user):
+    """Short digest of what a token vouches for; it changes with the password, role, staff or active flag."""
+    state = f'{user.password}|{role_of(user)}|{user.is_staff}|{user.is_active}'
+    return salted_hmac(SALT, state, algorithm='sha256').hexdigest()[:16]
+
+
+def load_fingerprint(user_id):
+    """The fingerprint of a user's row, cached for other workers; '' if the user no longer exists."""
+    from .models import User
+
+    user = User.objects.filter(pk=user_id).first()
+    fingerprint = fingerprint_of(user) if user else ''
+    store_fingerprint(user_id, fingerprint)
+    return fingerprint
+
+
+def store_fingerprint(user_id, fingerprint):
+    """Publish a user's fingerprint ('' once deleted), so tokens issued before a change are rejected at once."""
+    cache.set(f'{FINGERPRINT_CACHE_PREFIX}{user_id}', fingerprint, settings.TOKEN_REFRESH_LIFETIME)
+
+
+class TokenDenylist:
+    """Revoked token ids and per-user revocation times, kept only until the tokens expire.
+
+    Entries are stored in the default cache with a timeout of the longest remaining
+    token lifetime, so the list stays as small as the set of revoked, still valid
+    tokens, and every worker sees them. This process also keeps the revocations it
+    has seen in memory, so a revoked token is rejected without a cache round trip.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def revoke_token(self, jti, expires):
+        self._add(f'{DENYLIST_CACHE_PREFIX}token:{jti}', True, expires)
+
+    def claim_token(self, jti, expires):
+        """Revoke a token unless it already is, atomically across workers. True if this call revoked it."""
+        key = f'{DENYLIST_CACHE_PREFIX}token:{jti}'
+        if not cache.add(key, True, self._timeout(expires)):
+            return False
+        with self._lock:
+            self._entries[key] = (True, expires)
+        return True
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to a user until now (to the sub-second, like the tokens' iat)."""
+        now = time.time()
+        self._add(f'{DENYLIST_CACHE_PREFIX}user:{user_id}', now, now + settings.TOKEN_REFRESH_LIFETIME)
+
+    def is_revoked(self, claims):
+        """Whether a token was revoked, or issued before its user's fingerprint changed."""
+        token_key = f'{DENYLIST_CACHE_PREFIX}token:{claims["jti"]}'
+        user_key = f'{DENYLIST_CACHE_PREFIX}user:{claims["uid"]}'
+        fingerprint_key = f'{FINGERPRINT_CACHE_PREFIX}{claims["uid"]}'
+        now = time.time()
+        with self._lock:
+            for key in [key for key, (_, expires) in self._entries.items() if expires <= now]:
+                del self._entries[key]
+            entries = {key: value for key, (value, _) in self._entries.items() if key in (token_key, user_key)}
+        if self._matches(claims, entries, token_key, user_key):
+            return True
+        # Revoked by another worker
+        entries = cache.get_many([token_key, user_key, fingerprint_key])
+        if self._matches(claims, entries, token_key, user_key):
+            return True
+        fingerprint = entries.get(fingerprint_key)
+        if fingerprint is None:
+            fingerprint = load_fingerprint(claims['uid'])
+        return not fingerprint or not constant_time_compare(claims.get('fp', ''), fingerprint)
+
+    @staticmethod
+    def _matches(claims, entries, token_key, user_key):
+        return token_key in entries or claims['iat'] <= entries.get(user_key, 0)
+
+    def _add(self, key, value, expires):
+        with self._lock:
+            self._entries[key] = (value, expires)
+        cache.set(key, value, self._timeout(expires))
+
+    @staticmethod
+    def _timeout(expires):
+        return max(1, int(expires - time.time()) + 1)
+
+
+denylist = TokenDenylist()
+
+
+class TokenService:
+    """Issuing, checking, refreshing and revoking signed tokens."""
+
+    @staticmethod
+    def issue(user):
+        """A new access and refresh token pair for `user`."""
+        # Sub-second, like revoke_user()'s cutoff, so a token issued just after a revocation in the same second is valid
+        now = time.time()
+        common = {'uid': user.pk, 'iat': now, 'fp': fingerprint_of(user)}
+        access = {
+            **common,
+            'typ': ACCESS,
+            'jti': secrets.token_urlsafe(9),
+            'exp': int(now) + settings.TOKEN_ACCESS_LIFETIME,
+            'usr': user.username,
+            'role': role_of(user),
+            'staff': user.is_staff,
+        }
+        refresh = {**common, 'typ': REFRESH, 'jti': secrets.token_urlsafe(9), 'exp': int(now) + settings.TOKEN_REFRESH_LIFETIME}
+        return {
+            'access': signing.dumps(access, salt=SALT, compress=True),
+            'refresh': signing.dumps(refresh, salt=SALT, compress=True),
+            'token_type': 'Bearer',
+            'expires_in': settings.TOKEN_ACCESS_LIFETIME,
+        }
+
+    @staticmethod
+    def decode(token, token_type=ACCESS):
+        """The claims of a valid, unrevoked token of `token_type`, else raises TokenError."""
+        try:
+            claims = signing.loads(token, salt=SALT)
+        except signing.BadSignature:
+            raise TokenError('Invalid token')
+        if not isinstance(claims, dict) or claims.get('typ') != token_type:
+            raise TokenError(f'Not an {token_type} token' if token_type == ACCESS else f'Not a {token_type} token')
+        if claims['exp'] <= time.time():
+            raise TokenError('Token has expired')
+        if denylist.is_revoked(claims):
+            raise TokenError('Token has been revoked')
+        return claims
+
+    @staticmethod
+    def refresh(refresh_token):
+        """Exchange a refresh token for a new pair. The refresh token cannot be used again."""
+        from .models import User
+
+        claims = TokenService.decode(refresh_token, REFRESH)
+        try:
+            user = User.objects.get(pk=claims['uid'], is_active=True)
+        except User.DoesNotExist:
+            raise TokenError('User is inactive or no longer exists')
+        if not constant_time_compare(claims.get('fp', ''), fingerprint_of(user)):
+            raise TokenError('Password or role changed since the token was issued')
+        # The shared cache's add() lets exactly one of several concurrent refreshes through
+        if not denylist.claim_token(claims['jti'], claims['exp']):
+            raise TokenError('Token has been revoked')
+        return TokenService.issue(user)
+
+    @staticmethod
+    def revoke(claims):
+        denylist.revoke_token(claims['jti'], claims['exp'])
+
+    @staticmethod
+    def revoke_user(user):
+        """Revoke all tokens issued to a user so far, e.g. when deactivating the account."""
+        denylist.revoke_user(user.pk)
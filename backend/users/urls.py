@@ -10,6 +10,9 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('auth-status/', views.auth_status, name='auth_status'),
+    path('token/', views.token_obtain, name='token_obtain'),
+    path('token/refresh/', views.token_refresh, name='token_refresh'),
+    path('token/revoke/', views.token_revoke, name='token_revoke'),
     path('profile/', views.profile, name='profile'),
     path('manage/', include(router.urls)),
 ]
@@ -7,6 +7,7 @@ from django.db.models import Q
 from .serializers import UserRegistrationSerializer, LoginSerializer, UserSerializer, AdminUserSerializer
 from .services import UserService
 from .models import User
+from .tokens import REFRESH, TokenError, TokenService
 
 
 @api_view(['POST'])
@@ -42,11 +43,44 @@ def login_view(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_view(request):
-    """Logout user."""
+    """Logout user, revoking the access token if the request used one."""
+    if isinstance(request.auth, dict):
+        TokenService.revoke(request.auth)
     logout(request)
     return Response({'message': 'Logout successful'})
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def token_obtain(request):
+    """Exchange email and password for an access and refresh token."""
+    serializer = LoginSerializer(data=request.data)
+    if serializer.is_valid():
+        return Response(TokenService.issue(serializer.validated_data['user']))
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def token_refresh(request):
+    """Exchange a refresh token for a new token pair."""
+    try:
+        return Response(TokenService.refresh(request.data.get('refresh', '')))
+    except TokenError as error:
+        return Response({'error': str(error)}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def token_revoke(request):
+    """Revoke a refresh token, e.g. when signing out of a client."""
+    try:
+        TokenService.revoke(TokenService.decode(request.data.get('refresh', ''), REFRESH))
+    except TokenError as error:
+        return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'message': 'Token revoked'})
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def auth_status(request):
@@ -123,6 +157,8 @@ class UserViewSet(viewsets.ModelViewSet):
         user = self.get_object()
         user.is_active = not user.is_active
         user.save()
+        if not user.is_active:
+            TokenService.revoke_user(user)
         return Response({
             'message': f"User {'activated' if user.is_active else 'deactivated'} successfully",
             'user': UserSerializer(user).data
@@ -0,0 +1,113 @@
+"""
+Prometheus metrics for the API workers, import runs and caches.
+
+Metrics are recorded with prometheus_client. When PROMETHEUS_MULTIPROC_DIR is set
+in the environment of every process (gunicorn workers and management commands),
+each process writes its samples to memory-mapped files in that directory and
+/metrics adds them up across processes, so no push gateway or other service is
+needed. gunicorn.conf.py empties the directory at startup and marks exited
+workers dead. Without the variable, metrics cover the current process only.
+"""
+import os
+import socket
+import sys
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    # Management commands may start before gunicorn has created the directory
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 20, 35, 50, 100, 200)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time from the first middleware to the response, per view and action',
+    ['view', 'action', 'method', 'status'],
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in SQL queries per request',
+    ['view', 'action'],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'SQL queries run per request',
+    ['view', 'action'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    'flashcards_cache_lookups_total',
+    'Cache lookups by cache and result (hit or miss)',
+    ['cache', 'result'],
+)
+DAILY_CARD_SELECTION = Histogram(
+    'flashcards_daily_card_selection_seconds',
+    'Time to select (or look up) the daily card when its payload is not cached',
+)
+IMPORT_ROWS = Counter(
+    'flashcards_import_rows_total',
+    'Rows processed by import_cards by result',
+    ['result'],
+)
+IMPORT_BATCH_TIME = Histogram(
+    'flashcards_import_batch_duration_seconds',
+    'Time to write one import_cards batch',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+# In multiprocess mode every sample also gets a pid label, which identifies the worker
+WORKER_START_TIME = Gauge(
+    'flashcards_worker_start_time_seconds',
+    'Start time of each live process serving requests',
+    ['hostname', 'server'],
+    multiprocess_mode='liveall',
+)
+
+
+def register_worker():
+    """Record this process as a live worker."""
+    server = 'gunicorn' if 'gunicorn' in sys.modules else 'django'
+    WORKER_START_TIME.labels(socket.gethostname(), server).set(time.time())
+
+
+def view_labels(request):
+    """(view, action) of the resolved view: the DRF viewset and action, or the view and method.
+
+    DRF names the class of an @api_view function after the function.
+    """
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched', ''
+    func = match.func
+    method = request.method.lower()
+    view_class = getattr(func, 'cls', None)
+    if view_class is None:
+        return getattr(func, '__name__', match.view_name), method
+    actions = getattr(func, 'actions', None) or {}
+    return view_class.__name__, actions.get(method, method)
+
+
+def observe_request(request, status, duration, db_duration=None, db_queries=None):
+    view, action = view_labels(request)
+    REQUEST_LATENCY.labels(view, action, request.method, str(status)).observe(duration)
+    if db_queries is not None:
+        REQUEST_DB_TIME.labels(view, action).observe(db_duration)
+        REQUEST_DB_QUERIES.labels(view, action).observe(db_queries)
+
+
+def count_cache_lookups(cache, hits=0, misses=0):
+    if hits:
+        CACHE_LOOKUPS.labels(cache, 'hit').inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, 'miss').inc(misses)
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus text exposition for all processes."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
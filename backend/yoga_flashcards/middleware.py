@@ -1,6 +1,14 @@
 """
 Custom middleware for the yoga flashcards project.
 """
+import logging
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from . import metrics
+from .querycount import QueryBudgetExceeded, QueryRecorder
+
+logger = logging.getLogger(__name__)
 
 
 class DisableCSRFMiddleware:
@@ -14,3 +22,89 @@ class DisableCSRFMiddleware:
         if request.path.startswith('/api/'):
             setattr(request, '_dont_enforce_csrf_checks', True)
         return self.get_response(request)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count and time SQL queries per request and warn about N+1 patterns.
+
+    Enabled with QUERY_INSTRUMENTATION; otherwise Django drops the middleware at
+    startup and requests pay nothing. Adds X-Query-Count and Server-Timing headers,
+    logs repeated query shapes, and checks QUERY_BUDGETS, which maps URL names,
+    optionally prefixed with a method ("GET flashcard-list"), to maximum queries. With QUERY_BUDGET_STRICT, exceeding a budget raises instead of logging,
+    which is meant for tests. Streaming responses get no headers, since their queries
+    run after the headers are sent; they are checked once the body has been read.
+    """
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budgets = settings.QUERY_BUDGETS
+        self.strict = settings.QUERY_BUDGET_STRICT
+        self.repeat_threshold = settings.QUERY_REPEAT_THRESHOLD
+
+    def __call__(self, request):
+        recorder = QueryRecorder(self.repeat_threshold)
+        with recorder:
+            response = self.get_response(request)
+
+        if response.streaming:
+            # The body's queries run while it is sent, after the headers; it is checked once exhausted
+            response.streaming_content = self._record_stream(request, response.streaming_content, recorder)
+            return response
+
+        duration_ms = recorder.duration * 1000
+        response['X-Query-Count'] = str(recorder.count)
+        response['Server-Timing'] = f'db;dur={duration_ms:.1f};desc="{recorder.count} queries"'
+        repeated = self._check(request, recorder)
+        if repeated:
+            response['X-Query-Repeated'] = str(len(repeated))
+        return response
+
+    def _record_stream(self, request, content, recorder):
+        with recorder:
+            yield from content
+        self._check(request, recorder)
+
+    def _check(self, request, recorder):
+        """Log N+1 patterns and enforce the view's budget. Returns the repeated query shapes."""
+        view_name = request.resolver_match.view_name if request.resolver_match else request.path
+        repeated = recorder.repeated()
+        for shape, count in repeated:
+            logger.warning('Possible N+1 in %s: %d x %s', view_name, count, shape)
+
+        budget = self.budgets.get(f'{request.method} {view_name}', self.budgets.get(view_name))
+        if budget is not None and recorder.count > budget:
+            message = f'{request.method} {view_name} ran {recorder.count} queries, budget is {budget}'
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return repeated
+
+
+class MetricsMiddleware:
+    """
+    Record request latency, and with METRICS_DB_QUERIES database time and query count, per view for /metrics.
+
+    Disabled with METRICS_ENABLED=False, in which case Django drops it at startup.
+    """
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.db_queries = settings.METRICS_DB_QUERIES
+        metrics.register_worker()
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        if not self.db_queries:
+            response = self.get_response(request)
+            metrics.observe_request(request, response.status_code, time.perf_counter() - started)
+            return response
+
+        with QueryRecorder(track_shapes=False) as recorder:
+            response = self.get_response(request)
+        metrics.observe_request(
+            request, response.status_code, time.perf_counter() - started, recorder.duration, recorder.count
+        )
+        return response
@@ -0,0 +1,93 @@
+"""
+Per-request SQL query counting, timing and N+1 detection.
+
+QueryRecorder hooks into every database connection with execute_wrapper() and
+groups queries by shape, i.e. the SQL with parameters and IN lists collapsed, so
+the same statement issued once per row of a result shows up as one shape with a
+high count. It is used by QueryInstrumentationMiddleware for live requests and by
+`query_budget()` to hold a block of code (a test, a benchmark) to a query limit.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.db import connections
+
+# Repetitions of one query shape within a request that count as an N+1 pattern
+DEFAULT_REPEAT_THRESHOLD = 5
+
+_IN_LIST = re.compile(r'\bIN \((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_WHITESPACE = re.compile(r'\s+')
+# Transaction control repeats with every atomic() block and is not an N+1 pattern
+_TRANSACTION_CONTROL = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(Exception):
+    """A request or block of code ran more queries than its budget allows."""
+
+
+def query_shape(sql):
+    """SQL with literals and IN lists replaced, so repeats of one statement compare equal."""
+    shape = _IN_LIST.sub('IN (...)', sql)
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryRecorder:
+    """Counts and times queries on all connections while active (use as a context manager).
+
+    With `track_shapes` false only the count and duration are kept, which is cheaper.
+    """
+
+    def __init__(self, repeat_threshold=DEFAULT_REPEAT_THRESHOLD, track_shapes=True):
+        self.repeat_threshold = repeat_threshold
+        self.track_shapes = track_shapes
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            if self.track_shapes:
+                self.shapes[sql] += 1
+
+    def repeated(self):
+        """(shape, count) of query shapes run at least repeat_threshold times, most frequent first."""
+        by_shape = Counter()
+        for sql, count in self.shapes.items():
+            if not _TRANSACTION_CONTROL.match(sql):
+                by_shape[query_shape(sql)] += count
+        return [(shape, count) for shape, count in by_shape.most_common() if count >= self.repeat_threshold]
+
+
+@contextmanager
+def query_budget(limit, repeat_threshold=None):
+    """Raise QueryBudgetExceeded if the block runs more than `limit` queries.
+
+    With `repeat_threshold`, also raise when any query shape repeats that often.
+    """
+    with QueryRecorder(repeat_threshold or DEFAULT_REPEAT_THRESHOLD) as recorder:
+        yield recorder
+    if recorder.count > limit:
+        raise QueryBudgetExceeded(f'{recorder.count} queries, budget is {limit}')
+    if repeat_threshold and recorder.repeated():
+        shape, count = recorder.repeated()[0]
+        raise QueryBudgetExceeded(f'query repeated {count} times: {shape}')
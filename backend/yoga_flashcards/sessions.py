@@ -0,0 +1,142 @@
+"""
+Session engine serving reads from the cache and coalescing writes to the database.
+
+SESSION_ENGINE = 'yoga_flashcards.sessions'. Sessions live in the
+django_session table as with the default engine, with a copy in the
+SESSION_CACHE_ALIAS cache that answers every read after the first one. Database
+writes are skipped or merged where the result would be the same:
+
+- A new session reserves its key in the cache and is inserted into the database
+  by the first save(), normally the one at the end of the request, so a login
+  writes one row instead of inserting an empty session and updating it.
+- Saving unchanged data only refreshes the database row's expiry date when it
+  has moved by more than SESSION_WRITE_COALESCE_SECONDS, so repeated saves in
+  one request or in quick succession write once.
+
+clear_expired() (run by `manage.py clearsessions`) deletes expired rows in
+batches of SESSION_PURGE_BATCH_SIZE instead of one large DELETE.
+
+Like Django's cached_db engine, the cache should be shared by all processes
+(CACHE_URL). A per-process cache cannot see a logout, flush or key rotation in
+another worker, so there entries are kept for only SESSION_LOCAL_CACHE_SECONDS
+and exists() also asks the database.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.utils import timezone
+from core.checks import PER_PROCESS_BACKENDS
+
+KEY_PREFIX = 'yoga_flashcards.sessions.'
+
+
+class SessionStore(DBStore):
+    """Database sessions read through the cache, with coalesced writes."""
+
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self._shared = settings.CACHES[settings.SESSION_CACHE_ALIAS]['BACKEND'] not in PER_PROCESS_BACKENDS
+        # (serialized data, expiry timestamp) of the database row; None if not inserted yet
+        self._stored = None
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            # An unavailable cache falls back to the database
+            entry = None
+        if entry is not None:
+            data, self._stored = entry
+            return data
+
+        session = self._get_session_from_db()
+        if session is None:
+            self._stored = None
+            return {}
+        data = self.decode(session.session_data)
+        self._stored = (self._fingerprint(data), session.expire_date.timestamp())
+        self._cache_entry(data, self.get_expiry_age(expiry=session.expire_date))
+        return data
+
+    def exists(self, session_key):
+        # Keys are 32 random characters and reserved with cache.add in save(), as in
+        # Django's cache engine, so with a shared cache new keys are not looked up in
+        # the database. A per-process cache only knows this worker's reservations.
+        if self._cache.has_key(self.cache_key_prefix + session_key):
+            return True
+        return not self._shared and super().exists(session_key)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            # Reserve a new key, then insert the row below in this same save
+            self.create()
+            must_create = False
+        data = self._get_session(no_load=must_create)
+        if must_create:
+            # Reserve the key; the row is inserted by the next save, normally at the end of this request.
+            # create() (cycle_key on login) ends here; save() of a keyless session continues below.
+            if not self._cache.add(self.cache_key, (data, None), self._timeout(self.get_expiry_age())):
+                raise CreateError
+            self._stored = None
+            return
+
+        fingerprint = self._fingerprint(data)
+        expiry = self.get_expiry_date().timestamp()
+        stored = self._stored
+        unchanged = (
+            stored is not None and stored[0] == fingerprint
+            and stored[1] >= expiry - settings.SESSION_WRITE_COALESCE_SECONDS
+        )
+        if not unchanged:
+            super().save(must_create=stored is None)
+            self._stored = (fingerprint, expiry)
+        self._cache_entry(data, self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(self.cache_key_prefix + session_key)
+        self.model.objects.filter(session_key=session_key).delete()
+
+    def flush(self):
+        self.clear()
+        self.delete()
+        self._session_key = None
+        self._stored = None
+
+    @classmethod
+    def clear_expired(cls):
+        """Delete expired sessions in batches, so no single statement locks much of the table."""
+        model = cls.get_model_class()
+        batch_size = settings.SESSION_PURGE_BATCH_SIZE
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=timezone.now()).values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                return
+            model.objects.filter(session_key__in=keys).delete()
+
+    def _cache_entry(self, data, timeout):
+        try:
+            self._cache.set(self.cache_key, (data, self._stored), self._timeout(timeout))
+        except Exception:
+            pass
+
+    def _timeout(self, timeout):
+        if self._shared:
+            return timeout
+        return min(timeout, settings.SESSION_LOCAL_CACHE_SECONDS)
+
+    def _fingerprint(self, data):
+        return self.serializer().dumps(data)
@@ -0,0 +1,31 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from flashcards.models import Flashcard
+from users.models import User
+from yoga_flashcards.querycount import QueryBudgetExceeded
+
+
+@override_settings(QUERY_INSTRUMENTATION=True, QUERY_BUDGET_STRICT=True)
+class QueryInstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        curator = User.objects.create_user('curator1', 'curator1@example.com', 'pw12345!', role='curator')
+        Flashcard.objects.create(title='Tadasana', definition='Mountain pose', created_by=curator)
+        self.client = APIClient()
+        self.client.login(username='curator1', password='pw12345!')
+
+    @override_settings(QUERY_BUDGETS={'GET flashcard-export': 100})
+    def test_streaming_response_is_checked_once_read(self):
+        response = self.client.get('/api/cards/export/?type=jsonl')
+
+        self.assertTrue(response.streaming)
+        self.assertNotIn('X-Query-Count', response)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+    @override_settings(QUERY_BUDGETS={'GET flashcard-export': 1})
+    def test_queries_run_while_streaming_count_against_the_budget(self):
+        response = self.client.get('/api/cards/export/?type=jsonl')
+
+        with self.assertRaises(QueryBudgetExceeded):
+            b''.join(response.streaming_content)
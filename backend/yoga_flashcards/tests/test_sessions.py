@@ -0,0 +1,46 @@
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from yoga_flashcards.sessions import SessionStore
+
+
+class LocalCacheSessionTests(TestCase):
+    """With the per-process test cache, other workers' changes must reach this one through the database."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_saved_session_is_read_from_database_when_cache_entry_is_gone(self):
+        store = SessionStore()
+        store['user'] = 'one'
+        store.save()
+        cache.clear()
+
+        self.assertEqual(Session.objects.filter(session_key=store.session_key).count(), 1)
+
+        self.assertTrue(SessionStore().exists(store.session_key))
+        self.assertEqual(SessionStore(store.session_key)['user'], 'one')
+
+    @override_settings(SESSION_LOCAL_CACHE_SECONDS=0)
+    def test_logout_in_another_worker_is_seen(self):
+        store = SessionStore()
+        store['user'] = 'one'
+        store.save()
+
+        # Another worker flushed the session: its cache entry is not in ours
+        Session.objects.filter(session_key=store.session_key).delete()
+
+        self.assertFalse(SessionStore().exists(store.session_key))
+        self.assertEqual(dict(SessionStore(store.session_key).items()), {})
+
+    def test_login_inserts_one_row_when_the_request_saves(self):
+        store = SessionStore()
+        store['before'] = 'login'
+        store.cycle_key()
+        self.assertFalse(Session.objects.exists())
+
+        store['user'] = 'one'
+        store.save()
+        cache.clear()
+
+        self.assertEqual(SessionStore(store.session_key)['user'], 'one')
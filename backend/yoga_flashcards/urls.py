@@ -1,16 +1,21 @@
 from django.contrib import admin
-from django.urls import path, include
+import re
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from core.media import serve_media
+from core.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('api/users/', include('users.urls')),
     path('api/', include('flashcards.urls')),
     path('api/', include('core.urls')),
+    # Uploaded images, optionally sent by the front proxy (see core.media)
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
 ]
 
-# Serve media files in development
+# Serve static files in development
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
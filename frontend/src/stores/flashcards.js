@@ -179,17 +179,18 @@ export const useFlashcardsStore = defineStore('flashcards', () => {
     }
   }
 
-  const revertCardVersion = async (cardId, versionId) => {
+  const revertCardVersion = async (cardId, versionNumber) => {
     loading.value = true
     error.value = null
 
     try {
       const response = await api.post(`/api/cards/${cardId}/revert_version/`, {
-        version_id: versionId
+        // Archived versions have no id, so versions are addressed by number
+        version_number: versionNumber
       })
       return { success: true, data: response.data }
     } catch (err) {
-      error.value = err.response?.data?.message || 'Failed to revert to version'
+      error.value = err.response?.data?.error || err.response?.data?.message || 'Failed to revert to version'
       console.error('Error reverting version:', err)
       return { success: false, error: error.value }
     } finally {